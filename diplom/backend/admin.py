@@ -1,9 +1,46 @@
 from django.contrib import admin
+from . import search
+from .catalog_cache import bump_catalog_version
+from .order_status import change_status
 from .models import (
     Profile, Shop, Category, Product, ProductInfo,
-    Parameter, ProductParameter, Order, OrderItem, Contact
+    Parameter, ProductParameter, Order, ShopOrder, OrderItem, Contact, ImportJob, OutgoingEmail
 )
 
+# Сколько результатов полнотекстового поиска показываем в админке
+ADMIN_SEARCH_LIMIT = 1000
+
+
+class CatalogAdminMixin:
+    """
+    Обновляет поисковый индекс (backend.search) и сбрасывает кэш каталога
+    (вместе с закэшированными остатками) после сохранения и удаления в админке.
+    search_lookup — путь от ProductInfo к объекту этой модели.
+    """
+    search_lookup = None
+
+    def _search_ids(self, pks):
+        return list(ProductInfo.objects.filter(**{f"{self.search_lookup}__in": pks}).values_list('id', flat=True))
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        search.reindex(self._search_ids([obj.pk]))
+        bump_catalog_version()
+
+    def delete_model(self, request, obj):
+        # id собираем до удаления: после него связи уже не найти
+        ids = self._search_ids([obj.pk])
+        super().delete_model(request, obj)
+        search.reindex(ids)
+        bump_catalog_version()
+
+    def delete_queryset(self, request, queryset):
+        ids = self._search_ids(list(queryset.values_list('pk', flat=True)))
+        super().delete_queryset(request, queryset)
+        search.reindex(ids)
+        bump_catalog_version()
+
+
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "is_supplier")
@@ -16,20 +53,30 @@ class ShopAdmin(admin.ModelAdmin):
     search_fields = ("name",)
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(CatalogAdminMixin, admin.ModelAdmin):
+    search_lookup = "product__category"
     list_display = ("id", "name",)
     search_fields = ("name",)
     filter_horizontal = ("shops",)
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(CatalogAdminMixin, admin.ModelAdmin):
+    search_lookup = "product"
     list_display = ("id", "name", "category")
     search_fields = ("name",)
 
 @admin.register(ProductInfo)
-class ProductInfoAdmin(admin.ModelAdmin):
+class ProductInfoAdmin(CatalogAdminMixin, admin.ModelAdmin):
+    search_lookup = "pk"
     list_display = ("id", "product", "shop", "price", "price_rrc", "quantity")
     search_fields = ("name",)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск через полнотекстовый индекс вместо icontains по всей таблице
+        if not search_term or not search.is_supported():
+            return super().get_search_results(request, queryset, search_term)
+        ids = search.search(search_term, limit=ADMIN_SEARCH_LIMIT, in_stock=False)
+        return queryset.filter(pk__in=ids), False
     list_filter = ("shop", "product")
 
 @admin.register(Parameter)
@@ -38,7 +85,8 @@ class ParameterAdmin(admin.ModelAdmin):
     search_fields = ("name",)
 
 @admin.register(ProductParameter)
-class ProductParameterAdmin(admin.ModelAdmin):
+class ProductParameterAdmin(CatalogAdminMixin, admin.ModelAdmin):
+    search_lookup = "parameters"
     list_display = ("id", "product_info", "parameter", "value")
     list_filter = ("parameter",)
 
@@ -48,6 +96,35 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ("user__username",)
     list_filter = ("status",)
 
+@admin.register(ShopOrder)
+class ShopOrderAdmin(admin.ModelAdmin):
+    list_display = ("id", "order", "shop", "status", "created_at", "updated_at")
+    list_filter = ("status", "shop")
+    # Статус меняется только действиями: они проверяют переход, пересчитывают заказ и отправляют письма
+    readonly_fields = ("status",)
+    actions = ("mark_confirmed", "mark_shipped", "mark_delivered", "mark_canceled")
+
+    def _change_status(self, request, queryset, target):
+        # Переход для всех выбранных строк — те же пакетные UPDATE, что и в API поставщика
+        updated, rejected = change_status(list(queryset.values_list("pk", flat=True)), target)
+        self.message_user(request, f"Переведено: {len(updated)}, переход недопустим: {len(rejected)}")
+
+    @admin.action(description="Подтвердить")
+    def mark_confirmed(self, request, queryset):
+        self._change_status(request, queryset, Order.Status.CONFIRMED)
+
+    @admin.action(description="Отгрузить")
+    def mark_shipped(self, request, queryset):
+        self._change_status(request, queryset, Order.Status.SHIPPED)
+
+    @admin.action(description="Доставлен")
+    def mark_delivered(self, request, queryset):
+        self._change_status(request, queryset, Order.Status.DELIVERED)
+
+    @admin.action(description="Отменить (вернуть товар на склад)")
+    def mark_canceled(self, request, queryset):
+        self._change_status(request, queryset, Order.Status.CANCELED)
+
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ("id", "order", "product_info", "quantity", "price")
@@ -58,3 +135,15 @@ class ContactAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "type", "value")
     list_filter = ("type",)
     search_fields = ("user__username",)
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "status", "rows_processed", "created_at", "finished_at")
+    list_filter = ("status",)
+    search_fields = ("user__username",)
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ("id", "to", "template", "status", "attempts", "next_attempt_at", "created_at", "sent_at")
+    list_filter = ("status", "template")
+    search_fields = ("to",)
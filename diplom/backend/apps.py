@@ -5,6 +5,9 @@ class BackendConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'backend'
 
-def ready(self):
-    import signals
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import cache_metrics, metrics
 
+        metrics.install()
+        cache_metrics.install()
@@ -0,0 +1,341 @@
+"""
+Двухуровневый кэш: LRU в памяти процесса (L1) перед общим кэшем (L2, Redis).
+
+Повторное чтение горячего ключа (версия каталога, снимки страниц, запросы cachalot)
+обслуживается из памяти процесса без обращения к Redis. L1 ограничен числом записей,
+суммарным размером и временем жизни записи (L1_TIMEOUT): при переполнении вытесняются
+давно не читанные записи.
+
+Запись ключа (set, set_many, add, incr, delete, clear) идёт в L2 и рассылается остальным
+процессам: для L2 на Redis — через канал pub/sub (поток-подписчик удаляет ключи из L1),
+иначе — внутри процесса. Пока подписка не установлена, L1 не используется; после обрыва
+соединения L1 очищается — сообщения могли потеряться, — а подписчик пишет ошибку в лог
+и переподключается с нарастающей паузой. Так cachalot и код приложения
+сбрасывают L1 во всех процессах.
+
+Настройка:
+
+    CACHES = {
+        "default": {
+            "BACKEND": "backend.cache_backends.TwoTierCache",
+            "OPTIONS": {"L2": "redis", "L1_MAX_ENTRIES": 5000, "L1_MAX_BYTES": 32 * 1024 * 1024, "L1_TIMEOUT": 30},
+        },
+        "redis": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://..."},
+    }
+
+Счётчики попаданий, промахов и вытеснений по уровням — TwoTierCache.stats().
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+logger = logging.getLogger(__name__)
+
+# Сообщение "очистить весь L1"
+CLEAR_ALL = "*"
+
+_stores = {}
+_stores_lock = threading.RLock()
+# Подписчики рассылки внутри процесса: канал -> хранилища
+_local_channels = {}
+
+
+class L1Store:
+    """LRU-хранилище одного процесса; общее для всех потоков (кэши Django создаются на поток)."""
+
+    def __init__(self, max_entries, max_bytes, timeout):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Записи больше этого размера в L1 не кладём: они вытеснили бы много мелких
+        self.max_item_bytes = max(max_bytes // 100, 1)
+        self.timeout = timeout
+        self.sender = uuid.uuid4().hex
+        self.listening = False
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # ключ -> (срок, pickle значения)
+        self.size = 0
+        # Счётчик полученных сброс-сообщений: значение, прочитанное из L2 до сброса, в L1 не кладём
+        self.generation = 0
+        self.counters = {"l1_hits": 0, "l1_misses": 0, "l1_evictions": 0, "l1_expired": 0,
+                         "l2_hits": 0, "l2_misses": 0, "invalidations": 0}
+
+    def count(self, name, delta=1):
+        with self.lock:
+            self.counters[name] += delta
+
+    def get(self, key):
+        """pickle значения или None."""
+        if not self.listening:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counters["l1_misses"] += 1
+                return None
+            expires, data = entry
+            if expires <= time.monotonic():
+                self._remove(key)
+                self.counters["l1_expired"] += 1
+                self.counters["l1_misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["l1_hits"] += 1
+            return data
+
+    def put(self, key, data, timeout=None, generation=None):
+        if not self.listening or len(data) > self.max_item_bytes:
+            return
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        if timeout <= 0:
+            return
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._remove(key)
+            self.entries[key] = (time.monotonic() + timeout, data)
+            self.size += len(data)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                old_key, (_, old) = self.entries.popitem(last=False)
+                self.size -= len(old)
+                self.counters["l1_evictions"] += 1
+
+    def invalidate(self, keys):
+        """Сброс ключей (или всего L1 по CLEAR_ALL) после записи в L2."""
+        with self.lock:
+            self.generation += 1
+            self.counters["invalidations"] += 1
+            if CLEAR_ALL in keys:
+                self.entries.clear()
+                self.size = 0
+            else:
+                for key in keys:
+                    self._remove(key)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, "l1_entries": len(self.entries), "l1_bytes": self.size}
+
+
+class LocalBroadcast:
+    """Рассылка сбросов внутри процесса: для L2 без pub/sub (LocMem в тестах и разработке)."""
+
+    def __init__(self, store, channel):
+        self.store = store
+        self.channel = channel
+        with _stores_lock:
+            _local_channels.setdefault(channel, []).append(store)
+        store.listening = True
+
+    def publish(self, keys):
+        for store in list(_local_channels.get(self.channel, [])):
+            if store is not self.store:
+                store.invalidate(keys)
+
+
+class RedisBroadcast:
+    """Рассылка сбросов через Redis pub/sub; подписчик работает в фоновом потоке процесса."""
+
+    # Пауза перед переподключением подписчика (сек): удваивается после каждой неудачи до MAX_RETRY_DELAY
+    RETRY_DELAY = 1
+    MAX_RETRY_DELAY = 30
+
+    def __init__(self, store, channel, get_client):
+        self.store = store
+        self.channel = channel
+        self.get_client = get_client
+        threading.Thread(target=self._listen, name=f"cache-invalidation-{channel}", daemon=True).start()
+
+    def publish(self, keys):
+        self.get_client().publish(self.channel, "\n".join([self.store.sender, *keys]))
+
+    def _listen(self):
+        delay = self.RETRY_DELAY
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.get_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self.store.listening = True
+                delay = self.RETRY_DELAY
+                for message in pubsub.listen():
+                    sender, *keys = message["data"].decode("utf-8").split("\n")
+                    if sender != self.store.sender:
+                        self.store.invalidate(keys)
+            except Exception:
+                logger.warning("Подписка на сбросы кэша %s оборвалась, переподключение через %s с",
+                               self.channel, delay, exc_info=True)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            # Пока подписки нет, сбросы теряются: L1 отключаем и очищаем
+            self.store.listening = False
+            self.store.invalidate([CLEAR_ALL])
+            time.sleep(delay)
+            delay = min(delay * 2, self.MAX_RETRY_DELAY)
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, server, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._l2_alias = options["L2"]
+        self._name = options.get("NAME", self._l2_alias)
+        self._channel = options.get("CHANNEL", f"cache-invalidation:{self._name}")
+        self._l1_options = (
+            options.get("L1_MAX_ENTRIES", 5000),
+            options.get("L1_MAX_BYTES", 32 * 1024 * 1024),
+            options.get("L1_TIMEOUT", 30),
+        )
+
+    @property
+    def _l2(self):
+        return caches[self._l2_alias]
+
+    @property
+    def _store(self):
+        # После fork (воркеры gunicorn, celery) у процесса нет потока-подписчика родителя — нужен свой L1
+        key = (self._name, os.getpid())
+        store = _stores.get(key)
+        if store is None:
+            with _stores_lock:
+                store = _stores.get(key)
+                if store is None:
+                    store = L1Store(*self._l1_options)
+                    store.broadcast = self._broadcast(store)
+                    _stores[key] = store
+        return store
+
+    def _broadcast(self, store):
+        from django.core.cache.backends.redis import RedisCache
+
+        l2 = self._l2
+        if isinstance(l2, RedisCache):
+            return RedisBroadcast(store, self._channel, lambda: l2._cache.get_client(write=True))
+        return LocalBroadcast(store, self._channel)
+
+    def _l1_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return None if timeout is None else timeout
+
+    def _changed(self, keys):
+        store = self._store
+        # Сброс и в своём L1: значение, прочитанное из L2 параллельным потоком до записи, не попадёт в L1
+        store.invalidate(keys)
+        store.broadcast.publish(keys)
+
+    # Чтение
+
+    def get(self, key, default=None, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        store = self._store
+        data = store.get(full_key)
+        if data is not None:
+            return pickle.loads(data)
+
+        generation = store.generation
+        missing = object()
+        value = self._l2.get(key, missing, version=version)
+        if value is missing:
+            store.count("l2_misses")
+            return default
+        store.count("l2_hits")
+        store.put(full_key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), generation=generation)
+        return value
+
+    def get_many(self, keys, version=None):
+        store = self._store
+        full_keys = {key: self.make_and_validate_key(key, version=version) for key in keys}
+        result, rest = {}, []
+        for key, full_key in full_keys.items():
+            data = store.get(full_key)
+            if data is None:
+                rest.append(key)
+            else:
+                result[key] = pickle.loads(data)
+
+        if rest:
+            generation = store.generation
+            found = self._l2.get_many(rest, version=version)
+            store.count("l2_hits", len(found))
+            store.count("l2_misses", len(rest) - len(found))
+            for key, value in found.items():
+                store.put(full_keys[key], pickle.dumps(value, pickle.HIGHEST_PROTOCOL), generation=generation)
+            result.update(found)
+        return result
+
+    def has_key(self, key, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        if self._store.get(full_key) is not None:
+            return True
+        return self._l2.has_key(key, version=version)
+
+    # Запись: L2, затем сброс L1 во всех процессах
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        self._l2.set(key, value, timeout, version=version)
+        self._changed([full_key])
+        self._store.put(full_key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._l1_timeout(timeout))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        failed = self._l2.set_many(data, timeout, version=version)
+        self._changed([self.make_and_validate_key(key, version=version) for key in data])
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        added = self._l2.add(key, value, timeout, version=version)
+        if added:
+            self._changed([full_key])
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        try:
+            return self._l2.incr(key, delta, version=version)
+        finally:
+            self._changed([full_key])
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        deleted = self._l2.delete(key, version=version)
+        self._changed([full_key])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        if not keys:
+            return
+        self._l2.delete_many(keys, version=version)
+        self._changed([self.make_and_validate_key(key, version=version) for key in keys])
+
+    def clear(self):
+        self._l2.clear()
+        self._changed([CLEAR_ALL])
+
+    def close(self, **kwargs):
+        self._l2.close(**kwargs)
+
+    def stats(self):
+        """Счётчики этого процесса: попадания, промахи, вытеснения L1 и обращения к L2."""
+        return self._store.stats()
@@ -0,0 +1,183 @@
+"""
+Статистика кэша запросов cachalot.
+
+Собирается:
+- сбросы по таблицам (сигнал cachalot post_invalidation) и откуда они пришли —
+  имя url запроса или задачи Celery (origin): видно, какие записи устраивают "шторм" сбросов;
+- попадания и промахи по семействам запросов — набору таблиц запроса
+  ("backend_productinfo+backend_shop");
+- размер закэшированных результатов (pickle) — по каждому CACHE_METRICS_SIZE_SAMPLE-му промаху.
+
+Счётчики копятся в памяти процесса, и фоновый поток раз в CACHE_METRICS_FLUSH_INTERVAL секунд
+прибавляет их к общим в кэше CACHE_METRICS_CACHE (напрямую в Redis, минуя L1 двухуровневого кэша).
+Отчёт: cache_report() — /metrics/cache/ и команда cache_report.
+"""
+import contextvars
+import logging
+import pickle
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from .metrics import SharedCounters
+
+logger = logging.getLogger(__name__)
+
+# Откуда идут запросы к БД: url запроса или задача Celery
+origin = contextvars.ContextVar("cache_metrics_origin", default="other")
+
+counters = SharedCounters("cachemetrics", "CACHE_METRICS_CACHE", "CACHE_METRICS_FLUSH_INTERVAL")
+_misses = 0
+# Ключ таблицы в cachalot -> имя таблицы
+_table_keys = {}
+
+
+def reset():
+    counters.reset()
+
+
+# Сбор
+
+def record_invalidation(sender, db_alias=None, **kwargs):
+    """Обработчик cachalot.signals.post_invalidation; sender — имя таблицы."""
+    counters.count(f"invalidations:{sender}:{origin.get()}")
+
+
+def query_family(table_cache_keys):
+    if not _table_keys:
+        _load_table_keys()
+    return "+".join(sorted(_table_keys.get(key, "?") for key in table_cache_keys)) or "?"
+
+
+def _load_table_keys():
+    from cachalot.settings import cachalot_settings
+
+    keygen = cachalot_settings.CACHALOT_TABLE_KEYGEN
+    if isinstance(keygen, str):
+        # Настройки cachalot ещё не загружены (приложение не в INSTALLED_APPS)
+        keygen = import_string(keygen)
+    tables = {model._meta.db_table for model in apps.get_models(include_auto_created=True)}
+    for db_alias in settings.DATABASES:
+        for table in tables:
+            _table_keys[keygen(db_alias, table)] = table
+
+
+def instrument(original):
+    """Обёртка cachalot.monkey_patch._get_result_or_execute_query: промах — если запрос пришлось выполнить."""
+
+    def inner(execute_query_func, cache, cache_key, table_cache_keys):
+        global _misses
+        executed = []
+
+        def execute():
+            executed.append(True)
+            return execute_query_func()
+
+        result = original(execute, cache, cache_key, table_cache_keys)
+        # Ошибка статистики не должна ломать сам запрос
+        try:
+            family = query_family(table_cache_keys)
+            if not executed:
+                counters.count(f"hits:{family}")
+                return result
+
+            counters.count(f"misses:{family}")
+            _misses += 1
+            # Итераторы и генераторы не сериализуются (и не кэшируются) — их размер не измеряем
+            if isinstance(result, (list, tuple)) and _misses % settings.CACHE_METRICS_SIZE_SAMPLE == 0:
+                size = len(pickle.dumps(result, pickle.HIGHEST_PROTOCOL))
+                counters.count_many([(f"sized:{family}", 1), (f"bytes:{family}", size)])
+        except Exception:
+            logger.warning("Не удалось записать статистику кэша запроса", exc_info=True)
+        return result
+
+    inner.instrumented = True
+    return inner
+
+
+def install():
+    """Подключает сбор статистики к cachalot (вызывается из BackendConfig.ready)."""
+    if "cachalot" not in settings.INSTALLED_APPS or not settings.CACHE_METRICS_ENABLED:
+        return
+    from cachalot import monkey_patch
+    from cachalot.signals import post_invalidation
+
+    post_invalidation.connect(record_invalidation, dispatch_uid="cache_metrics_invalidation")
+    if not getattr(monkey_patch._get_result_or_execute_query, "instrumented", False):
+        monkey_patch._get_result_or_execute_query = instrument(monkey_patch._get_result_or_execute_query)
+
+    from celery.signals import task_postrun, task_prerun
+
+    task_prerun.connect(_task_started, weak=False, dispatch_uid="cache_metrics_task_prerun")
+    task_postrun.connect(_task_finished, weak=False, dispatch_uid="cache_metrics_task_postrun")
+
+
+def _task_started(task=None, **kwargs):
+    task.request.cache_metrics_token = origin.set(f"task:{task.name}")
+
+
+def _task_finished(task=None, **kwargs):
+    token = getattr(task.request, "cache_metrics_token", None)
+    if token is not None:
+        origin.reset(token)
+
+
+class CacheMetricsMiddleware:
+    """
+    Помечает запросы к БД именем url, чтобы сбросы кэша можно было отнести к эндпоинту.
+    Имя берётся из request.resolver_match, когда Django уже нашёл view (process_view).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = origin.set("url:unknown")
+        try:
+            return self.get_response(request)
+        finally:
+            origin.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        origin.set(f"url:{match.url_name or match.view_name}")
+
+
+# Отчёт
+
+def cache_report():
+    """
+    {"invalidations": [{"table", "total", "origins": {origin: n}}], по убыванию total,
+     "queries": [{"family", "hits", "misses", "hit_rate", "avg_bytes"}], по убыванию числа промахов,
+     "tiers": счётчики двухуровневого кэша этого процесса (если он используется)}.
+    """
+    tables, families = {}, {}
+    for name, value in counters.values().items():
+        kind, _, rest = name.partition(":")
+        if kind == "invalidations":
+            table, _, source = rest.partition(":")
+            entry = tables.setdefault(table, {"table": table, "total": 0, "origins": {}})
+            entry["total"] += value
+            entry["origins"][source] = entry["origins"].get(source, 0) + value
+        else:
+            families.setdefault(rest, {"family": rest, "hits": 0, "misses": 0, "sized": 0, "bytes": 0})[kind] = value
+
+    queries = []
+    for entry in families.values():
+        total = entry["hits"] + entry["misses"]
+        queries.append({
+            "family": entry["family"],
+            "hits": entry["hits"],
+            "misses": entry["misses"],
+            "hit_rate": round(entry["hits"] / total, 3) if total else None,
+            "avg_bytes": entry["bytes"] // entry["sized"] if entry["sized"] else None,
+        })
+
+    default = caches["default"]
+    return {
+        "invalidations": sorted(tables.values(), key=lambda t: -t["total"]),
+        "queries": sorted(queries, key=lambda q: -q["misses"]),
+        "tiers": default.stats() if hasattr(default, "stats") else None,
+    }
@@ -0,0 +1,112 @@
+"""
+Хранилище корзин.
+
+Корзина пользователя — hash в Redis ("cart:<user_id>": {product_info_id: количество}):
+добавление и удаление товара — одна команда HINCRBY/HDEL без чтения и перезаписи
+всей корзины, как было с request.session. Корзина живёт CART_TTL секунд с последнего
+изменения.
+
+Если CART_REDIS_URL не задан (тесты, разработка без Redis), корзины хранятся
+в кэше Django.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+# Ключ, под которым корзина лежала в сессии до появления хранилища
+SESSION_CART_KEY = 'cart'
+
+
+class RedisCartStore:
+    def __init__(self, url, ttl):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def _key(self, user_id):
+        return f"cart:{user_id}"
+
+    def items(self, user_id):
+        return {int(pid): int(qty) for pid, qty in self.redis.hgetall(self._key(user_id)).items()}
+
+    def add(self, user_id, lines):
+        """Прибавляет количества {product_info_id: количество}; позиции с количеством <= 0 удаляются."""
+        key = self._key(user_id)
+        pipe = self.redis.pipeline()
+        for pid, qty in lines.items():
+            pipe.hincrby(key, pid, qty)
+        pipe.expire(key, self.ttl)
+        totals = pipe.execute()[:-1]
+
+        empty = [pid for pid, total in zip(lines, totals) if total <= 0]
+        if empty:
+            self.redis.hdel(key, *empty)
+
+    def remove(self, user_id, pid):
+        return bool(self.redis.hdel(self._key(user_id), pid))
+
+    def clear(self, user_id):
+        self.redis.delete(self._key(user_id))
+
+
+class CacheCartStore:
+    """Корзины в кэше Django: корзина читается и записывается целиком."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+    def _key(self, user_id):
+        return f"cart:{user_id}"
+
+    def items(self, user_id):
+        return cache.get(self._key(user_id), {})
+
+    def add(self, user_id, lines):
+        cart = self.items(user_id)
+        for pid, qty in lines.items():
+            cart[pid] = cart.get(pid, 0) + qty
+            if cart[pid] <= 0:
+                del cart[pid]
+        cache.set(self._key(user_id), cart, self.ttl)
+
+    def remove(self, user_id, pid):
+        cart = self.items(user_id)
+        if cart.pop(pid, None) is None:
+            return False
+        cache.set(self._key(user_id), cart, self.ttl)
+        return True
+
+    def clear(self, user_id):
+        cache.delete(self._key(user_id))
+
+
+_store = None
+
+
+def get_cart_store():
+    global _store
+    if _store is None:
+        if settings.CART_REDIS_URL:
+            _store = RedisCartStore(settings.CART_REDIS_URL, settings.CART_TTL)
+        else:
+            _store = CacheCartStore(settings.CART_TTL)
+    return _store
+
+
+def merge_session_cart(request):
+    """
+    Переносит корзину из сессии (старый формат или корзина, собранная до входа)
+    в хранилище пользователя, складывая количества.
+    """
+    session_cart = request.session.get(SESSION_CART_KEY)
+    if session_cart is None:
+        return
+    if session_cart:
+        get_cart_store().add(request.user.pk, {int(pid): int(qty) for pid, qty in session_cart.items()})
+    del request.session[SESSION_CART_KEY]
+
+
+def get_cart(request):
+    """Корзина текущего пользователя: {product_info_id: количество}."""
+    merge_session_cart(request)
+    return get_cart_store().items(request.user.pk)
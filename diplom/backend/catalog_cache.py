@@ -0,0 +1,131 @@
+"""
+Кэш каталога: готовые страницы (снимки) и производные данные (фасеты).
+
+Ключи кэша включают номер версии каталога: после импорта версия увеличивается
+(bump_catalog_version), и все старые записи перестают читаться — удалять их
+по одной не нужно, они истекут по таймауту.
+
+Остатки в снимок страницы не запекаются: они хранятся отдельным ключом на каждое
+предложение и подставляются при отдаче страницы. Поэтому изменение только остатка
+(заказ, импорт) меняет ключи этих предложений на разницу (incr), а не сбрасывает все страницы.
+Версия увеличивается, лишь когда остаток переходит через ноль: товар появляется
+в каталоге или исчезает из него. Ключи остатков тоже включают версию: после
+bump_catalog_version (админка, ручное исправление данных) остатки читаются заново.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .filters import FILTER_PARAMS
+
+CATALOG_VERSION_KEY = "catalog:version"
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # add не перезапишет версию, если её одновременно установил другой процесс
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    """Сбрасывает кэш каталога. Внутри транзакции — только после её фиксации."""
+    transaction.on_commit(_bump)
+
+
+def _bump():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Ключа ещё нет (или он вытеснен из кэша)
+        cache.add(CATALOG_VERSION_KEY, 2, timeout=None)
+
+
+def filter_signature(params, extra=()):
+    """
+    Отпечаток фильтров каталога: не зависит от порядка параметров и от cursor/page_size.
+    extra — дополнительные значения, от которых зависит кэшируемый ответ.
+    """
+    data = sorted((name, sorted(params.getlist(name))) for name in FILTER_PARAMS if name in params)
+    data.append(list(extra))
+    return hashlib.md5(json.dumps(data, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def catalog_cache_key(prefix, params, extra=()):
+    return f"catalog:{prefix}:{catalog_version()}:{filter_signature(params, extra)}"
+
+
+# Снимки страниц каталога
+
+def _stock_key(version, pk):
+    return f"catalog:stock:{version}:{pk}"
+
+
+def stock_changed(changes):
+    """
+    Сообщает кэшу об изменении остатков: changes = {product_info_id: (старый остаток, новый)}.
+    Внутри транзакции применяется после её фиксации.
+    """
+    if changes:
+        transaction.on_commit(lambda: _apply_stock(changes))
+
+
+def _apply_stock(changes):
+    # Разница, а не новое значение: колбэки параллельных транзакций могут выполниться
+    # в любом порядке, а сумма изменений от порядка не зависит
+    version = catalog_version()
+    for pk, (old, new) in changes.items():
+        if new != old:
+            try:
+                cache.incr(_stock_key(version, pk), new - old)
+            except ValueError:
+                # Ключа нет — остаток прочитают из БД при следующей отдаче страницы
+                pass
+    # Товар появился в наличии или закончился — меняется состав страниц
+    if any((old > 0) != (new > 0) for old, new in changes.values()):
+        _bump()
+
+
+def cached_catalog_page(key, build, load_stock):
+    """
+    Возвращает (страница, etag). Страница берётся из кэша или собирается build() —
+    словарь {"items": [...], "next", "previous"}. Остатки подставляются из ключей
+    предложений; недостающие читаются load_stock(ids) -> {id: остаток}.
+    """
+    version = catalog_version()
+    page = cache.get(key)
+    if page is None:
+        page = build()
+        page["etag"] = hashlib.md5(json.dumps(page, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        cache.set(key, page, settings.CATALOG_SNAPSHOT_TIMEOUT)
+        # Остатки только что прочитаны из БД — они заменяют закэшированные, даже если те
+        # разошлись с БД (изменение мимо stock_changed)
+        stock = {item["id"]: item["quantity"] for item in page["items"]}
+        cache.set_many({_stock_key(version, pk): qty for pk, qty in stock.items()}, settings.CATALOG_SNAPSHOT_TIMEOUT)
+    else:
+        stock = _read_stock(version, [item["id"] for item in page["items"]], load_stock)
+
+    items = [{**item, "quantity": stock.get(item["id"], item["quantity"])} for item in page["items"]]
+    quantities = ",".join(str(item["quantity"]) for item in items)
+    etag = hashlib.md5(f"{page['etag']}:{quantities}".encode("utf-8")).hexdigest()
+    return {"items": items, "next": page["next"], "previous": page["previous"]}, etag
+
+
+def _read_stock(version, ids, load_stock):
+    found = cache.get_many([_stock_key(version, pk) for pk in ids])
+    stock = {pk: found[_stock_key(version, pk)] for pk in ids if _stock_key(version, pk) in found}
+
+    # Ключи могли быть вытеснены из кэша — дочитываем остатки одним запросом
+    missing = [pk for pk in ids if pk not in stock]
+    if missing:
+        loaded = load_stock(missing)
+        # add, а не set: ключ, заполненный другим процессом, уже получает изменения через incr
+        for pk, qty in loaded.items():
+            cache.add(_stock_key(version, pk), qty, settings.CATALOG_SNAPSHOT_TIMEOUT)
+        stock.update(loaded)
+    return stock
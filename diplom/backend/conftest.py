@@ -1,5 +1,6 @@
 import pytest
 from unittest.mock import patch
+from django.core.cache import cache
 from rest_framework.test import APIClient
 from backend.models import User
 
@@ -10,6 +11,13 @@ def mock_celery_tasks():
         yield
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Кэш (в том числе счётчики throttle) общий для всех тестов: без сброса лимит 20/minute копится между тестами
+    cache.clear()
+    yield
+
+
 @pytest.fixture
 def auth_client(db):
     user = User.objects.create_user(
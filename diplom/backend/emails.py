@@ -0,0 +1,198 @@
+"""
+Очередь исходящих писем.
+
+queue_email() рендерит шаблоны письма (текст и HTML) и сохраняет его в OutgoingEmail;
+после фиксации транзакции ставится задача send_pending_emails (не больше одной в очереди
+одновременно). Задача забирает пачку писем и отправляет их через одно соединение
+с почтовым сервером вместо нового SMTP-соединения на каждое письмо.
+
+Письмо, которое не удалось отправить, откладывается с экспоненциальной задержкой
+(EMAIL_RETRY_DELAY * 2^попытка) и после EMAIL_MAX_ATTEMPTS попыток помечается failed.
+Отложенные письма подбирает периодический запуск задачи (CELERY_BEAT_SCHEDULE).
+
+Шаблоны: emails/<template>_subject.txt, emails/<template>.txt, emails/<template>.html (необязателен).
+Текстовые шаблоны обёрнуты в {% autoescape off %}: экранирование HTML испортило бы ссылки (&amp;) и названия.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.template import TemplateDoesNotExist
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+# Задача отправки уже стоит в очереди — новые письма она заберёт
+SCHEDULED_KEY = "emails:flush:scheduled"
+# Пачку отправляет только один воркер
+LOCK_KEY = "emails:flush:lock"
+# Счётчики для статистики отправки
+STATS_KEYS = {"sent": "emails:stats:sent", "failed": "emails:stats:failed", "seconds": "emails:stats:seconds"}
+
+
+def render_email(template, context):
+    """(тема, текст, html) письма по шаблонам emails/<template>*; html пустой, если шаблона нет."""
+    subject = render_to_string(f"emails/{template}_subject.txt", context)
+    text = render_to_string(f"emails/{template}.txt", context)
+    try:
+        html = render_to_string(f"emails/{template}.html", context)
+    except TemplateDoesNotExist:
+        html = ""
+    # Тема письма — одна строка
+    return " ".join(subject.split()), text, html
+
+
+def queue_email(template, recipients, context):
+    """Ставит письмо в очередь каждому получателю; один шаблон рендерится один раз."""
+    recipients = [email for email in recipients if email]
+    if not recipients:
+        return
+    subject, text, html = render_email(template, context)
+    queue_rendered([(email, subject, text, html) for email in recipients], template)
+
+
+def queue_rendered(messages, template):
+    """Ставит в очередь готовые письма [(to, subject, text, html)] одним INSERT."""
+    OutgoingEmail.objects.bulk_create([
+        OutgoingEmail(to=to, subject=subject, text=text, html=html, template=template)
+        for to, subject, text, html in messages
+    ], batch_size=settings.EMAIL_BATCH_SIZE)
+    transaction.on_commit(schedule_flush)
+
+
+def schedule_flush():
+    from .tasks import send_pending_emails
+
+    if cache.add(SCHEDULED_KEY, 1, settings.EMAIL_FLUSH_DELAY + settings.EMAIL_LOCK_TIMEOUT):
+        send_pending_emails.apply_async(countdown=settings.EMAIL_FLUSH_DELAY)
+
+
+def _message(email):
+    message = EmailMultiAlternatives(subject=email.subject, body=email.text, to=[email.to])
+    if email.html:
+        message.attach_alternative(email.html, "text/html")
+    return message
+
+
+def send_pending(limit=None):
+    """
+    Отправляет письма из очереди пачками по EMAIL_BATCH_SIZE, не больше limit писем.
+    Возвращает {"sent", "failed", "retried", "seconds", "per_second"}.
+    """
+    cache.delete(SCHEDULED_KEY)
+    if not cache.add(LOCK_KEY, 1, settings.EMAIL_LOCK_TIMEOUT):
+        return {"sent": 0, "failed": 0, "retried": 0, "seconds": 0, "per_second": 0}
+
+    result = {"sent": 0, "failed": 0, "retried": 0}
+    started = time.perf_counter()
+    try:
+        connection = get_connection()
+        while limit is None or result["sent"] + result["failed"] + result["retried"] < limit:
+            size = settings.EMAIL_BATCH_SIZE
+            if limit is not None:
+                size = min(size, limit - result["sent"] - result["failed"] - result["retried"])
+            batch = list(
+                OutgoingEmail.objects
+                .filter(status=OutgoingEmail.Status.PENDING, next_attempt_at__lte=timezone.now())
+                .order_by('next_attempt_at', 'id')[:size]
+            )
+            if not batch:
+                break
+            # Соединение открывается один раз на пачку и переиспользуется для всех писем
+            try:
+                connection.open()
+            except Exception as exc:
+                # Почтовый сервер недоступен — откладываем пачку и не пробуем остальные
+                for key, count in _finish(batch, [], {email.pk: str(exc) for email in batch}).items():
+                    result[key] += count
+                break
+            try:
+                sent, errors = _send_batch(connection, batch)
+            finally:
+                connection.close()
+            for key, count in _finish(batch, sent, errors).items():
+                result[key] += count
+    finally:
+        cache.delete(LOCK_KEY)
+
+    seconds = time.perf_counter() - started
+    result["seconds"] = round(seconds, 3)
+    result["per_second"] = round(result["sent"] / seconds, 1) if seconds > 0 else 0
+    _record_stats(result, seconds)
+    if result["sent"] or result["failed"] or result["retried"]:
+        logger.info("Отправлено писем: %(sent)s, отложено: %(retried)s, не отправлено: %(failed)s, "
+                    "%(per_second)s писем/с", result)
+    return result
+
+
+def _send_batch(connection, batch):
+    sent, errors = [], {}
+    for email in batch:
+        try:
+            if connection.send_messages([_message(email)]):
+                sent.append(email.pk)
+            else:
+                errors[email.pk] = "Сервер не принял письмо"
+        except Exception as exc:
+            errors[email.pk] = str(exc) or exc.__class__.__name__
+    return sent, errors
+
+
+def _finish(batch, sent, errors):
+    """Отмечает отправленные письма и откладывает (или помечает failed) неотправленные."""
+    now = timezone.now()
+    if sent:
+        OutgoingEmail.objects.filter(pk__in=sent).update(status=OutgoingEmail.Status.SENT, sent_at=now, error='')
+
+    counts = {"sent": len(sent), "failed": 0, "retried": 0}
+    failed = [email for email in batch if email.pk in errors]
+    for email in failed:
+        email.attempts += 1
+        email.error = errors[email.pk]
+        if email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+            email.status = OutgoingEmail.Status.FAILED
+            counts["failed"] += 1
+        else:
+            email.next_attempt_at = now + timedelta(seconds=settings.EMAIL_RETRY_DELAY * 2 ** (email.attempts - 1))
+            counts["retried"] += 1
+    if failed:
+        OutgoingEmail.objects.bulk_update(failed, ['attempts', 'error', 'status', 'next_attempt_at'])
+    return counts
+
+
+def _record_stats(result, seconds):
+    for key in ("sent", "failed"):
+        _incr(STATS_KEYS[key], result[key])
+    # Время храним в миллисекундах: incr работает с целыми
+    _incr(STATS_KEYS["seconds"], int(seconds * 1000))
+
+
+def _incr(key, delta):
+    if not delta:
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def email_stats():
+    """Накопленная статистика отправки и размер очереди."""
+    values = cache.get_many(STATS_KEYS.values())
+    sent = values.get(STATS_KEYS["sent"], 0)
+    seconds = values.get(STATS_KEYS["seconds"], 0) / 1000
+    return {
+        "sent": sent,
+        "failed": values.get(STATS_KEYS["failed"], 0),
+        "seconds": round(seconds, 3),
+        "per_second": round(sent / seconds, 1) if seconds > 0 else 0,
+        "pending": OutgoingEmail.objects.filter(status=OutgoingEmail.Status.PENDING).count(),
+    }
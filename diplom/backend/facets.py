@@ -0,0 +1,83 @@
+"""
+Фасеты каталога для боковой панели фильтров: сколько предложений приходится
+на каждое значение параметра и на каждый диапазон цены.
+
+Считаются группирующими запросами в БД (три запроса независимо от размера выборки),
+результат кэшируется по отпечатку фильтров (см. catalog_cache).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Min, Value
+from django.db.models.functions import Floor, Least
+
+from .catalog_cache import catalog_cache_key
+from .models import ProductParameter
+
+
+def catalog_facets(queryset, params):
+    """Фасеты для выборки queryset (уже отфильтрованной filter_catalog по params), с кэшем."""
+    key = catalog_cache_key("facets", params)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(queryset)
+        cache.set(key, facets, settings.CATALOG_FACETS_TIMEOUT)
+    return facets
+
+
+def compute_facets(queryset, buckets=None, max_values=None):
+    buckets = buckets or settings.CATALOG_FACET_PRICE_BUCKETS
+    max_values = max_values or settings.CATALOG_FACET_MAX_VALUES
+    queryset = queryset.order_by()
+
+    price = queryset.aggregate(total=Count('id'), min=Min('price'), max=Max('price'))
+    return {
+        "total": price["total"],
+        "price": _price_histogram(queryset, price, buckets),
+        "parameters": _parameter_counts(queryset, max_values),
+    }
+
+
+def _price_histogram(queryset, price, buckets):
+    low, high = price["min"], price["max"]
+    if not price["total"]:
+        return {"min": None, "max": None, "buckets": []}
+    if low == high:
+        return {"min": low, "max": high, "buckets": [{"from": low, "to": high, "count": price["total"]}]}
+
+    # Равные интервалы; максимальная цена попадает в последний интервал
+    width = (high - low) / buckets
+    rows = (
+        queryset
+        .annotate(bucket=Least(Floor((F('price') - low) / width), Value(float(buckets - 1))))
+        .values('bucket')
+        .annotate(count=Count('id'))
+    )
+    counts = {int(row['bucket']): row['count'] for row in rows}
+
+    return {
+        "min": low,
+        "max": high,
+        "buckets": [
+            {"from": round(low + i * width, 2), "to": round(low + (i + 1) * width, 2), "count": counts.get(i, 0)}
+            for i in range(buckets)
+        ],
+    }
+
+
+def _parameter_counts(queryset, max_values):
+    rows = (
+        ProductParameter.objects
+        .filter(product_info__in=queryset.values('pk'))
+        .values('parameter__name', 'value')
+        .annotate(count=Count('id'))
+        .order_by('parameter__name', '-count', 'value')
+    )
+
+    result = []
+    for row in rows:
+        if not result or result[-1]["name"] != row['parameter__name']:
+            result.append({"name": row['parameter__name'], "values": []})
+        # Для каждого параметра оставляем самые частые значения
+        if len(result[-1]["values"]) < max_values:
+            result[-1]["values"].append({"value": row['value'], "count": row['count']})
+    return result
@@ -0,0 +1,159 @@
+"""
+Загрузка прайс-листов поставщиков по Shop.url.
+
+Периодическая задача (fetch_shop_feeds в tasks.py) проверяет url всех магазинов:
+- запрос условный (If-None-Match / If-Modified-Since) — неизменившийся файл сервер
+  не отдаёт (304);
+- если сервер не поддерживает условные запросы, файл сравнивается по sha256
+  с последним импортированным и не импортируется повторно;
+- файлы скачиваются параллельно (SHOP_FEED_WORKERS потоков), тело пишется во временный
+  файл (в памяти до SHOP_FEED_SPOOL_SIZE, дальше на диск) и читается импортёром потоково;
+- импорт выполняется по очереди в вызывающем потоке: работа с БД не распараллеливается;
+  каждый прайс-лист импортируется в своей транзакции.
+"""
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .importer import ProductImporter
+from .models import Shop
+from .price_lists import PriceList, is_supported_file
+
+logger = logging.getLogger(__name__)
+
+# Размер куска, которым читаем ответ сервера
+CHUNK_SIZE = 64 * 1024
+
+# Формат по Content-Type, если url не заканчивается расширением файла
+CONTENT_TYPES = {
+    "yaml": "feed.yaml",
+    "json": "feed.json",
+    "spreadsheetml": "feed.xlsx",
+}
+
+
+class FeedError(Exception):
+    """Файл по url нельзя импортировать (формат, размер)."""
+
+
+def feed_name(url, content_type=""):
+    """Имя файла для PriceList: формат берётся из url, иначе из Content-Type."""
+    path = urlparse(url).path
+    if is_supported_file(path):
+        return path
+    for marker, name in CONTENT_TYPES.items():
+        if marker in content_type.lower():
+            return name
+    raise FeedError(f"Формат прайс-листа не определён: {url} ({content_type or 'без Content-Type'})")
+
+
+def download(url, etag="", last_modified=""):
+    """
+    Скачивает прайс-лист. Возвращает None, если файл не изменился (304), иначе словарь
+    {"file", "name", "hash", "etag", "last_modified"}; file — временный файл, открытый на чтение.
+    Выполняется в рабочем потоке — к БД не обращается.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    with requests.get(url, headers=headers, stream=True, timeout=settings.SHOP_FEED_TIMEOUT) as response:
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        name = feed_name(url, response.headers.get("Content-Type", ""))
+
+        body = tempfile.SpooledTemporaryFile(max_size=settings.SHOP_FEED_SPOOL_SIZE)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                size += len(chunk)
+                if size > settings.SHOP_FEED_MAX_SIZE:
+                    raise FeedError(f"Прайс-лист больше {settings.SHOP_FEED_MAX_SIZE} байт: {url}")
+                digest.update(chunk)
+                body.write(chunk)
+        except BaseException:
+            body.close()
+            raise
+        body.seek(0)
+
+        return {
+            "file": body,
+            "name": name,
+            "hash": digest.hexdigest(),
+            "etag": response.headers.get("ETag", ""),
+            "last_modified": response.headers.get("Last-Modified", ""),
+        }
+
+
+def fetch_feeds(shop_ids=None):
+    """
+    Проверяет и импортирует прайс-листы магазинов с url (или только shop_ids).
+    Возвращает список результатов по магазинам:
+    {"shop", "status": imported | not_modified | unchanged | failed, "stats" | "error"}.
+    """
+    shops = Shop.objects.exclude(url__isnull=True).exclude(url="")
+    if shop_ids is not None:
+        shops = shops.filter(pk__in=shop_ids)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=settings.SHOP_FEED_WORKERS) as pool:
+        futures = {
+            pool.submit(download, shop.url, shop.feed_etag, shop.feed_last_modified): shop
+            for shop in shops
+        }
+        # Импортируем в порядке готовности, пока остальные файлы докачиваются
+        for future in as_completed(futures):
+            results.append(_process(futures[future], future))
+    return results
+
+
+def _process(shop, future):
+    shop.feed_checked_at = timezone.now()
+    try:
+        feed = future.result()
+    except (requests.RequestException, FeedError) as exc:
+        logger.warning("Не удалось загрузить прайс-лист магазина %s: %s", shop.pk, exc)
+        shop.save(update_fields=["feed_checked_at"])
+        return {"shop": shop.pk, "status": "failed", "error": str(exc)}
+
+    if feed is None:
+        shop.save(update_fields=["feed_checked_at"])
+        return {"shop": shop.pk, "status": "not_modified"}
+
+    with feed["file"] as file:
+        if feed["hash"] == shop.feed_hash:
+            result = {"shop": shop.pk, "status": "unchanged"}
+        else:
+            try:
+                # Прайс-лист применяется целиком или никак: ошибка в середине файла откатывает записанные пачки
+                with transaction.atomic():
+                    price_list = PriceList(file, feed["name"])
+                    stats = ProductImporter(
+                        shop,
+                        categories=price_list.categories,
+                        deactivate_missing=settings.SHOP_FEED_DEACTIVATE_MISSING,
+                    ).run(price_list)
+            except Exception as exc:
+                # Ошибка одного прайс-листа не должна останавливать остальные; отпечаток не сохраняем,
+                # чтобы файл импортировался при следующей проверке
+                logger.exception("Ошибка импорта прайс-листа магазина %s", shop.pk)
+                shop.save(update_fields=["feed_checked_at"])
+                return {"shop": shop.pk, "status": "failed", "error": str(exc)}
+            shop.feed_hash = feed["hash"]
+            result = {"shop": shop.pk, "status": "imported", "stats": stats}
+
+    shop.feed_etag = feed["etag"]
+    shop.feed_last_modified = feed["last_modified"]
+    shop.save(update_fields=["feed_etag", "feed_last_modified", "feed_hash", "feed_checked_at"])
+    return result
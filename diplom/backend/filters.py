@@ -0,0 +1,102 @@
+from django.utils.dateparse import parse_date
+
+from .models import Order, Parameter, ProductParameter
+
+# Query-параметры, которые разбирает filter_catalog
+FILTER_PARAMS = ('in_stock', 'category', 'shop', 'price_min', 'price_max', 'param')
+
+
+def _number(params, name, cast=float):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValueError(f"Некорректное значение {name}")
+
+
+def filter_catalog(queryset, params):
+    """
+    Фильтры каталога по query-параметрам:
+    - category, shop — id категории и магазина
+    - price_min, price_max — диапазон цены
+    - in_stock — по умолчанию 1 (только товары в наличии), 0 — все предложения
+    - param=Название:значение — значение параметра товара, можно передать несколько раз
+
+    Каждому фильтру соответствует индекс ProductInfo/ProductParameter (см. Meta.indexes).
+    При некорректных значениях выбрасывает ValueError.
+    """
+    if params.get('in_stock', '1') not in ('0', 'false'):
+        queryset = queryset.filter(quantity__gt=0)
+
+    category = _number(params, 'category', int)
+    if category is not None:
+        queryset = queryset.filter(product__category_id=category)
+
+    shop = _number(params, 'shop', int)
+    if shop is not None:
+        queryset = queryset.filter(shop_id=shop)
+
+    price_min = _number(params, 'price_min')
+    if price_min is not None:
+        queryset = queryset.filter(price__gte=price_min)
+
+    price_max = _number(params, 'price_max')
+    if price_max is not None:
+        queryset = queryset.filter(price__lte=price_max)
+
+    # param=Цвет:черный — значения параметров
+    wanted = []
+    for raw in params.getlist('param'):
+        name, sep, value = raw.partition(':')
+        if not sep or not name:
+            raise ValueError("param должен иметь вид Название:значение")
+        wanted.append((name, value))
+
+    if wanted:
+        parameter_ids = dict(Parameter.objects.filter(name__in={n for n, _ in wanted}).values_list('name', 'pk'))
+        for name, value in wanted:
+            # Некоррелированный подзапрос читается только из индекса (parameter, value, product_info)
+            matching = ProductParameter.objects.filter(parameter_id=parameter_ids.get(name), value=value)
+            queryset = queryset.filter(pk__in=matching.values('product_info_id'))
+
+    return queryset
+
+
+def _date(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        date = parse_date(value)
+    except ValueError:
+        date = None
+    if date is None:
+        raise ValueError(f"Некорректная дата {name}, ожидается ГГГГ-ММ-ДД")
+    return date
+
+
+def filter_orders(queryset, params):
+    """
+    Фильтры истории заказов:
+    - status — статус заказа, можно передать несколько раз
+    - date_from, date_to — дата оформления (ГГГГ-ММ-ДД), включительно
+    При некорректных значениях выбрасывает ValueError.
+    """
+    statuses = params.getlist('status')
+    if statuses:
+        unknown = set(statuses) - set(Order.Status.values)
+        if unknown:
+            raise ValueError(f"Неизвестный статус заказа: {', '.join(sorted(unknown))}")
+        queryset = queryset.filter(status__in=statuses)
+
+    date_from = _date(params, 'date_from')
+    if date_from is not None:
+        queryset = queryset.filter(dt__date__gte=date_from)
+
+    date_to = _date(params, 'date_to')
+    if date_to is not None:
+        queryset = queryset.filter(dt__date__lte=date_to)
+
+    return queryset
@@ -0,0 +1,68 @@
+"""
+Идемпотентные запросы по заголовку Idempotency-Key.
+
+Клиент передаёт уникальный ключ на каждую попытку операции (например, uuid4 на оформление
+заказа) и повторяет запрос с тем же ключом при таймауте. Первый ответ сохраняется в кэше
+на IDEMPOTENCY_TTL секунд, повторы получают его без повторного выполнения операции.
+"""
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def idempotent(view_method):
+    """
+    Декоратор метода APIView. Без заголовка Idempotency-Key запрос выполняется как обычно.
+    С ключом:
+    - ответ уже сохранён — возвращается он же (заголовок Idempotent-Replayed: true);
+    - запрос с этим ключом ещё выполняется — 409;
+    - ключ использован с другим телом запроса — 422.
+    Ответы 5xx не сохраняются: такой запрос можно повторить.
+    """
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({"status": "ok", "detail": "Слишком длинный Idempotency-Key"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Ключи разных пользователей и разных операций не пересекаются
+        digest = hashlib.sha256(f"{request.user.pk}:{request.path}:{key}".encode("utf-8")).hexdigest()
+        cache_key = f"idempotency:{digest}"
+        fingerprint = hashlib.md5(json.dumps(request.data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+        stored = cache.get(cache_key)
+        if stored is None:
+            # Параллельный повтор не должен выполнить операцию второй раз
+            if not cache.add(f"{cache_key}:lock", 1, settings.IDEMPOTENCY_LOCK_TIMEOUT):
+                return Response({"status": "ok", "detail": "Запрос с этим Idempotency-Key ещё выполняется"},
+                                status=status.HTTP_409_CONFLICT)
+            try:
+                # Ответ мог быть сохранён, пока мы брали блокировку
+                stored = cache.get(cache_key)
+                if stored is None:
+                    response = view_method(self, request, *args, **kwargs)
+                    if response.status_code < 500:
+                        stored = {"fingerprint": fingerprint, "status": response.status_code, "data": response.data}
+                        cache.set(cache_key, stored, settings.IDEMPOTENCY_TTL)
+                    return response
+            finally:
+                cache.delete(f"{cache_key}:lock")
+
+        if stored["fingerprint"] != fingerprint:
+            return Response({"status": "ok", "detail": "Idempotency-Key уже использован с другим запросом"},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        return Response(stored["data"], status=stored["status"], headers={"Idempotent-Replayed": "true"})
+
+    return wrapper
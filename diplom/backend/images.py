@@ -0,0 +1,92 @@
+"""
+Варианты картинок товаров под размер экрана и формат (AVIF, WebP, JPEG).
+
+Варианты не создаются заранее: первый запрос /images/<вид>/<pk>/<версия>/<ширина>.<формат>
+генерирует файл и сохраняет его рядом с оригиналом, следующие отдают готовый.
+Версия в url — начало отпечатка содержимого картинки (image_hash), поэтому ответ
+не меняется никогда и кэшируется клиентами и CDN с Cache-Control: immutable;
+новая картинка получает новый url.
+"""
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps, features
+
+# Форматы: расширение в url -> (формат Pillow, Content-Type)
+FORMATS = {
+    "avif": ("AVIF", "image/avif"),
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+# Длина версии в url
+VERSION_LENGTH = 16
+
+
+def variant_formats():
+    """Форматы из IMAGE_VARIANT_FORMATS, которые поддерживает установленный Pillow."""
+    return [fmt for fmt in settings.IMAGE_VARIANT_FORMATS if fmt == "jpeg" or features.check(fmt)]
+
+
+def image_version(fieldfile, content_hash):
+    """
+    Версия картинки для url: начало sha256 содержимого. Для картинок, загруженных до появления
+    отпечатков, — отпечаток имени файла (хранилище не перезаписывает файлы, новое содержимое = новое имя).
+    """
+    if content_hash:
+        return content_hash[:VERSION_LENGTH]
+    return hashlib.sha256(fieldfile.name.encode("utf-8")).hexdigest()[:VERSION_LENGTH]
+
+
+def variant_urls(kind, pk, fieldfile, content_hash):
+    """{формат: {ширина: url}} для картинки или None, если её нет."""
+    if not fieldfile:
+        return None
+    version = image_version(fieldfile, content_hash)
+    return {
+        fmt: {
+            str(width): reverse("image_variant", args=(kind, pk, version, width, fmt))
+            for width in settings.IMAGE_VARIANT_WIDTHS
+        }
+        for fmt in variant_formats()
+    }
+
+
+def variant_name(fieldfile, version, width, fmt):
+    """Путь варианта в хранилище: рядом с оригиналом, версия в имени."""
+    base, _ = os.path.splitext(fieldfile.name)
+    return f"{base}.{version}.{width}.{fmt}"
+
+
+def get_variant(fieldfile, version, width, fmt):
+    """Путь готового варианта в хранилище; при первом запросе вариант создаётся."""
+    name = variant_name(fieldfile, version, width, fmt)
+    if default_storage.exists(name):
+        return name
+
+    content = render_variant(fieldfile, width, fmt)
+    saved = default_storage.save(name, ContentFile(content))
+    if saved != name:
+        # Вариант одновременно создал другой запрос — хранилище дало нашему файлу другое имя
+        default_storage.delete(saved)
+    return name
+
+
+def render_variant(fieldfile, width, fmt):
+    pillow_format, _ = FORMATS[fmt]
+    with fieldfile.open("rb") as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        # Не увеличиваем: вариант шире оригинала совпадает с ним по размеру
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        if fmt == "jpeg" or image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB" if fmt == "jpeg" or "A" not in image.getbands() else "RGBA")
+
+        buffer = io.BytesIO()
+        image.save(buffer, pillow_format, quality=settings.IMAGE_VARIANT_QUALITY[fmt])
+        return buffer.getvalue()
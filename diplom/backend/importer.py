@@ -0,0 +1,531 @@
+"""
+Движок импорта прайс-листов поставщиков.
+
+Вместо цепочки get_or_create/save() на каждую строку файла импортёр заранее
+загружает существующие ключи (категории, товары, параметры, ProductInfo
+магазина) в словари и пишет в БД пачками через bulk_create(update_conflicts=True):
+один upsert-запрос на пачку.
+
+Повторные загрузки того же прайс-листа дифференциальные: для каждой строки
+считается отпечаток (import_hash), и в БД пишутся только изменившиеся строки.
+"""
+import hashlib
+import json
+import math
+
+from django.db import transaction
+
+from . import search
+from .catalog_cache import bump_catalog_version, stock_changed
+from .models import Shop, Category, Product, Parameter, ProductInfo, ProductParameter
+
+# Сколько строк файла обрабатываем за один проход (одна пачка запросов)
+IMPORT_BATCH_SIZE = 500
+
+# Категория по умолчанию, если в строке она не указана
+DEFAULT_CATEGORY = "Без категории"
+
+# Поля ProductInfo, которые обновляет импорт
+PRODUCT_INFO_FIELDS = ("name", "quantity", "price", "price_rrc", "external_id", "import_hash")
+
+# Сколько ошибок по строкам сохраняем для ответа клиенту
+MAX_ERRORS = 100
+
+# Допустимые значения чисел в строке: id поставщика (PositiveBigIntegerField),
+# остаток (PositiveIntegerField) и цены
+MAX_EXTERNAL_ID = 2 ** 63 - 1
+MAX_QUANTITY = 2 ** 31 - 1
+MAX_PRICE = 10 ** 12
+
+
+def _max_length(model, field):
+    return model._meta.get_field(field).max_length
+
+
+def import_price_list(price_list, deactivate_missing=False, on_batch=None):
+    """
+    Импортирует прайс-лист (backend.price_lists.PriceList): находит (или создаёт) магазин
+    и запускает ProductImporter. Товары читаются из файла по мере записи пачек.
+    deactivate_missing — обнулить остаток у товаров магазина, которых нет в файле.
+    on_batch(importer) вызывается после записи каждой пачки — для отчёта о прогрессе.
+    """
+    # Ищем магазин по имени из файла, если нет — создаём
+    shop, _ = Shop.objects.get_or_create(name=price_list.shop_name)
+
+    importer = ProductImporter(
+        shop,
+        categories=price_list.categories,
+        deactivate_missing=deactivate_missing,
+        on_batch=on_batch,
+    )
+    return importer.run(price_list)
+
+
+def fingerprint(row):
+    """Отпечаток строки прайс-листа: товар, категория, цена, РРЦ, остаток, название у магазина и параметры."""
+    data = [row["product"], row["category"], sorted(row["values"].items()), sorted(row["parameters"].items())]
+    return hashlib.md5(json.dumps(data, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ProductImporter:
+    """
+    Импорт товаров одного магазина.
+
+    Использование:
+        stats = ProductImporter(shop).run(items)
+
+    items — любой итерируемый объект со словарями товаров в формате
+    {"id", "name", "category", "name_in_shop", "quantity", "price", "price_rrc", "parameters"}.
+    id — идентификатор товара у поставщика (external_id): по нему повторный импорт находит
+    предложение одним словарём, без поиска категории и товара по названию.
+    categories — справочник поставщика {id: название}, если товары ссылаются на категорию по id.
+    deactivate_missing — после импорта обнулить остаток у предложений магазина, которых не было в файле.
+
+    Возвращает счётчики created/updated/unchanged (строки, пропущенные без записи в БД)/deactivated,
+    число прочитанных строк и ошибки по строкам.
+    """
+
+    def __init__(self, shop, categories=None, deactivate_missing=False, batch_size=IMPORT_BATCH_SIZE, on_batch=None):
+        self.shop = shop
+        self.category_names = {str(k): v for k, v in (categories or {}).items()}
+        self.deactivate_missing = deactivate_missing
+        self.batch_size = batch_size
+        self.on_batch = on_batch
+        self.stats = {"created": 0, "updated": 0, "unchanged": 0, "deactivated": 0}
+        self.errors = []
+        self.rows = 0
+
+        # Словари "ключ -> id", заполняются один раз перед импортом
+        self._categories = {}
+        self._parameters = {}
+        # product_id -> текущие значения ProductInfo этого магазина
+        self._infos = {}
+        # external_id -> product_id
+        self._by_external = {}
+        # product_id -> (название товара, категория) предложений магазина
+        self._products = {}
+        # external_id, уже встретившиеся в файле: id строк должны быть уникальны
+        self._file_ids = set()
+        # Категории, уже привязанные к магазину
+        self._shop_categories = set()
+        # product_id предложений, созданных в текущей пачке
+        self._created = set()
+        # product_id всех предложений, встретившихся в файле
+        self._seen = set()
+        # Изменения остатков в текущей пачке: pk -> (старый, новый) и product_id строк,
+        # у которых изменился только остаток
+        self._stock = {}
+        self._stock_only = set()
+        # Импорт изменил что-то кроме остатков — кэш каталога нужно сбросить
+        self._catalog_changed = False
+
+    def run(self, items):
+        """Обрабатывает все строки пачками по batch_size."""
+        self._preload()
+
+        batch = []
+        for item in items:
+            self.rows += 1
+            row = self._clean(item)
+            if row is None:
+                continue
+
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+
+        if batch:
+            self._flush(batch)
+
+        if self.deactivate_missing:
+            self._deactivate_missing()
+
+        # Фасеты и страницы каталога пересчитываются, только если изменились не одни остатки
+        if self._catalog_changed:
+            bump_catalog_version()
+
+        return {**self.stats, "rows": self.rows, "errors": self.errors}
+
+    def _flush(self, batch):
+        self._process_batch(batch)
+        if self.on_batch:
+            self.on_batch(self)
+
+    # Подготовка данных
+
+    def _preload(self):
+        # Категории и параметры — небольшие справочники, грузим целиком.
+        # Имена не уникальны в БД, поэтому берём самую раннюю запись, как get_or_create.
+        for pk, name in Category.objects.order_by('-pk').values_list('pk', 'name'):
+            self._categories[name] = pk
+        for pk, name in Parameter.objects.order_by('-pk').values_list('pk', 'name'):
+            self._parameters[name] = pk
+
+        # Текущие предложения магазина: по ним определяем, создавать или обновлять
+        rows = ProductInfo.objects.filter(shop=self.shop).values(
+            'pk', 'product_id', 'product__name', 'product__category__name', *PRODUCT_INFO_FIELDS
+        )
+        for row in rows:
+            product_id = row.pop('product_id')
+            self._products[product_id] = (row.pop('product__name'), row.pop('product__category__name'))
+            self._infos[product_id] = row
+            if row["external_id"] is not None:
+                self._by_external[row["external_id"]] = product_id
+
+        links = Category.shops.through.objects.filter(shop=self.shop)
+        self._shop_categories = set(links.values_list('category_id', flat=True))
+
+    def _error(self, message, row=None):
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"row": self.rows if row is None else row, "error": message})
+
+    def _clean(self, item):
+        """Приводит строку файла к единому виду или возвращает None, если строку нужно пропустить."""
+        if not isinstance(item, dict):
+            self._error("Строка должна быть объектом")
+            return None
+
+        # Товар без названия пропускаем
+        product_name = item.get("name")
+        if not product_name:
+            self._error("Не указано название товара")
+            return None
+
+        # None (пустая ячейка Excel) означает "значение не передано"
+        values = {}
+        try:
+            if item.get("id") is not None:
+                values["external_id"] = int(item["id"])
+            if item.get("name_in_shop") is not None:
+                values["name"] = str(item["name_in_shop"])
+            if item.get("quantity") is not None:
+                values["quantity"] = int(item["quantity"])
+            if item.get("price") is not None:
+                values["price"] = float(item["price"])
+            if item.get("price_rrc") is not None:
+                values["price_rrc"] = float(item["price_rrc"])
+        except (TypeError, ValueError, OverflowError):
+            self._error("Некорректное число в id, цене или количестве")
+            return None
+
+        if values.get("quantity", 0) < 0:
+            self._error("Количество не может быть отрицательным")
+            return None
+        if values.get("quantity", 0) > MAX_QUANTITY:
+            self._error(f"Количество больше {MAX_QUANTITY}")
+            return None
+        if not 0 <= values.get("external_id", 0) <= MAX_EXTERNAL_ID:
+            self._error("id вне допустимого диапазона")
+            return None
+        for field in ("price", "price_rrc"):
+            if field in values and not (math.isfinite(values[field]) and 0 <= values[field] <= MAX_PRICE):
+                self._error(f"Цена вне допустимого диапазона: {item[field]}")
+                return None
+
+        # Два предложения с одним id нарушили бы уникальность (магазин, id) — вторую строку отклоняем
+        external_id = values.get("external_id")
+        if external_id is not None:
+            if external_id in self._file_ids:
+                self._error(f"Повторяющийся id {external_id}")
+                return None
+            self._file_ids.add(external_id)
+
+        params = item.get("parameters") or {}
+        if not isinstance(params, dict):
+            self._error("parameters должен быть объектом")
+            return None
+
+        # Категория задаётся названием или id из справочника categories
+        category = item.get("category")
+        category = self.category_names.get(str(category), category) if category is not None else None
+
+        row = {
+            "line": self.rows,
+            "product": str(product_name),
+            "category": str(category or DEFAULT_CATEGORY),
+            "values": values,
+            "parameters": {str(k): str(v) for k, v in params.items()},
+        }
+
+        # Длину строк проверяем здесь: на PostgreSQL слишком длинное значение в bulk_create
+        # (DataError) откатило бы весь файл
+        strings = [
+            ("Название товара", row["product"], _max_length(Product, "name")),
+            ("Категория", row["category"], _max_length(Category, "name")),
+            ("Название у магазина", values.get("name", ""), _max_length(ProductInfo, "name")),
+        ]
+        for name, value in row["parameters"].items():
+            strings.append(("Название параметра", name, _max_length(Parameter, "name")))
+            strings.append((f"Значение параметра {name}", value, _max_length(ProductParameter, "value")))
+        for label, value, limit in strings:
+            if len(value) > limit:
+                self._error(f"{label} длиннее {limit} символов")
+                return None
+
+        row["fingerprint"] = fingerprint(row)
+        return row
+
+    # Запись пачки
+
+    @transaction.atomic
+    def _process_batch(self, batch):
+        # Строки с известным external_id сразу сопоставляются с предложением магазина,
+        # категорию и товар ищем по названию только для остальных
+        rows = {}
+        unmatched = []
+        # Предложения, найденные по id, у которых в файле другой товар или категория: product_id -> строка
+        relinked = {}
+        for row in batch:
+            product_id = self._by_external.get(row["values"].get("external_id"))
+            if product_id is None:
+                unmatched.append(row)
+            elif self._products.get(product_id) != (row["product"], row["category"]):
+                relinked[product_id] = row
+                unmatched.append(row)
+            else:
+                self._take(rows, product_id, row)
+
+        moved = {}
+        if unmatched:
+            category_ids = self._resolve_names(Category, self._categories, {r["category"] for r in unmatched})
+            self._link_categories(category_ids.values())
+            product_ids = self._resolve_products(unmatched, category_ids)
+            old_ids = {id(row): product_id for product_id, row in relinked.items()}
+
+            for row in unmatched:
+                product_id = product_ids[(row["product"], category_ids[row["category"]])]
+                old_id = old_ids.get(id(row))
+                if old_id is not None and old_id != product_id:
+                    if (product_id in self._infos or product_id in rows or product_id in moved.values()
+                            or product_id in self._seen):
+                        self._error("У магазина уже есть предложение этого товара с другим id", row["line"])
+                        continue
+                    moved[old_id] = product_id
+                    # Название у магазина не задано — берётся новое название товара, как при создании
+                    row["values"].setdefault("name", row["product"])
+                    rows[product_id] = row
+                else:
+                    self._take(rows, product_id, row)
+
+        if moved:
+            self._move_offers(moved)
+
+        parameter_ids = self._resolve_names(
+            Parameter, self._parameters, {name for row in rows.values() for name in row["parameters"]}
+        )
+
+        changed, dirty = self._write_product_infos(rows)
+        changed |= set(moved.values())
+        params_changed = self._write_parameters({pid: rows[pid] for pid in dirty}, parameter_ids)
+        changed |= params_changed
+
+        # Поисковый индекс обновляем только для строк, где изменилось что-то кроме остатка
+        reindex = (dirty - self._stock_only) | params_changed
+        if reindex:
+            search.reindex(self._infos[pid]["pk"] for pid in reindex)
+
+        # Остатки патчат кэш каталога точечно, остальные изменения сбрасывают его целиком
+        stock_changed(self._stock)
+        if self._created or (changed - self._stock_only) or params_changed:
+            self._catalog_changed = True
+
+        self._seen.update(rows)
+        for product_id, row in rows.items():
+            self._products[product_id] = (row["product"], row["category"])
+        for product_id in rows:
+            if product_id in self._created:
+                self.stats["created"] += 1
+            elif product_id in changed:
+                self.stats["updated"] += 1
+            else:
+                self.stats["unchanged"] += 1
+
+    def _take(self, rows, product_id, row):
+        """
+        Добавляет строку к пачке. Несколько строк файла с одним товаром (и разными id) дали бы
+        одно предложение: действует первая по порядку в файле, остальные — ошибки строк.
+        """
+        earlier = rows.get(product_id)
+        if product_id in self._seen or (earlier is not None and earlier["line"] < row["line"]):
+            self._error("Товар уже встречался в файле выше", row["line"])
+            return
+        if earlier is not None:
+            self._error("Товар уже встречался в файле выше", earlier["line"])
+        rows[product_id] = row
+
+    def _move_offers(self, moved):
+        """
+        Привязывает предложения к другим товарам {старый product_id: новый}: поставщик сменил
+        у своего id название товара или категорию. Предложение (id, остатки, картинка) сохраняется.
+        """
+        ProductInfo.objects.bulk_update(
+            [ProductInfo(pk=self._infos[old]["pk"], product_id=new) for old, new in moved.items()], ['product'],
+        )
+        for old, new in moved.items():
+            info = self._infos[new] = self._infos.pop(old)
+            self._products.pop(old, None)
+            if info["external_id"] is not None:
+                self._by_external[info["external_id"]] = new
+
+    def _resolve_names(self, model, cache, names):
+        """Возвращает {name: id}, создавая недостающие записи одним bulk_create."""
+        missing = [name for name in names if name not in cache]
+        if missing:
+            model.objects.bulk_create([model(name=name) for name in missing])
+            for pk, name in model.objects.filter(name__in=missing).order_by('-pk').values_list('pk', 'name'):
+                cache[name] = pk
+        return {name: cache[name] for name in names}
+
+    def _link_categories(self, category_ids):
+        """Привязывает категории к магазину (Category.shops) одним bulk_create."""
+        missing = set(category_ids) - self._shop_categories
+        if missing:
+            through = Category.shops.through
+            through.objects.bulk_create(
+                [through(category_id=pk, shop_id=self.shop.pk) for pk in missing],
+                ignore_conflicts=True,
+            )
+            self._shop_categories |= missing
+
+    def _resolve_products(self, batch, category_ids):
+        """Возвращает {(name, category_id): product_id} для всех товаров пачки."""
+        keys = {(r["product"], category_ids[r["category"]]) for r in batch}
+        names = {name for name, _ in keys}
+
+        def load():
+            found = {}
+            qs = Product.objects.filter(name__in=names).order_by('-pk').values_list('pk', 'name', 'category_id')
+            for pk, name, category_id in qs:
+                found[(name, category_id)] = pk
+            return found
+
+        found = load()
+        missing = keys - found.keys()
+        if missing:
+            Product.objects.bulk_create([Product(name=name, category_id=cid) for name, cid in missing])
+            found = load()
+        return found
+
+    def _write_product_infos(self, rows):
+        """
+        Создаёт новые и обновляет изменившиеся ProductInfo.
+        Возвращает (product_id с изменёнными полями, product_id с другим отпечатком).
+        Параметры нужно сверять только для второго множества.
+        """
+        to_write = []
+        changed = set()
+        dirty = set()
+        self._created.clear()
+        self._stock = {}
+        self._stock_only = set()
+
+        for product_id, row in rows.items():
+            values = row["values"]
+            current = self._infos.get(product_id)
+
+            if current is None:
+                self._created.add(product_id)
+                current = {
+                    "name": row["product"],
+                    "quantity": 0,
+                    "price": 0,
+                    "price_rrc": 0,
+                    "external_id": None,
+                    "import_hash": "",
+                    **values,
+                }
+            else:
+                # Поля сверяем и с БД: остаток мог измениться заказами после прошлого импорта
+                same_values = all(current[field] == value for field, value in values.items())
+                if same_values and current["import_hash"] == row["fingerprint"]:
+                    continue
+                if not same_values:
+                    fields = {field for field, value in values.items() if current[field] != value}
+                    if "quantity" in fields:
+                        self._stock[current["pk"]] = (current["quantity"], values["quantity"])
+                    if fields == {"quantity"}:
+                        self._stock_only.add(product_id)
+                    self._by_external.pop(current["external_id"], None)
+                    current.update(values)
+                    changed.add(product_id)
+
+            if current["import_hash"] != row["fingerprint"]:
+                current["import_hash"] = row["fingerprint"]
+                dirty.add(product_id)
+
+            if current["external_id"] is not None:
+                self._by_external[current["external_id"]] = product_id
+
+            to_write.append(ProductInfo(
+                product_id=product_id,
+                shop=self.shop,
+                **{field: current[field] for field in PRODUCT_INFO_FIELDS}
+            ))
+
+        if to_write:
+            # Один INSERT ... ON CONFLICT DO UPDATE и для новых, и для изменившихся строк.
+            # Заодно защищает от гонки с параллельным импортом того же магазина.
+            ProductInfo.objects.bulk_create(
+                to_write,
+                update_conflicts=True,
+                unique_fields=("product", "shop"),
+                update_fields=PRODUCT_INFO_FIELDS,
+            )
+
+        if self._created:
+            qs = ProductInfo.objects.filter(shop=self.shop, product_id__in=self._created)
+            for row in qs.values('pk', 'product_id', *PRODUCT_INFO_FIELDS):
+                self._infos[row.pop('product_id')] = row
+
+        return changed, dirty
+
+    def _deactivate_missing(self):
+        """Обнуляет остаток у предложений магазина, которых не было в файле."""
+        # Строка с ошибкой не попала в _seen — не снимаем с продажи то, что просто не удалось прочитать
+        if self.errors:
+            self._error("Снятие с продажи отсутствующих товаров пропущено: в файле есть ошибки")
+            return
+
+        missing = [
+            info for product_id, info in self._infos.items()
+            if product_id not in self._seen and info["quantity"] > 0
+        ]
+        for start in range(0, len(missing), self.batch_size):
+            chunk = missing[start:start + self.batch_size]
+            self.stats["deactivated"] += ProductInfo.objects.filter(pk__in=[info["pk"] for info in chunk]).update(quantity=0)
+            stock_changed({info["pk"]: (info["quantity"], 0) for info in chunk})
+
+    def _write_parameters(self, rows, parameter_ids):
+        """Создаёт и обновляет значения параметров. Возвращает множество изменённых product_id."""
+        info_ids = {product_id: self._infos[product_id]["pk"] for product_id, row in rows.items() if row["parameters"]}
+        if not info_ids:
+            return set()
+
+        # Существующие значения нужны только для уже существовавших предложений
+        existing = {}
+        old_ids = [pk for product_id, pk in info_ids.items() if product_id not in self._created]
+        if old_ids:
+            qs = ProductParameter.objects.filter(product_info_id__in=old_ids)
+            for info_id, parameter_id, value in qs.values_list('product_info_id', 'parameter_id', 'value'):
+                existing[(info_id, parameter_id)] = value
+
+        to_write = []
+        changed = set()
+
+        for product_id, info_id in info_ids.items():
+            for name, value in rows[product_id]["parameters"].items():
+                key = (info_id, parameter_ids[name])
+                if existing.get(key) != value:
+                    to_write.append(ProductParameter(product_info_id=info_id, parameter_id=key[1], value=value))
+                    changed.add(product_id)
+
+        if to_write:
+            ProductParameter.objects.bulk_create(
+                to_write,
+                update_conflicts=True,
+                unique_fields=("product_info", "parameter"),
+                update_fields=("value",),
+            )
+
+        return changed
@@ -0,0 +1,81 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from backend.models import Shop, Category, Product, ProductInfo
+from backend.serializers import ProductInfoSerializer
+from backend.views import CatalogAPIView
+
+
+def legacy_catalog():
+    """Прежний каталог: все предложения одним ответом, товар и магазин — отдельными запросами."""
+    return ProductInfoSerializer(ProductInfo.objects.filter(quantity__gt=0), many=True).data
+
+
+class Command(BaseCommand):
+    help = "Число запросов и время на страницу каталога в сравнении с выдачей всего каталога. Данные откатываются."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--offers", type=int, default=10000, help="Сколько предложений создать")
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--pages", type=int, default=20, help="Сколько страниц пройти по ссылкам next")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._populate(options["offers"])
+            self._bench_pages(options["page_size"], options["pages"], "сборка страниц")
+            # Повторный проход читает снимки страниц из кэша
+            self._bench_pages(options["page_size"], options["pages"], "из кэша")
+            self._bench_legacy()
+
+            # Бенчмарк не должен оставлять данных в БД
+            transaction.set_rollback(True)
+
+    def _populate(self, offers):
+        shops = Shop.objects.bulk_create([Shop(name=f"bench-shop-{i}") for i in range(10)])
+        categories = Category.objects.bulk_create([Category(name=f"bench-category-{i}") for i in range(50)])
+        products = Product.objects.bulk_create([
+            Product(name=f"bench-product-{i}", category=categories[i % len(categories)]) for i in range(offers)
+        ])
+        ProductInfo.objects.bulk_create([
+            ProductInfo(product=p, shop=shops[i % len(shops)], name=p.name, quantity=1 + i % 10,
+                        price=100 + i, price_rrc=120 + i)
+            for i, p in enumerate(products)
+        ], batch_size=1000)
+        self.stdout.write(f"Предложений: {offers}")
+
+    def _bench_pages(self, page_size, pages, label):
+        factory = APIRequestFactory()
+        # Throttle отключаем: бенчмарк делает больше запросов, чем разрешено в минуту
+        view = CatalogAPIView.as_view(throttle_classes=[])
+        url = f"/catalog/?page_size={page_size}"
+        queries = []
+        started = time.perf_counter()
+
+        for _ in range(pages):
+            with CaptureQueriesContext(connection) as ctx:
+                response = view(factory.get(url, HTTP_HOST="localhost"))
+                response.render()
+            queries.append(len(ctx.captured_queries))
+            url = response.data["next"]
+            if not url:
+                break
+
+        elapsed = (time.perf_counter() - started) / len(queries)
+        self.stdout.write(
+            f"Страницы по {page_size} ({label}): {len(queries)} шт., запросов на страницу {min(queries)}..{max(queries)}, "
+            f"{elapsed * 1000:.1f} мс на страницу"
+        )
+
+    def _bench_legacy(self):
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            items = legacy_catalog()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Весь каталог одним ответом: {len(items)} предложений, {len(ctx.captured_queries)} запросов, "
+            f"{elapsed * 1000:.0f} мс"
+        )
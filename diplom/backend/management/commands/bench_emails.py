@@ -0,0 +1,38 @@
+import time
+
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from backend.emails import queue_email, send_pending
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает отправку писем по одному (send_mail, соединение на письмо) и пачками из очереди "
+            "(одно соединение на пачку), писем в секунду. Данные очереди откатываются.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--emails", type=int, default=2000, help="Сколько писем отправить")
+        parser.add_argument("--backend", default="django.core.mail.backends.locmem.EmailBackend",
+                            help="Почтовый бэкенд (для замера SMTP — django.core.mail.backends.smtp.EmailBackend)")
+
+    def handle(self, *args, **options):
+        count = options["emails"]
+        recipients = [f"bench{i}@example.com" for i in range(count)]
+        self.stdout.write(f"Писем: {count}, бэкенд: {options['backend']}")
+
+        with override_settings(EMAIL_BACKEND=options["backend"]):
+            started = time.perf_counter()
+            for email in recipients:
+                send_mail("Заказ", "Ваш заказ оформлен.", None, [email])
+            single = time.perf_counter() - started
+
+            with transaction.atomic():
+                queue_email("registration_confirmation", recipients, {"link": "https://example.com/confirm"})
+                result = send_pending()
+                # Бенчмарк не должен оставлять писем в БД
+                transaction.set_rollback(True)
+
+        self.stdout.write(f"  по одному: {count / single:10.0f} писем/с")
+        self.stdout.write(f"     пачкой: {result['per_second']:10.0f} писем/с (отправлено {result['sent']})")
@@ -0,0 +1,93 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from backend.importer import ProductImporter
+from backend.models import Shop, Category, Product, Parameter, ProductInfo, ProductParameter
+
+
+def generate_items(rows, price_shift=0):
+    """Синтетический прайс-лист: 50 категорий, 4 параметра у каждого товара."""
+    for i in range(rows):
+        yield {
+            "name": f"Товар {i}",
+            "category": f"Категория {i % 50}",
+            "quantity": i % 20,
+            "price": 1000 + i + price_shift,
+            "price_rrc": 1200 + i,
+            "parameters": {
+                "Цвет": ("черный", "белый", "красный")[i % 3],
+                "Память (Гб)": 64 * (1 + i % 4),
+                "Вес (г)": 150 + i % 50,
+                "Артикул": i,
+            },
+        }
+
+
+def legacy_import(shop, items):
+    """Прежний построчный импорт SimpleProductImportView — для сравнения."""
+    for item in items:
+        category, _ = Category.objects.get_or_create(name=item.get("category", "Без категории"))
+        product, _ = Product.objects.get_or_create(name=item.get("name"), category=category)
+        pi, is_created = ProductInfo.objects.get_or_create(
+            product=product,
+            shop=shop,
+            defaults={
+                "name": item.get("name_in_shop", item.get("name")),
+                "quantity": item.get("quantity", 0),
+                "price": item.get("price", 0),
+                "price_rrc": item.get("price_rrc", 0),
+            }
+        )
+        if not is_created:
+            pi.name = item.get("name_in_shop", pi.name)
+            pi.quantity = item.get("quantity", pi.quantity)
+            pi.price = item.get("price", pi.price)
+            pi.price_rrc = item.get("price_rrc", pi.price_rrc)
+            pi.save()
+
+        for key, val in item.get("parameters", {}).items():
+            param, _ = Parameter.objects.get_or_create(name=key)
+            pp, pp_created = ProductParameter.objects.get_or_create(
+                product_info=pi, parameter=param, defaults={"value": val}
+            )
+            if not pp_created:
+                pp.value = val
+                pp.save()
+
+
+def bulk_import(shop, items):
+    ProductImporter(shop).run(items)
+
+
+class Command(BaseCommand):
+    help = "Сравнивает скорость построчного и пакетного импорта (строк в секунду). Данные откатываются."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000, help="Размер синтетического прайс-листа")
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        self.stdout.write(f"Строк в прайс-листе: {rows}")
+
+        for label, func in (("построчно", legacy_import), ("пакетно", bulk_import)):
+            with transaction.atomic():
+                shop = Shop.objects.create(name=f"bench-{label}")
+
+                # Первая загрузка — всё создаётся, повторная — все цены изменились
+                first = self._measure(func, shop, generate_items(rows))
+                second = self._measure(func, shop, generate_items(rows, price_shift=1))
+
+                # Бенчмарк не должен оставлять данных в БД
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f"{label:>10}: загрузка {rows / first:10.0f} строк/с, "
+                f"повторная загрузка {rows / second:10.0f} строк/с"
+            )
+
+    def _measure(self, func, shop, items):
+        started = time.perf_counter()
+        func(shop, items)
+        return time.perf_counter() - started
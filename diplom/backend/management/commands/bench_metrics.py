@@ -0,0 +1,57 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+from backend import metrics
+
+
+class Command(BaseCommand):
+    help = ("Накладные расходы сбора метрик (MetricsMiddleware): время ответа с метриками и без них "
+            "на одном url, мкс на запрос.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="/catalog/", help="Какой url запрашивать")
+        parser.add_argument("--requests", type=int, default=2000, help="Запросов в каждом варианте")
+        parser.add_argument("--rounds", type=int, default=5, help="Сколько раз чередовать варианты")
+
+    def handle(self, *args, **options):
+        url, count = options["url"], options["requests"]
+        without = [name for name in settings.MIDDLEWARE if name != "backend.metrics.MetricsMiddleware"]
+        variants = {"без метрик": without, "с метриками": ["backend.metrics.MetricsMiddleware", *without]}
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else "localhost"
+
+        timings = {name: [] for name in variants}
+        # Лимиты запросов отключены: иначе замер быстро упрётся в 429
+        rest_framework = {**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_CLASSES": []}
+        with override_settings(METRICS_ENABLED=True, REST_FRAMEWORK=rest_framework):
+            # Варианты чередуются, чтобы прогрев и фоновая нагрузка сказались на обоих одинаково
+            for _ in range(options["rounds"]):
+                for name, middleware in variants.items():
+                    with override_settings(MIDDLEWARE=middleware):
+                        client = Client(HTTP_HOST=host)
+                        client.get(url)
+                        started = time.perf_counter()
+                        for _ in range(count):
+                            client.get(url)
+                        timings[name].append((time.perf_counter() - started) / count)
+
+            # Отдельно — стоимость записи наблюдений одного запроса, без обработки самого запроса
+            request = client.get(url).wsgi_request
+            response = client.get(url)
+            started = time.perf_counter()
+            for _ in range(count):
+                metrics.record_request(request, response, 0.01, 3, 0.002)
+            record = (time.perf_counter() - started) / count
+            metrics.counters.flush()
+
+        base, instrumented = (statistics.median(timings[name]) for name in variants)
+        self.stdout.write(f"url: {url}, запросов: {count} x {options['rounds']}")
+        for name in variants:
+            self.stdout.write(f"  {name:12} {statistics.median(timings[name]) * 1e6:10.1f} мкс/запрос")
+        self.stdout.write(f"  накладные    {(instrumented - base) * 1e6:10.1f} мкс/запрос "
+                          f"({(instrumented - base) / base:+.1%})")
+        self.stdout.write(f"  запись наблюдений {record * 1e6:.1f} мкс/запрос")
@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import openpyxl
+import yaml
+from django.core.management.base import BaseCommand
+
+from backend.price_lists import PriceList
+
+# Примерный размер одной строки прайс-листа в JSON — по нему считаем число строк
+ROW_BYTES = len(json.dumps({
+    "name": "Товар 1000000", "category": "Категория 10", "price": 1001000, "price_rrc": 1201000,
+    "quantity": 10, "parameters": {"Цвет": "черный", "Память (Гб)": 128},
+}, ensure_ascii=False).encode("utf-8"))
+
+
+def generate_file(path, fmt, rows):
+    """Записывает синтетический прайс-лист построчно, не держа его в памяти."""
+    colors = ("черный", "белый", "красный")
+
+    if fmt == "xlsx":
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(["name", "category", "price", "price_rrc", "quantity"])
+        for i in range(rows):
+            ws.append([f"Товар {i}", f"Категория {i % 50}", 1000 + i, 1200 + i, i % 20])
+        wb.save(path)
+        return
+
+    with open(path, "w", encoding="utf-8") as f:
+        if fmt == "json":
+            f.write('{"shop": {"name": "Bench"}, "products": [\n')
+            for i in range(rows):
+                item = {
+                    "name": f"Товар {i}", "category": f"Категория {i % 50}", "price": 1000 + i,
+                    "price_rrc": 1200 + i, "quantity": i % 20,
+                    "parameters": {"Цвет": colors[i % 3], "Память (Гб)": 64 * (1 + i % 4)},
+                }
+                f.write(("," if i else "") + json.dumps(item, ensure_ascii=False) + "\n")
+            f.write("]}\n")
+        else:
+            f.write("shop:\n  name: Bench\nproducts:\n")
+            for i in range(rows):
+                f.write(
+                    f"  - name: Товар {i}\n    category: Категория {i % 50}\n"
+                    f"    price: {1000 + i}\n    price_rrc: {1200 + i}\n    quantity: {i % 20}\n"
+                    f"    parameters:\n      Цвет: {colors[i % 3]}\n      Память (Гб): {64 * (1 + i % 4)}\n"
+                )
+
+
+def read_streaming(path, fmt):
+    with open(path, "rb") as f:
+        return sum(1 for _ in PriceList(f, f"price.{fmt}"))
+
+
+def read_whole(path, fmt):
+    """Прежний способ: весь файл и все строки в памяти."""
+    with open(path, "rb") as f:
+        if fmt == "json":
+            return len(json.loads(f.read().decode("utf-8"))["products"])
+        if fmt == "yaml":
+            return len(yaml.safe_load(f.read())["products"])
+        return len(list(openpyxl.load_workbook(f).active.values)) - 1
+
+
+class Command(BaseCommand):
+    help = "Пиковая память при чтении большого сгенерированного прайс-листа (потоково и целиком)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size-mb", type=int, default=200, help="Размер прайс-листа в JSON-эквиваленте")
+        parser.add_argument("--format", choices=("json", "yaml", "xlsx"), default="json")
+        parser.add_argument("--compare", action="store_true", help="Также прочитать файл целиком, как раньше")
+
+    def handle(self, *args, **options):
+        fmt = options["format"]
+        rows = options["size_mb"] * 1024 * 1024 // ROW_BYTES
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, f"price.{fmt}")
+            generate_file(path, fmt, rows)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            self.stdout.write(f"Файл {fmt}: {size_mb:.0f} МБ, {rows} строк")
+
+            readers = [("потоково", read_streaming)]
+            if options["compare"]:
+                readers.append(("целиком", read_whole))
+
+            for label, reader in readers:
+                tracemalloc.start()
+                started = time.perf_counter()
+                count = reader(path, fmt)
+                elapsed = time.perf_counter() - started
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                self.stdout.write(
+                    f"{label:>9}: {count} строк за {elapsed:.1f} с, пик памяти {peak / 1024 / 1024:.1f} МБ"
+                )
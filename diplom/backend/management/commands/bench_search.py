@@ -0,0 +1,66 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from backend import search
+from backend.importer import ProductImporter
+from backend.management.commands.bench_import import generate_items
+from backend.models import Shop
+
+# Слово, которое есть в каждом документе синтетического каталога: худший случай для ранжирования
+BROAD_QUERY = "товар"
+
+
+def random_query(offers):
+    """Запросы бенчмарка: товар по номеру, префикс номера, категория с параметром."""
+    n = random.randrange(offers)
+    return random.choice((
+        f"товар {n}",
+        str(n)[:4],
+        f"катег {n % 50} {('черный', 'белый', 'красный')[n % 3]}",
+    ))
+
+
+class Command(BaseCommand):
+    help = "Задержка полнотекстового поиска (p50/p95) на синтетическом каталоге. Данные откатываются."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--offers", type=int, default=100000, help="Сколько предложений создать")
+        parser.add_argument("--queries", type=int, default=500, help="Сколько поисковых запросов выполнить")
+        parser.add_argument("--page-size", type=int, default=50)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            started = time.perf_counter()
+            shop = Shop.objects.create(name="bench-search-shop")
+            # Импорт сам наполняет поисковый индекс
+            ProductImporter(shop).run(generate_items(options["offers"]))
+            self.stdout.write(
+                f"Импорт и индексация {options['offers']} предложений: {time.perf_counter() - started:.1f} с"
+            )
+
+            timings = []
+            for _ in range(options["queries"]):
+                query = random_query(options["offers"])
+                started = time.perf_counter()
+                search.search(query, limit=options["page_size"])
+                timings.append((time.perf_counter() - started) * 1000)
+
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            self.stdout.write(
+                f"Запросов: {len(timings)}, p50 {statistics.median(timings):.1f} мс, "
+                f"p95 {p95:.1f} мс, max {timings[-1]:.1f} мс"
+            )
+
+            started = time.perf_counter()
+            search.search(BROAD_QUERY, limit=options["page_size"])
+            self.stdout.write(
+                f"Запрос, совпадающий со всем каталогом: {(time.perf_counter() - started) * 1000:.1f} мс"
+            )
+
+            # Бенчмарк не должен оставлять данных в БД
+            transaction.set_rollback(True)
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from easy_thumbnails.files import get_thumbnailer
+from PIL import Image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+class Command(BaseCommand):
+    help = ("Скорость генерации миниатюр THUMBNAIL_ALIASES по каталогу картинок (картинок и миниатюр в секунду). "
+            "Без --dir картинки генерируются. Созданные файлы удаляются.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", help="Каталог с картинками")
+        parser.add_argument("--images", type=int, default=50, help="Сколько картинок сгенерировать без --dir")
+        parser.add_argument("--size", type=int, default=2000, help="Сторона сгенерированной картинки (пикс)")
+        parser.add_argument("--workers", type=int, default=1, help="Число потоков")
+
+    def handle(self, *args, **options):
+        aliases = settings.THUMBNAIL_ALIASES[""]
+        source_dir = options["dir"] or tempfile.mkdtemp()
+        if not options["dir"]:
+            for i in range(options["images"]):
+                image = Image.effect_mandelbrot((options["size"], options["size"] * 3 // 4),
+                                                (-2 + i / 100, -1, 1, 1), 50).convert("RGB")
+                image.save(os.path.join(source_dir, f"sample{i}.jpg"), quality=90)
+        elif not os.path.isdir(source_dir):
+            raise CommandError(f"Нет каталога {source_dir}")
+
+        # Картинки копируются в хранилище медиафайлов — так же, как загруженные через модели
+        prefix = f"bench_thumbnails_{os.getpid()}"
+        names = []
+        for file_name in sorted(os.listdir(source_dir)):
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                with open(os.path.join(source_dir, file_name), "rb") as file:
+                    names.append(default_storage.save(f"{prefix}/{file_name}", file))
+        if not names:
+            raise CommandError("В каталоге нет картинок")
+
+        def generate(name):
+            try:
+                thumbnailer = get_thumbnailer(default_storage.open(name), relative_name=name)
+                for alias, alias_options in aliases.items():
+                    thumbnailer.get_thumbnail({**alias_options, "ALIAS": alias})
+            finally:
+                close_old_connections()
+
+        self.stdout.write(f"Картинок: {len(names)}, алиасов: {len(aliases)}, потоков: {options['workers']}")
+        started = time.perf_counter()
+        try:
+            if options["workers"] > 1:
+                with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+                    list(pool.map(generate, names))
+            else:
+                for name in names:
+                    generate(name)
+            elapsed = time.perf_counter() - started
+        finally:
+            shutil.rmtree(os.path.join(settings.MEDIA_ROOT, prefix), ignore_errors=True)
+            if not options["dir"]:
+                shutil.rmtree(source_dir, ignore_errors=True)
+
+        self.stdout.write(
+            f"{len(names) / elapsed:.1f} картинок/с, {len(names) * len(aliases) / elapsed:.1f} миниатюр/с "
+            f"({elapsed:.1f} с)"
+        )
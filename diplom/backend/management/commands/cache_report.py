@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from backend.cache_metrics import cache_report, reset
+
+
+class Command(BaseCommand):
+    help = ("Отчёт по кэшу запросов cachalot: какие таблицы чаще всего сбрасывают кэш и откуда "
+            "(url или задача Celery), доля попаданий и размер результата по семействам запросов.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=20, help="Сколько строк показать в каждом разделе")
+        parser.add_argument("--reset", action="store_true", help="Обнулить счётчики после отчёта")
+
+    def handle(self, *args, **options):
+        top = options["top"]
+        report = cache_report()
+
+        self.stdout.write("Сбросы кэша по таблицам:")
+        for entry in report["invalidations"][:top]:
+            self.stdout.write(f"  {entry['table']:40} {entry['total']:10}")
+            origins = sorted(entry["origins"].items(), key=lambda item: -item[1])
+            for source, count in origins[:5]:
+                self.stdout.write(f"      {source:36} {count:10}")
+        if not report["invalidations"]:
+            self.stdout.write("  нет данных")
+
+        self.stdout.write("Запросы (по числу промахов):")
+        for entry in report["queries"][:top]:
+            hit_rate = "-" if entry["hit_rate"] is None else f"{entry['hit_rate']:.1%}"
+            size = "-" if entry["avg_bytes"] is None else f"{entry['avg_bytes']} Б"
+            self.stdout.write(f"  {entry['family']:60} попаданий {entry['hits']:8} промахов {entry['misses']:8} "
+                              f"{hit_rate:>7} {size:>10}")
+        if not report["queries"]:
+            self.stdout.write("  нет данных")
+
+        if report["tiers"]:
+            self.stdout.write("Двухуровневый кэш (этот процесс): "
+                              + ", ".join(f"{name}={value}" for name, value in report["tiers"].items()))
+
+        if options["reset"]:
+            reset()
+            self.stdout.write("Счётчики обнулены")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from backend.feeds import fetch_feeds
+
+
+class Command(BaseCommand):
+    help = "Проверяет и импортирует прайс-листы магазинов по Shop.url (то же, что периодическая задача)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("shops", nargs="*", type=int, help="id магазинов (по умолчанию — все с url)")
+
+    def handle(self, *args, **options):
+        for result in fetch_feeds(options["shops"] or None):
+            line = f"Магазин {result['shop']}: {result['status']}"
+            if "stats" in result:
+                stats = result["stats"]
+                line += (f" (создано {stats['created']}, обновлено {stats['updated']}, "
+                         f"без изменений {stats['unchanged']}, снято {stats['deactivated']})")
+            if "error" in result:
+                line += f" — {result['error']}"
+            self.stdout.write(line)
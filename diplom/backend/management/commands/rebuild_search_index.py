@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend import search
+
+
+class Command(BaseCommand):
+    help = "Полностью перестраивает индекс полнотекстового поиска по каталогу."
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError("Полнотекстовый индекс поддерживается только для SQLite и PostgreSQL")
+
+        started = time.perf_counter()
+        total = search.rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"Проиндексировано предложений: {total} за {elapsed:.1f} с")
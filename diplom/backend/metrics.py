@@ -0,0 +1,328 @@
+"""
+Метрики производительности в текстовом формате Prometheus (GET /metrics).
+
+HTTP (MetricsMiddleware), по имени url и методу:
+- http_request_duration_seconds — гистограмма времени ответа;
+- http_requests_total — ответы по кодам, http_throttled_total — отказы по лимиту запросов (429);
+- http_db_queries — гистограмма числа запросов к БД на ответ, http_db_duration_seconds_total — время в БД;
+- http_response_size_bytes — гистограмма размера ответа.
+
+Celery (сигналы задач), по имени задачи:
+- celery_task_duration_seconds — гистограмма времени выполнения с итогом (SUCCESS, FAILURE, ...);
+- celery_task_queue_wait_seconds — гистограмма ожидания в очереди от отправки до начала выполнения.
+
+Наблюдения копятся в памяти процесса, и фоновый поток раз в METRICS_FLUSH_INTERVAL секунд
+прибавляет их к общим счётчикам в кэше METRICS_CACHE: /metrics любого процесса отдаёт сумму
+по всем воркерам, а на сам запрос приходится одна блокировка без обращений к сети.
+Гистограмма хранит число наблюдений в каждом интервале (накопленные значения считаются
+при выводе) и сумму; длительности — целыми микросекундами (incr работает с целыми).
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Множитель для хранения сумм целыми числами
+MICRO = 1_000_000
+
+# Обновление индекса в кэше без множеств (внутри процесса)
+_index_lock = threading.Lock()
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Методы HTTP для меток; любой другой глагол из запроса — "other", иначе число рядов не ограничено
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+
+# Метрика -> (тип, описание, границы интервалов гистограммы, множитель хранения)
+METRICS = {
+    "http_request_duration_seconds": ("histogram", "Время ответа", DURATION_BUCKETS, MICRO),
+    "http_requests_total": ("counter", "Ответы по кодам", None, 1),
+    "http_throttled_total": ("counter", "Отказы по лимиту запросов (429)", None, 1),
+    "http_db_queries": ("histogram", "Запросов к БД на ответ", QUERY_BUCKETS, 1),
+    "http_db_duration_seconds_total": ("counter", "Время выполнения запросов к БД", None, MICRO),
+    "http_response_size_bytes": ("histogram", "Размер ответа", SIZE_BUCKETS, 1),
+    "celery_task_duration_seconds": ("histogram", "Время выполнения задачи", TASK_BUCKETS, MICRO),
+    "celery_task_queue_wait_seconds": ("histogram", "Ожидание задачи в очереди", TASK_BUCKETS, MICRO),
+}
+
+
+class SharedCounters:
+    """
+    Целые счётчики процесса, периодически прибавляемые к общим в кэше.
+
+    Наблюдение только обновляет словарь в памяти; в кэш счётчики отправляет фоновый поток
+    процесса раз в interval_setting секунд, поэтому запросы и задачи не ждут Redis и не падают
+    из-за него. Для Redis сброс — один pipeline (INCRBY на счётчик, SADD имён в множество-индекс);
+    если Redis недоступен, счётчики остаются в памяти до следующей попытки.
+    """
+
+    def __init__(self, prefix, cache_setting, interval_setting):
+        self.prefix = prefix
+        self.index_key = f"{prefix}:index"
+        self.cache_setting = cache_setting
+        self.interval_setting = interval_setting
+        self.lock = threading.Lock()
+        self.pending = {}
+        # Процесс, в котором запущен поток сброса (после fork нужен свой)
+        self.flusher_pid = None
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, self.cache_setting)]
+
+    def _redis(self):
+        """Клиент Redis, если общий кэш — RedisCache, иначе None."""
+        from django.core.cache.backends.redis import RedisCache
+
+        cache = self.cache
+        return cache._cache.get_client(write=True) if isinstance(cache, RedisCache) else None
+
+    def count(self, name, delta=1):
+        self.count_many([(name, delta)])
+
+    def count_many(self, items):
+        with self.lock:
+            for name, delta in items:
+                self.pending[name] = self.pending.get(name, 0) + delta
+        if self.flusher_pid != os.getpid():
+            self._start_flusher()
+
+    def _start_flusher(self):
+        with self.lock:
+            if self.flusher_pid == os.getpid():
+                return
+            self.flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name=f"{self.prefix}-flush", daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(getattr(settings, self.interval_setting))
+            self.flush()
+
+    def flush(self):
+        """Прибавляет накопленные счётчики процесса к общим; ошибки кэша только пишутся в лог."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        try:
+            self._send(pending)
+        except Exception:
+            logger.warning("Не удалось сохранить счётчики %s", self.prefix, exc_info=True)
+            # Вернём в очередь: имён счётчиков немного, память не растёт
+            with self.lock:
+                for name, delta in pending.items():
+                    self.pending[name] = self.pending.get(name, 0) + delta
+
+    def _send(self, pending):
+        cache, client = self.cache, self._redis()
+        if client is not None:
+            pipeline = client.pipeline(transaction=False)
+            for name, delta in pending.items():
+                # RedisCache хранит целые без pickle — INCRBY совместим с cache.get
+                pipeline.incrby(cache.make_and_validate_key(f"{self.prefix}:{name}"), delta)
+            pipeline.sadd(cache.make_and_validate_key(self.index_key), *pending)
+            pipeline.execute()
+            return
+
+        # Кэш без атомарных множеств (LocMem в тестах и разработке) — общий только для процесса
+        for name, delta in pending.items():
+            key = f"{self.prefix}:{name}"
+            try:
+                cache.incr(key, delta)
+            except ValueError:
+                if not cache.add(key, delta, timeout=None):
+                    cache.incr(key, delta)
+        with _index_lock:
+            index = cache.get(self.index_key, set())
+            if not set(pending) <= index:
+                cache.set(self.index_key, index | set(pending), timeout=None)
+
+    def _names(self):
+        client = self._redis()
+        if client is not None:
+            return {name.decode("utf-8") for name in client.smembers(self.cache.make_and_validate_key(self.index_key))}
+        return self.cache.get(self.index_key, set())
+
+    def values(self):
+        """{имя: значение} общих счётчиков (с учётом ещё не сброшенных счётчиков процесса)."""
+        self.flush()
+        names = self._names()
+        values = self.cache.get_many([f"{self.prefix}:{name}" for name in names])
+        return {name: values.get(f"{self.prefix}:{name}", 0) for name in names}
+
+    def reset(self):
+        names = self._names()
+        self.cache.delete_many([f"{self.prefix}:{name}" for name in names] + [self.index_key])
+        with self.lock:
+            self.pending.clear()
+
+
+counters = SharedCounters("metrics", "METRICS_CACHE", "METRICS_FLUSH_INTERVAL")
+
+
+# Наборов меток немного (url x метод x код), строка для каждого строится один раз
+@lru_cache(maxsize=4096)
+def labels(**values):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in values.items())
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def observe(items, metric, label_string, value):
+    """Добавляет в items счётчики одного наблюдения гистограммы: интервал и сумму."""
+    _, _, buckets, scale = METRICS[metric]
+    items.append((f"{metric}|{label_string}|b{bisect_left(buckets, value)}", 1))
+    items.append((f"{metric}|{label_string}|sum", round(value * scale)))
+
+
+def increment(items, metric, label_string, value=1):
+    items.append((f"{metric}|{label_string}|", round(value * METRICS[metric][3])))
+
+
+# HTTP
+
+class _QueryCounter:
+    """execute_wrapper: число и время запросов к БД."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """Время ответа, запросы к БД, размер ответа и отказы по лимиту для каждого url. Ставится первым."""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = _QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        try:
+            record_request(request, response, time.perf_counter() - started, queries.count, queries.seconds)
+        except Exception:
+            # Метрики не должны ломать ответ
+            logger.exception("Не удалось записать метрики запроса")
+        return response
+
+
+def record_request(request, response, seconds, query_count, query_seconds):
+    match = request.resolver_match
+    # Только имена url: пути несуществующих страниц раздули бы число рядов
+    view = (match.url_name or match.view_name) if match else "unknown"
+    method = request.method if request.method in HTTP_METHODS else "other"
+    view_labels = labels(view=view, method=method)
+
+    items = []
+    observe(items, "http_request_duration_seconds", view_labels, seconds)
+    increment(items, "http_requests_total", labels(view=view, method=method, status=response.status_code))
+    if response.status_code == 429:
+        increment(items, "http_throttled_total", view_labels)
+    observe(items, "http_db_queries", view_labels, query_count)
+    increment(items, "http_db_duration_seconds_total", view_labels, query_seconds)
+    if response.has_header("Content-Length"):
+        observe(items, "http_response_size_bytes", view_labels, int(response["Content-Length"]))
+    elif not response.streaming:
+        observe(items, "http_response_size_bytes", view_labels, len(response.content))
+    counters.count_many(items)
+
+
+# Celery
+
+def install():
+    """Подключает метрики задач Celery (вызывается из BackendConfig.ready)."""
+    if not settings.METRICS_ENABLED:
+        return
+    from celery.signals import before_task_publish, task_postrun, task_prerun
+
+    before_task_publish.connect(_task_published, weak=False, dispatch_uid="metrics_task_published")
+    task_prerun.connect(_task_started, weak=False, dispatch_uid="metrics_task_started")
+    task_postrun.connect(_task_finished, weak=False, dispatch_uid="metrics_task_finished")
+
+
+def _task_published(headers=None, **kwargs):
+    # Заголовок сообщения доступен воркеру как task.request.published_at
+    if headers is not None:
+        headers["published_at"] = time.time()
+
+
+def _task_started(task=None, **kwargs):
+    task.request.metrics_started = time.perf_counter()
+    published_at = getattr(task.request, "published_at", None)
+    if published_at:
+        items = []
+        # Часы отправителя и воркера могут расходиться
+        observe(items, "celery_task_queue_wait_seconds", labels(task=task.name), max(time.time() - published_at, 0))
+        counters.count_many(items)
+
+
+def _task_finished(task=None, state=None, **kwargs):
+    started = getattr(task.request, "metrics_started", None)
+    if started is None:
+        return
+    items = []
+    observe(items, "celery_task_duration_seconds", labels(task=task.name, state=state or "UNKNOWN"),
+            time.perf_counter() - started)
+    counters.count_many(items)
+
+
+# Вывод
+
+def render():
+    """Все метрики в текстовом формате Prometheus."""
+    series = {}
+    for name, value in counters.values().items():
+        metric, label_string, part = name.split("|")
+        series.setdefault(metric, {}).setdefault(label_string, {})[part] = value
+
+    lines = []
+    for metric, (kind, description, buckets, scale) in METRICS.items():
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for label_string, parts in sorted(series.get(metric, {}).items()):
+            if kind == "counter":
+                lines.append(f"{metric}{{{label_string}}} {_number(parts.get('', 0), scale)}")
+                continue
+            total = 0
+            for index, bound in enumerate((*buckets, "+Inf")):
+                total += parts.get(f"b{index}", 0)
+                lines.append(f'{metric}_bucket{{{label_string},le="{bound}"}} {total}')
+            lines.append(f"{metric}_sum{{{label_string}}} {_number(parts.get('sum', 0), scale)}")
+            lines.append(f"{metric}_count{{{label_string}}} {total}")
+    return "\n".join(lines) + "\n"
+
+
+def _number(value, scale):
+    return value if scale == 1 else value / scale
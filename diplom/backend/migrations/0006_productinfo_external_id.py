@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0005_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productinfo',
+            name='external_id',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='productinfo',
+            constraint=models.UniqueConstraint(fields=('shop', 'external_id'), name='productinfo_shop_external_id'),
+        ),
+    ]
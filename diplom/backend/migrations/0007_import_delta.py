@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0006_productinfo_external_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='deactivate_missing',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='productinfo',
+            name='import_hash',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+    ]
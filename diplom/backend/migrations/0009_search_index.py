@@ -0,0 +1,39 @@
+# Индекс полнотекстового поиска (см. backend/search.py).
+# После миграции на существующей базе: python manage.py rebuild_search_index
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        # prefix: отдельные индексы префиксов из 2 и 3 символов ускоряют поиск "смар*"
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE backend_productinfo_search USING fts5("
+            "title, category, params, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE TABLE backend_productinfo_search ("
+            "info_id bigint PRIMARY KEY REFERENCES backend_productinfo (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX backend_productinfo_search_gin ON backend_productinfo_search USING gin (document)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ("sqlite", "postgresql"):
+        schema_editor.execute("DROP TABLE IF EXISTS backend_productinfo_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0008_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def split_existing_orders(apps, schema_editor):
+    # Уже оформленные заказы делим по магазинам так же, как новые; части получают статус и дату заказа.
+    # До разделения заказы оформлялись в статусе draft, из которого нет переходов (order_status.TRANSITIONS):
+    # такие заказы и их части переводим в new, как оформленные сейчас
+    Order = apps.get_model('backend', 'Order')
+    OrderItem = apps.get_model('backend', 'OrderItem')
+    ShopOrder = apps.get_model('backend', 'ShopOrder')
+
+    items = list(OrderItem.objects.filter(shop_order__isnull=True).values_list('id', 'order_id', 'product_info__shop_id'))
+    if not items:
+        return
+    order_ids = {order_id for _, order_id, _ in items}
+    Order.objects.filter(pk__in=order_ids, status='draft').update(status='new')
+    statuses = dict(Order.objects.filter(pk__in=order_ids).values_list('pk', 'status'))
+    pairs = sorted({(order_id, shop_id) for _, order_id, shop_id in items})
+    created = ShopOrder.objects.bulk_create(
+        [ShopOrder(order_id=order_id, shop_id=shop_id, status=statuses[order_id]) for order_id, shop_id in pairs],
+        batch_size=1000,
+    )
+    # auto_now_add/auto_now при вставке ставят текущее время — даты заказа копируем одним UPDATE
+    order_dt = models.Subquery(Order.objects.filter(pk=models.OuterRef('order_id')).values('dt')[:1])
+    ShopOrder.objects.filter(pk__in=[shop_order.pk for shop_order in created]).update(
+        created_at=order_dt, updated_at=order_dt,
+    )
+
+    shop_orders = {(shop_order.order_id, shop_order.shop_id): shop_order.pk for shop_order in created}
+    OrderItem.objects.bulk_update(
+        [OrderItem(id=item_id, shop_order_id=shop_orders[(order_id, shop_id)]) for item_id, order_id, shop_id in items],
+        ['shop_order'], batch_size=1000,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0009_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('draft', 'Черновик'), ('new', 'Новый'), ('confirmed', 'Подтверждён'), ('shipped', 'Отгружен'), ('delivered', 'Доставлен'), ('canceled', 'Отменён')], default='new', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shop_orders', to='backend.order')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shop_orders', to='backend.shop')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='shop_order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='items', to='backend.shoporder'),
+        ),
+        migrations.AddIndex(
+            model_name='shoporder',
+            index=models.Index(fields=['shop', 'updated_at', 'id'], name='shoporder_feed_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='shoporder',
+            unique_together={('order', 'shop')},
+        ),
+        migrations.RunPython(split_existing_orders, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
@@ -14,6 +15,7 @@ class Profile(models.Model):
     shops = models.ManyToManyField('Shop', blank=True, related_name='owners')
 
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    avatar_hash = models.CharField(max_length=64, blank=True, default='')  # sha256 аватара, по нему создаются миниатюры
 
     def __str__(self):
         return f"{self.user.username} profile"
@@ -22,6 +24,13 @@ class Shop(models.Model):
     name = models.CharField(max_length=100)       # Название магазина/поставщика
     url = models.URLField(blank=True, null=True)  # URL для интеграции, может быть пустым
 
+    # Состояние загрузки прайс-листа по url (см. backend/feeds.py): заголовки для условного запроса,
+    # отпечаток последнего импортированного файла и время последней проверки
+    feed_etag = models.CharField(max_length=255, blank=True, default='')
+    feed_last_modified = models.CharField(max_length=64, blank=True, default='')
+    feed_hash = models.CharField(max_length=64, blank=True, default='')
+    feed_checked_at = models.DateTimeField(blank=True, null=True)
+
     def __str__(self):
         return self.name
 
@@ -70,9 +79,22 @@ class ProductInfo(models.Model):
     price_rrc = models.FloatField()               # РРЦ — рекомендованная розничная цена
 
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    image_hash = models.CharField(max_length=64, blank=True, default='')  # sha256 картинки, по нему создаются миниатюры
+    external_id = models.PositiveBigIntegerField(blank=True, null=True)  # id товара в прайс-листе поставщика
+    import_hash = models.CharField(max_length=32, blank=True, default='')  # Отпечаток строки последнего импорта
 
     class Meta:
         unique_together = ('product', 'shop')     # Уникальность: товар может быть один раз у магазина
+        constraints = [
+            # Индекс для сопоставления строк прайс-листа при повторном импорте
+            models.UniqueConstraint(fields=('shop', 'external_id'), name='productinfo_shop_external_id'),
+        ]
+        indexes = [
+            # Каталог: товары в наличии, сортировка по цене (частичный индекс только по quantity > 0)
+            models.Index(fields=('price', 'id'), condition=models.Q(quantity__gt=0), name='pi_instock_price_idx'),
+            # Каталог: фильтр по магазину и диапазону цены
+            models.Index(fields=('shop', 'price'), name='pi_shop_price_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} ({self.shop.name})"
@@ -102,6 +124,10 @@ class ProductParameter(models.Model):
 
     class Meta:
         unique_together = ('product_info', 'parameter')  # Один параметр = одно значение для товара
+        indexes = [
+            # Фильтр каталога по значению параметра читается только из индекса
+            models.Index(fields=('parameter', 'value', 'product_info'), name='pp_param_value_idx'),
+        ]
 
     def __str__(self):
         return f"{self.parameter.name}: {self.value}"
@@ -142,6 +168,37 @@ class Order(models.Model):
         return f"Order {self.id} ({self.user.username})"
 
 
+class ShopOrder(models.Model):
+    # Часть заказа, которую собирает один магазин: заказ делится по магазинам при оформлении
+    order = models.ForeignKey(
+        Order,
+        related_name='shop_orders',
+        on_delete=models.CASCADE
+    )
+    shop = models.ForeignKey(
+        Shop,
+        related_name='shop_orders',
+        on_delete=models.CASCADE
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Order.Status.choices,
+        default=Order.Status.NEW
+    )  # Статус части заказа у магазина
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # По нему поставщики забирают новые и изменённые заказы
+
+    class Meta:
+        unique_together = ('order', 'shop')
+        indexes = [
+            # Лента заказов поставщика: WHERE shop = ? AND (updated_at, id) > курсора ORDER BY updated_at, id
+            models.Index(fields=('shop', 'updated_at', 'id'), name='shoporder_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_id} / {self.shop}"
+
+
 class OrderItem(models.Model):
     # Позиция заказа — конкретный товар от конкретного магазина
     order = models.ForeignKey(
@@ -149,6 +206,13 @@ class OrderItem(models.Model):
         related_name='items',
         on_delete=models.CASCADE
     )  # Ссылка на заказ
+    shop_order = models.ForeignKey(
+        ShopOrder,
+        related_name='items',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True
+    )  # Часть заказа магазина, к которой относится позиция
     product_info = models.ForeignKey(
         ProductInfo,
         related_name='order_items',
@@ -184,3 +248,78 @@ class Contact(models.Model):
 
     def __str__(self):
         return f"{self.user.username} {self.type}: {self.value}"
+
+
+class ImportJob(models.Model):
+    # Фоновый импорт прайс-листа: файл сохраняется, Celery обрабатывает его пачками
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "В очереди"
+        RUNNING = "running", "Выполняется"
+        DONE = "done", "Завершён"
+        FAILED = "failed", "Ошибка"
+
+    user = models.ForeignKey(
+        User,
+        related_name='import_jobs',
+        on_delete=models.CASCADE
+    )  # Поставщик, загрузивший файл
+    file = models.FileField(upload_to='imports/')  # Загруженный прайс-лист
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    deactivate_missing = models.BooleanField(default=False)  # Обнулить остаток товаров, которых нет в файле
+    rows_processed = models.PositiveIntegerField(default=0)  # Сколько строк файла уже обработано
+    stats = models.JSONField(default=dict, blank=True)       # Счётчики created/updated/unchanged
+    errors = models.JSONField(default=list, blank=True)      # Ошибки по строкам и ошибка задачи
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def rows_per_second(self):
+        # Скорость считаем по уже обработанным строкам, в том числе пока задача идёт
+        if not self.started_at:
+            return 0
+        end = self.finished_at or timezone.now()
+        seconds = (end - self.started_at).total_seconds()
+        return round(self.rows_processed / seconds, 1) if seconds > 0 else 0
+
+    def __str__(self):
+        return f"Import {self.id} ({self.status})"
+
+
+class OutgoingEmail(models.Model):
+    # Письмо в очереди на отправку: задача send_pending_emails отправляет их пачками через одно соединение
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "В очереди"
+        SENT = "sent", "Отправлено"
+        FAILED = "failed", "Не отправлено"
+
+    to = models.EmailField()
+    subject = models.CharField(max_length=255)
+    text = models.TextField()
+    html = models.TextField(blank=True, default='')
+    template = models.CharField(max_length=50)  # Имя шаблона письма (emails/<template>.*) — для статистики
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)   # Неудачные попытки отправки
+    next_attempt_at = models.DateTimeField(default=timezone.now)  # Раньше этого времени письмо не отправляем
+    error = models.TextField(blank=True, default='')         # Последняя ошибка отправки
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Выборка очередной пачки: WHERE status = 'pending' AND next_attempt_at <= now ORDER BY next_attempt_at, id
+            models.Index(fields=('status', 'next_attempt_at', 'id'), name='email_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.template} → {self.to} ({self.status})"
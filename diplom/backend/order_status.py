@@ -0,0 +1,112 @@
+"""
+Смена статусов заказов.
+
+Поставщик меняет статус своих частей заказа (ShopOrder); статус заказа покупателя
+(Order) следует за ними: это наименее продвинутый статус среди неотменённых частей,
+"canceled" — если отменены все части.
+
+Переходы выполняются пачкой: один UPDATE на все части заказов, один UPDATE на возврат
+остатков при отмене и по одному UPDATE на каждый итоговый статус заказов.
+Уведомления покупателям ставятся в Celery после фиксации транзакции, пачками.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Order, OrderItem, ShopOrder
+from .stock import release_stock
+
+Status = Order.Status
+
+# Допустимые переходы: из статуса -> в статусы
+TRANSITIONS = {
+    Status.NEW: {Status.CONFIRMED, Status.CANCELED},
+    Status.CONFIRMED: {Status.SHIPPED, Status.CANCELED},
+    Status.SHIPPED: {Status.DELIVERED},
+    Status.DELIVERED: set(),
+    Status.CANCELED: set(),
+}
+
+# Порядок продвижения заказа: статус заказа — наименьший среди его частей.
+# Части в статусах не из списка (кроме отмены) при пересчёте не учитываются
+PROGRESS = [Status.DRAFT, Status.NEW, Status.CONFIRMED, Status.SHIPPED, Status.DELIVERED]
+
+
+def sources(target):
+    """Статусы, из которых можно перейти в target."""
+    return [status for status, targets in TRANSITIONS.items() if target in targets]
+
+
+def change_status(ids, target, shop_ids=None):
+    """
+    Переводит части заказов ids в статус target; shop_ids — ограничить магазинами поставщика
+    (None — любые, для админки). Возвращает (id переведённых, [{"id", "status"}] — не переведённые;
+    status=None, если части нет или она чужая).
+    """
+    if target not in TRANSITIONS or not sources(target):
+        raise ValueError(f"Нельзя перевести заказ в статус {target}")
+    allowed = sources(target)
+
+    with transaction.atomic():
+        rows = ShopOrder.objects.filter(pk__in=ids).select_for_update()
+        if shop_ids is not None:
+            rows = rows.filter(shop_id__in=shop_ids)
+        current = {pk: (order_id, status) for pk, order_id, status in rows.values_list('pk', 'order_id', 'status')}
+
+        moved = [pk for pk, (_, status) in current.items() if status in allowed]
+        rejected = [{"id": pk, "status": current[pk][1] if pk in current else None}
+                    for pk in dict.fromkeys(ids) if pk not in current or current[pk][1] not in allowed]
+        if not moved:
+            return [], rejected
+
+        # update() не трогает auto_now: updated_at нужен ленте заказов поставщика
+        ShopOrder.objects.filter(pk__in=moved).update(status=target, updated_at=timezone.now())
+
+        if target == Status.CANCELED:
+            returned = (
+                OrderItem.objects.filter(shop_order__in=moved)
+                .values('product_info').annotate(total=Sum('quantity')).values_list('product_info', 'total')
+            )
+            release_stock(dict(returned))
+
+        orders = _sync_orders({current[pk][0] for pk in moved})
+        transaction.on_commit(lambda: _notify(orders))
+    return moved, rejected
+
+
+def _sync_orders(order_ids):
+    """Пересчитывает статусы заказов по их частям; возвращает {order_id: статус} изменившихся."""
+    parts = {}
+    for order_id, status in ShopOrder.objects.filter(order_id__in=order_ids).values_list('order_id', 'status'):
+        parts.setdefault(order_id, []).append(status)
+
+    statuses = {}
+    for order_id, values in parts.items():
+        active = [status for status in values if status in PROGRESS]
+        if active:
+            statuses[order_id] = min(active, key=PROGRESS.index)
+        elif all(status == Status.CANCELED for status in values):
+            statuses[order_id] = Status.CANCELED
+
+    changed = {
+        pk: statuses[pk]
+        for pk, status in Order.objects.filter(pk__in=list(statuses)).values_list('pk', 'status')
+        if status != statuses[pk]
+    }
+    by_status = {}
+    for pk, status in changed.items():
+        by_status.setdefault(status, []).append(pk)
+    for status, pks in by_status.items():
+        Order.objects.filter(pk__in=pks).update(status=status)
+    return changed
+
+
+def _notify(orders):
+    from .tasks import send_order_status_emails
+
+    rows = Order.objects.filter(pk__in=list(orders)).exclude(user__email='').values_list('pk', 'user__email')
+    notifications = [(pk, email, orders[pk]) for pk, email in rows]
+    size = settings.ORDER_STATUS_NOTIFY_BATCH
+    for start in range(0, len(notifications), size):
+        send_order_status_emails.delay(notifications[start:start + size])
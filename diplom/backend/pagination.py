@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class CatalogCursorPagination(CursorPagination):
+    """
+    Keyset-пагинация каталога: следующая страница выбирается условием id > последнего,
+    поэтому стоимость запроса не растёт с номером страницы (в отличие от OFFSET).
+    Размер страницы можно передать в ?page_size=, но не больше CATALOG_MAX_PAGE_SIZE.
+    Сортировка — ?ordering=price или ?ordering=-price (по умолчанию по id).
+    """
+    ordering = 'id'
+    page_size = settings.CATALOG_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.CATALOG_MAX_PAGE_SIZE
+
+    # Допустимые сортировки: id добавлен вторым полем, чтобы порядок был однозначным
+    orderings = {
+        'id': ('id',),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+    }
+
+    def get_ordering(self, request, queryset, view):
+        return self.orderings.get(request.query_params.get('ordering'), self.orderings['id'])
+
+
+class OrdersCursorPagination(CursorPagination):
+    """История заказов: от новых к старым, keyset-пагинация по id."""
+    ordering = '-id'
+    page_size = settings.ORDERS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.ORDERS_MAX_PAGE_SIZE
+
+
+# Курсор ленты заказов поставщика: "<updated_at в микросекундах от эпохи>-<id>"
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_feed_cursor(updated_at, pk):
+    return f"{(updated_at - _EPOCH) // timedelta(microseconds=1)}-{pk}"
+
+
+def decode_feed_cursor(value):
+    """(updated_at, id) или None для пустого курсора; ValueError при некорректном."""
+    if not value:
+        return None
+    micros, _, pk = value.partition('-')
+    return _EPOCH + timedelta(microseconds=int(micros)), int(pk)
@@ -0,0 +1,355 @@
+"""
+Потоковое чтение прайс-листов (YAML, JSON, Excel).
+
+Файл не загружается в память целиком: товары читаются по одному и отдаются
+импортёру лениво, поэтому расход памяти не зависит от размера файла.
+"""
+import codecs
+import json
+import re
+import zipfile
+
+import openpyxl
+import yaml
+from openpyxl.utils.exceptions import InvalidFileException
+
+# Ключи верхнего уровня, под которыми лежит список товаров:
+# products — наш упрощённый формат, goods — формат поставщиков (см. shop1.yaml)
+ITEM_KEYS = ("products", "goods")
+
+# Магазин по умолчанию, если в файле он не указан
+DEFAULT_SHOP_NAME = "Unknown Shop"
+
+# Размер куска, которым читаем файл
+CHUNK_SIZE = 64 * 1024
+
+# События сканеров (вид, ключ, значение): заголовок файла (shop и т.п.) или очередной товар
+# (ключ — название списка товаров)
+HEADER = "header"
+ITEM = "item"
+
+SUPPORTED_EXTENSIONS = (".yaml", ".yml", ".json", ".xlsx")
+
+# Ошибки разбора повреждённого файла: обрезанный или не-xlsx архив openpyxl сообщает своими исключениями
+PARSE_ERRORS = (ValueError, yaml.YAMLError, zipfile.BadZipFile, InvalidFileException)
+
+
+def is_supported_file(name):
+    return name.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+class PriceList:
+    """
+    Прайс-лист, читаемый потоково.
+
+    При создании читается только заголовок файла (всё, что идёт до списка товаров),
+    товары отдаются при итерации:
+
+        price_list = PriceList(file, "price.yaml")
+        price_list.shop_name
+        for item in price_list: ...
+    """
+
+    def __init__(self, file, name):
+        name = name.lower()
+        if name.endswith((".yaml", ".yml")):
+            self._scanner = _scan_yaml
+        elif name.endswith(".json"):
+            self._scanner = _scan_json
+        elif name.endswith(".xlsx"):
+            self._scanner = _scan_excel
+        else:
+            raise ValueError("Формат файла не поддерживается")
+
+        self.file = file
+        self.header = {}
+        # Ключ списка товаров (products или goods); у Excel — None
+        self.items_key = None
+        self._events = self._scanner(file, skip_items=False)
+        self._first = self._read_header()
+
+        # Если магазин или справочник категорий (нужен товарам goods) указан после списка товаров —
+        # один раз пробегаем файл, пропуская товары, и начинаем чтение заново
+        late_header = "shop" not in self.header or (self.items_key == "goods" and "categories" not in self.header)
+        if self._first is not None and late_header and self._scanner is not _scan_excel:
+            if file.seekable():
+                self._events.close()
+                file.seek(0)
+                for kind, key, value in self._scanner(file, skip_items=True):
+                    self.header[key] = value
+                file.seek(0)
+                self._events = self._scanner(file, skip_items=False)
+                self._first = self._read_header()
+
+    def _read_header(self):
+        """Читает события до первого товара и возвращает его (или None, если товаров нет)."""
+        for kind, key, value in self._events:
+            if kind == ITEM:
+                self.items_key = key
+                return value
+            self.header.setdefault(key, value)
+        return None
+
+    @property
+    def shop_name(self):
+        # shop: {name: ...} в нашем формате или просто строка в формате поставщика
+        shop = self.header.get("shop")
+        if isinstance(shop, dict):
+            return shop.get("name", DEFAULT_SHOP_NAME)
+        return str(shop) if shop else DEFAULT_SHOP_NAME
+
+    @property
+    def categories(self):
+        """Справочник категорий поставщика {id: название}; товары ссылаются на категорию по id."""
+        result = {}
+        for category in self.header.get("categories") or []:
+            if isinstance(category, dict) and "id" in category and category.get("name"):
+                result[str(category["id"])] = str(category["name"])
+        return result
+
+    def __iter__(self):
+        if self._first is None:
+            return
+        first, self._first = self._first, None
+        yield first
+
+        for kind, key, value in self._events:
+            if kind == ITEM:
+                yield value
+            elif key == "categories" and key not in self.header:
+                # Файл не перечитать (не seekable), а товары уже ссылались на категории по id
+                raise ValueError("Справочник categories должен идти до списка товаров")
+            else:
+                self.header.setdefault(key, value)
+
+
+# JSON
+
+_WHITESPACE = re.compile(r"\s*")
+# Символы, которыми может продолжаться число
+_NUMBER_TAIL = re.compile(r"[0-9.eE+\-]*")
+
+
+class _JsonStream:
+    """Буфер поверх файла: разбирает JSON-значения по одному через raw_decode."""
+
+    def __init__(self, file):
+        self.file = file
+        self.decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.json = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        # Отбрасываем уже разобранную часть буфера и дочитываем следующий кусок
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        if self.eof:
+            return False
+
+        chunk = self.file.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            self.buf += self.decoder.decode(b"", final=True)
+            return False
+
+        self.buf += self.decoder.decode(chunk)
+        return True
+
+    def peek(self):
+        """Следующий непробельный символ ('' в конце файла)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def take(self, expected):
+        char = self.peek()
+        if char not in expected:
+            raise ValueError(f"Некорректный JSON: ожидался один из символов {expected!r}, получено {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Значение оборвалось на границе буфера — дочитываем
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+
+            # Значение могло оборваться на границе буфера: "12" из "123", "10" из "10.25", "1" из "1e5"
+            if not self.eof and (end == len(self.buf) or (
+                    isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and _NUMBER_TAIL.match(self.buf, end).end() == len(self.buf))):
+                self._fill()
+                continue
+
+            self.pos = end
+            return value
+
+
+def _scan_json(file, skip_items):
+    stream = _JsonStream(file)
+    stream.take("{")
+    if stream.peek() == "}":
+        return
+
+    while True:
+        key = stream.value()
+        stream.take(":")
+
+        if key in ITEM_KEYS:
+            # Список товаров разбираем поэлементно
+            stream.take("[")
+            if stream.peek() == "]":
+                stream.pos += 1
+            else:
+                while True:
+                    item = stream.value()
+                    if not skip_items:
+                        yield ITEM, key, item
+                    if stream.take(",]") == "]":
+                        break
+        else:
+            yield HEADER, key, stream.value()
+
+        if stream.take(",}") == "}":
+            return
+
+
+# YAML
+
+def _scan_yaml(file, skip_items):
+    # Работаем на уровне событий парсера: узлы строим только для одного товара за раз
+    loader_class = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    events = yaml.parse(file, Loader=loader_class)
+    builder = _YamlBuilder()
+
+    # Каждый документ потока — отдельный кусок прайс-листа
+    for event in events:
+        if isinstance(event, (yaml.StreamStartEvent, yaml.StreamEndEvent,
+                              yaml.DocumentStartEvent, yaml.DocumentEndEvent)):
+            continue
+        if not isinstance(event, yaml.MappingStartEvent):
+            # Пустой документ разбирается как null
+            if builder.build(event, events) is None:
+                continue
+            raise ValueError("Некорректный YAML: ожидался словарь верхнего уровня")
+
+        for key_event in events:
+            if isinstance(key_event, yaml.MappingEndEvent):
+                break
+            key = builder.build(key_event, events)
+            value_event = next(events)
+
+            if key in ITEM_KEYS and isinstance(value_event, yaml.SequenceStartEvent):
+                for item_event in events:
+                    if isinstance(item_event, yaml.SequenceEndEvent):
+                        break
+                    if skip_items:
+                        builder.skip(item_event, events)
+                    else:
+                        yield ITEM, key, builder.build(item_event, events)
+            else:
+                yield HEADER, key, builder.build(value_event, events)
+
+
+class _YamlBuilder:
+    """Собирает python-объекты из событий YAML по правилам safe_load."""
+
+    def __init__(self):
+        self.loader = yaml.SafeLoader("")
+        self.anchors = {}
+
+    def build(self, event, events):
+        if isinstance(event, yaml.AliasEvent):
+            return self.anchors[event.anchor]
+
+        if isinstance(event, yaml.ScalarEvent):
+            value = self._scalar(event)
+        elif isinstance(event, yaml.SequenceStartEvent):
+            value = []
+            for child in events:
+                if isinstance(child, yaml.SequenceEndEvent):
+                    break
+                value.append(self.build(child, events))
+        elif isinstance(event, yaml.MappingStartEvent):
+            value = {}
+            for child in events:
+                if isinstance(child, yaml.MappingEndEvent):
+                    break
+                key = self.build(child, events)
+                value[key] = self.build(next(events), events)
+        else:
+            raise ValueError(f"Некорректный YAML: неожиданное событие {event}")
+
+        if event.anchor:
+            self.anchors[event.anchor] = value
+        return value
+
+    def _scalar(self, event):
+        tag = event.tag
+        if tag is None or tag == "!":
+            tag = self.loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+        node = yaml.ScalarNode(tag, event.value, style=event.style)
+        constructor = self.loader.yaml_constructors.get(tag, self.loader.yaml_constructors[None])
+        return constructor(self.loader, node)
+
+    def skip(self, event, events):
+        depth = 1 if isinstance(event, (yaml.SequenceStartEvent, yaml.MappingStartEvent)) else 0
+        while depth:
+            event = next(events)
+            if isinstance(event, (yaml.SequenceStartEvent, yaml.MappingStartEvent)):
+                depth += 1
+            elif isinstance(event, (yaml.SequenceEndEvent, yaml.MappingEndEvent)):
+                depth -= 1
+
+
+# Excel
+
+def _scan_excel(file, skip_items):
+    # read_only: openpyxl читает лист построчно, не создавая объекты ячеек для всего файла
+    try:
+        wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    except KeyError as exc:
+        # zip-архив без обязательных частей книги
+        raise ValueError(f"Некорректный Excel: {exc}") from exc
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+
+        # Первая строка — заголовки колонок
+        headers = next(rows, None)
+        if headers is None:
+            return
+
+        for row in rows:
+            # Превращаем строку Excel в словарь вида { "column_name": value }
+            item = {h: v for h, v in zip(headers, row) if h}
+
+            # Пустые строки в конце листа пропускаем
+            if all(v is None for v in item.values()):
+                continue
+
+            if skip_items:
+                continue
+
+            # Приводим Excel-формат к ожидаемой структуре
+            yield ITEM, None, {
+                "name": item.get("name"),
+                "category": item.get("category"),
+                "name_in_shop": item.get("name_in_shop"),
+                "quantity": item.get("quantity"),
+                "price": item.get("price"),
+                "price_rrc": item.get("price_rrc"),
+                "parameters": {},  # параметры пока не обрабатываем глубоко
+            }
+    finally:
+        wb.close()
@@ -0,0 +1,165 @@
+"""
+Полнотекстовый поиск по каталогу.
+
+Для каждого предложения (ProductInfo) в индексе хранится документ из трёх частей:
+название (товар + название у поставщика), категория и значения параметров.
+Индекс — отдельная таблица SEARCH_TABLE (см. миграцию 0009_search_index):
+    - SQLite: виртуальная таблица FTS5, rowid = ProductInfo.id, ранжирование bm25;
+    - PostgreSQL: колонка tsvector с GIN-индексом, ранжирование ts_rank_cd.
+
+Индекс обновляется точечно: импорт и админка вызывают reindex() для изменившихся
+предложений, полностью индекс перестраивает команда rebuild_search_index.
+"""
+import re
+
+from django.db import connection
+
+from .models import ProductInfo, ProductParameter
+
+SEARCH_TABLE = "backend_productinfo_search"
+
+# Веса частей документа: совпадение в названии важнее, чем в категории или параметрах
+TITLE_WEIGHT, CATEGORY_WEIGHT, PARAMS_WEIGHT = 10.0, 3.0, 1.0
+
+# Сколько предложений индексируем за один проход
+REINDEX_CHUNK_SIZE = 500
+
+# Из запроса берём не больше стольких слов
+MAX_QUERY_WORDS = 8
+
+_WORD = re.compile(r"\w+")
+
+
+def is_supported():
+    return connection.vendor in ("sqlite", "postgresql")
+
+
+def query_words(query):
+    """Слова поискового запроса в нижнем регистре (служебные символы FTS отбрасываются)."""
+    return _WORD.findall((query or "").lower())[:MAX_QUERY_WORDS]
+
+
+def search(query, limit, offset=0, in_stock=True):
+    """
+    Возвращает id предложений, подходящих под запрос, от наиболее релевантного.
+    Каждое слово запроса ищется как префикс: "смарт black" найдёт "Смартфон ... Black".
+    """
+    words = query_words(query)
+    if not words:
+        return []
+
+    if not is_supported():
+        return _search_fallback(words, limit, offset, in_stock)
+
+    stock = "AND p.quantity > 0" if in_stock else ""
+    if connection.vendor == "sqlite":
+        sql = (
+            f"SELECT s.rowid FROM {SEARCH_TABLE} s JOIN backend_productinfo p ON p.id = s.rowid "
+            f"WHERE {SEARCH_TABLE} MATCH %s {stock} "
+            f"ORDER BY bm25({SEARCH_TABLE}, %s, %s, %s), s.rowid LIMIT %s OFFSET %s"
+        )
+        match = " ".join(f'"{word}"*' for word in words)
+        params = [match, TITLE_WEIGHT, CATEGORY_WEIGHT, PARAMS_WEIGHT, limit, offset]
+    else:
+        sql = (
+            f"SELECT s.info_id FROM {SEARCH_TABLE} s JOIN backend_productinfo p ON p.id = s.info_id "
+            f"WHERE s.document @@ to_tsquery('simple', %s) {stock} "
+            f"ORDER BY ts_rank_cd(s.document, to_tsquery('simple', %s)) DESC, s.info_id LIMIT %s OFFSET %s"
+        )
+        match = " & ".join(f"{word}:*" for word in words)
+        params = [match, match, limit, offset]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_fallback(words, limit, offset, in_stock):
+    # Для прочих СУБД — поиск подстрокой по названию, без ранжирования
+    qs = ProductInfo.objects.all()
+    if in_stock:
+        qs = qs.filter(quantity__gt=0)
+    for word in words:
+        qs = qs.filter(product__name__icontains=word)
+    return list(qs.order_by('id').values_list('id', flat=True)[offset:offset + limit])
+
+
+def reindex(info_ids):
+    """Пересобирает документы индекса для указанных предложений (удалённые из индекса убираются)."""
+    if not is_supported():
+        return
+
+    info_ids = list(info_ids)
+    for start in range(0, len(info_ids), REINDEX_CHUNK_SIZE):
+        _reindex_chunk(info_ids[start:start + REINDEX_CHUNK_SIZE])
+
+
+def rebuild():
+    """Полностью перестраивает индекс. Возвращает число проиндексированных предложений."""
+    if not is_supported():
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+    total = 0
+    last_id = 0
+    while True:
+        # Идём по первичному ключу пачками: не держим в памяти весь список id
+        ids = list(
+            ProductInfo.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:REINDEX_CHUNK_SIZE]
+        )
+        if not ids:
+            return total
+        _reindex_chunk(ids, clear=False)
+        total += len(ids)
+        last_id = ids[-1]
+
+
+def _documents(info_ids):
+    """{id: (название, категория, параметры)} — два запроса на пачку."""
+    docs = {}
+    rows = ProductInfo.objects.filter(id__in=info_ids).values_list('id', 'name', 'product__name', 'product__category__name')
+    for pk, name, product_name, category_name in rows:
+        # Название у поставщика часто повторяет название товара — не дублируем слова в документе
+        title = product_name if not name or name.lower() in product_name.lower() else f"{product_name} {name}"
+        docs[pk] = [title, category_name or "", []]
+
+    params = ProductParameter.objects.filter(product_info_id__in=info_ids).values_list('product_info_id', 'value')
+    for pk, value in params:
+        docs[pk][2].append(value)
+
+    return {pk: (title, category, " ".join(values)) for pk, (title, category, values) in docs.items()}
+
+
+def _delete(info_ids):
+    key = "rowid" if connection.vendor == "sqlite" else "info_id"
+    placeholders = ", ".join(["%s"] * len(info_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE {key} IN ({placeholders})", info_ids)
+
+
+def _reindex_chunk(info_ids, clear=True):
+    docs = _documents(info_ids)
+
+    if connection.vendor == "sqlite":
+        # FTS5 не поддерживает upsert: удаляем старые документы и вставляем заново
+        if clear:
+            _delete(info_ids)
+        sql = f"INSERT INTO {SEARCH_TABLE} (rowid, title, category, params) VALUES (%s, %s, %s, %s)"
+    else:
+        if clear:
+            # Удалённые предложения убираем, остальные перезаписываются upsert-ом ниже
+            gone = [pk for pk in info_ids if pk not in docs]
+            if gone:
+                _delete(gone)
+        sql = (
+            f"INSERT INTO {SEARCH_TABLE} (info_id, document) VALUES (%s, "
+            "setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') "
+            "|| setweight(to_tsvector('simple', %s), 'C')) "
+            "ON CONFLICT (info_id) DO UPDATE SET document = EXCLUDED.document"
+        )
+
+    if docs:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [(pk, *doc) for pk, doc in docs.items()])
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from .images import variant_urls
 from .models import ProductInfo, Contact
 
 # Получаем модель пользователя (стандартная User или кастомная, если настроена)
@@ -29,15 +30,22 @@ class LoginSerializer(serializers.Serializer):
 class ProductInfoSerializer(serializers.ModelSerializer):
     """
     Сериализатор для вывода товаров (ProductInfo).
-    Показываем клиенту основные данные: какой товар, какой магазин, цена и остаток.
+    Показываем клиенту основные данные: какой товар, какой магазин, категория, цена и остаток.
+    Queryset должен подтягивать product__category и shop через select_related.
     """
     # Преобразуем связанные поля в строку для удобного отображения
     product = serializers.CharField(source='product.__str__', read_only=True)
     shop = serializers.CharField(source='shop.__str__', read_only=True)
+    category = serializers.CharField(source='product.category.name', read_only=True)
+    # Варианты картинки {формат: {ширина: url}} (см. backend/images.py) или null
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = ProductInfo
-        fields = ('id', 'product', 'shop', 'price', 'quantity')
+        fields = ('id', 'product', 'shop', 'category', 'price', 'quantity', 'images')
+
+    def get_images(self, obj):
+        return variant_urls("product", obj.pk, obj.image, obj.image_hash)
 
 
 class ContactSerializer(serializers.ModelSerializer):
@@ -1,19 +1,29 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from .models import Profile, ProductInfo
-from .tasks import (
-    generate_profile_avatar_thumbnails,
-    generate_product_image_thumbnails
-)
+from .thumbnails import queue_thumbnails, update_hash
+
+
+# Миниатюры создаются только при смене содержимого картинки (см. backend/thumbnails.py):
+# pre_save пересчитывает отпечаток, post_save ставит задачу, когда pk уже известен
+
+@receiver(pre_save, sender=Profile)
+def hash_profile_avatar(sender, instance, **kwargs):
+    instance._thumbnails_changed = update_hash(instance, "avatar", "avatar_hash")
 
 
 @receiver(post_save, sender=Profile)
 def process_profile_avatar(sender, instance, created, **kwargs):
-    if instance.avatar:
-        generate_profile_avatar_thumbnails.delay(instance.id)
+    if getattr(instance, "_thumbnails_changed", False):
+        queue_thumbnails("avatar", instance.pk, instance.avatar_hash)
+
+
+@receiver(pre_save, sender=ProductInfo)
+def hash_product_image(sender, instance, **kwargs):
+    instance._thumbnails_changed = update_hash(instance, "image", "image_hash")
 
 
 @receiver(post_save, sender=ProductInfo)
 def process_product_image(sender, instance, created, **kwargs):
-    if instance.image:
-        generate_product_image_thumbnails.delay(instance.id)
+    if getattr(instance, "_thumbnails_changed", False):
+        queue_thumbnails("product", instance.pk, instance.image_hash)
@@ -0,0 +1,114 @@
+"""
+Операции с остатками товаров (ProductInfo.quantity).
+
+Остатки меняются условными UPDATE с F()-выражениями: проверка "хватает ли товара"
+и списание выполняются в БД одним запросом, поэтому параллельные заказы не могут
+продать больше, чем есть на складе.
+
+Поставщик может обновить цены и остатки без загрузки прайс-листа: update_offers.
+"""
+from django.db.models import Case, F, FloatField, PositiveIntegerField, Q, Value, When
+
+from .catalog_cache import bump_catalog_version, stock_changed
+from .models import ProductInfo
+
+
+class OutOfStock(Exception):
+    """Товара не хватает хотя бы по одной позиции; подробности — stock_shortages()."""
+
+
+def reserve_stock(quantities):
+    """
+    Списывает остатки: quantities = {product_info_id: количество}.
+    Один UPDATE на все позиции; строка обновляется, только если остатка хватает.
+    Если обновились не все позиции — выбрасывает OutOfStock: вызывать внутри
+    transaction.atomic(), чтобы частичное списание откатилось.
+    """
+    condition = Q()
+    for pk, qty in quantities.items():
+        condition |= Q(pk=pk, quantity__gte=qty)
+
+    updated = ProductInfo.objects.filter(condition).update(
+        quantity=Case(*[When(pk=pk, then=F('quantity') - qty) for pk, qty in quantities.items()])
+    )
+    if updated != len(quantities):
+        raise OutOfStock()
+
+    # Строки заблокированы нашим UPDATE до конца транзакции — прочитанные остатки точные
+    remaining = ProductInfo.objects.filter(pk__in=list(quantities)).values_list('pk', 'quantity')
+    stock_changed({pk: (qty + quantities[pk], qty) for pk, qty in remaining})
+
+
+def release_stock(quantities):
+    """Возвращает товар на склад (отмена заказа): один UPDATE на все позиции."""
+    if not quantities:
+        return
+    ProductInfo.objects.filter(pk__in=list(quantities)).update(
+        quantity=Case(*[When(pk=pk, then=F('quantity') + qty) for pk, qty in quantities.items()],
+                      default=F('quantity'), output_field=PositiveIntegerField())
+    )
+    remaining = ProductInfo.objects.filter(pk__in=list(quantities)).values_list('pk', 'quantity')
+    stock_changed({pk: (qty - quantities[pk], qty) for pk, qty in remaining})
+
+
+def stock_shortages(quantities):
+    """Позиции, по которым не хватает товара: [{"product_info", "requested", "available"}]."""
+    available = dict(ProductInfo.objects.filter(pk__in=list(quantities)).values_list('pk', 'quantity'))
+    return [
+        {"product_info": pk, "requested": qty, "available": available.get(pk, 0)}
+        for pk, qty in quantities.items()
+        if available.get(pk, 0) < qty
+    ]
+
+
+# Сколько строк обновлять одним UPDATE (ограничение на число параметров запроса в SQLite)
+UPDATE_CHUNK_SIZE = 500
+
+
+def update_offers(shop_ids, updates):
+    """
+    Обновляет цены и остатки предложений магазинов shop_ids.
+    updates = [{"id" или "external_id", "price"?, "quantity"?}], значения уже проверены.
+    Одно чтение текущих значений и один UPDATE (CASE по id) на каждые UPDATE_CHUNK_SIZE строк.
+    Вызывать внутри transaction.atomic().
+    Возвращает (число обновлённых предложений, ссылки, не найденные в магазинах поставщика).
+    """
+    ids = [u["id"] for u in updates if "id" in u]
+    external_ids = [u["external_id"] for u in updates if "id" not in u]
+    rows = ProductInfo.objects.filter(shop_id__in=shop_ids).filter(
+        Q(pk__in=ids) | Q(external_id__in=external_ids)
+    ).select_for_update().values_list('pk', 'external_id', 'price', 'quantity')
+
+    current, by_external_id = {}, {}
+    for pk, external_id, price, quantity in rows:
+        current[pk] = (price, quantity)
+        by_external_id[external_id] = pk
+
+    changes, not_found = {}, []
+    for update in updates:
+        pk = update["id"] if "id" in update else by_external_id.get(update["external_id"])
+        if pk not in current:
+            not_found.append({k: update[k] for k in ("id", "external_id") if k in update})
+            continue
+        price, quantity = changes.get(pk, current[pk])
+        changes[pk] = (update.get("price", price), update.get("quantity", quantity))
+    changes = {pk: values for pk, values in changes.items() if values != current[pk]}
+
+    pks = list(changes)
+    for start in range(0, len(pks), UPDATE_CHUNK_SIZE):
+        chunk = pks[start:start + UPDATE_CHUNK_SIZE]
+        ProductInfo.objects.filter(pk__in=chunk).update(
+            price=Case(*[When(pk=pk, then=Value(changes[pk][0])) for pk in chunk],
+                       default=F('price'), output_field=FloatField()),
+            quantity=Case(*[When(pk=pk, then=Value(changes[pk][1])) for pk in chunk],
+                          default=F('quantity'), output_field=PositiveIntegerField()),
+            # Следующий импорт прайс-листа не должен пропустить эти строки как неизменившиеся
+            import_hash='',
+        )
+
+    stock_changed({pk: (current[pk][1], quantity) for pk, (_, quantity) in changes.items()
+                   if quantity != current[pk][1]})
+    # Цена хранится в снимках страниц и фасетах — их нужно сбросить
+    if any(price != current[pk][0] for pk, (price, _) in changes.items()):
+        bump_catalog_version()
+    return len(changes), not_found
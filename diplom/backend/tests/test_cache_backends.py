@@ -0,0 +1,92 @@
+import time
+import uuid
+
+from backend.cache_backends import TwoTierCache
+
+
+def make_caches(count=2, **options):
+    """Несколько TwoTierCache над общим L2 — как кэши разных процессов."""
+    channel = uuid.uuid4().hex
+    return [
+        TwoTierCache(None, {"OPTIONS": {"L2": "l2", "NAME": uuid.uuid4().hex, "CHANNEL": channel, **options}})
+        for _ in range(count)
+    ]
+
+
+def test_two_tier_invalidation():
+    first, second = make_caches()
+    first.set("catalog:version", 1)
+
+    assert second.get("catalog:version") == 1   # из L2, кладётся в L1
+    assert second.get("catalog:version") == 1   # из L1
+    assert (second.stats()["l2_hits"], second.stats()["l1_hits"]) == (1, 1)
+
+    # Запись в одном "процессе" сбрасывает L1 в другом
+    first.incr("catalog:version")
+    assert second.get("catalog:version") == 2
+    first.set_many({"catalog:version": 3})
+    assert second.get_many(["catalog:version", "missing"]) == {"catalog:version": 3}
+    first.delete("catalog:version")
+    assert second.get("catalog:version") is None
+    assert second.stats()["invalidations"] == 3
+
+    # Изменяемые значения из L1 не разделяются между вызовами
+    first.set("cart", {"1": 2})
+    first.get("cart")["1"] = 100
+    assert first.get("cart") == {"1": 2}
+
+
+def test_two_tier_l1_limits():
+    cache, = make_caches(1, L1_MAX_ENTRIES=2, L1_TIMEOUT=0.05)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    assert cache.stats()["l1_evictions"] == 1 and cache.stats()["l1_entries"] == 2
+
+    # Вытесненная запись читается из L2
+    assert cache.get("a") == "a"
+    assert cache.stats()["l2_hits"] == 1
+
+    time.sleep(0.06)
+    assert cache.get("a") == "a"
+    assert cache.stats()["l1_expired"] == 1
+
+
+def test_redis_broadcast_reconnects_after_errors(caplog):
+    import threading
+
+    from backend.cache_backends import L1Store, RedisBroadcast
+
+    subscribed = threading.Event()
+
+    class PubSub:
+        def subscribe(self, channel):
+            pass
+
+        def listen(self):
+            subscribed.set()
+            threading.Event().wait()
+            return iter(())
+
+        def close(self):
+            pass
+
+    class Client:
+        attempts = 0
+
+        def pubsub(self, **kwargs):
+            self.attempts += 1
+            if self.attempts < 3:
+                raise ConnectionError("redis down")
+            return PubSub()
+
+    class FastRetry(RedisBroadcast):
+        RETRY_DELAY = 0.01
+
+    client = Client()
+    store = L1Store(10, 1024, 30)
+    FastRetry(store, uuid.uuid4().hex, lambda: client)
+
+    # Ошибка подписки пишется в лог, после паузы подписчик переподключается
+    assert subscribed.wait(5)
+    assert store.listening and client.attempts == 3
+    assert len([r for r in caplog.records if "переподключение" in r.getMessage()]) == 2
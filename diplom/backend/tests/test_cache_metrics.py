@@ -0,0 +1,92 @@
+from unittest.mock import patch
+
+import pytest
+from cachalot.utils import get_table_cache_key
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import RequestFactory
+from django.urls import resolve
+from rest_framework.test import APIClient
+
+from backend import cache_metrics
+from backend.cache_metrics import CacheMetricsMiddleware
+
+
+def fake_cachalot(store):
+    """Упрощённый _get_result_or_execute_query cachalot: результат из store или выполнение запроса."""
+    def get_result_or_execute_query(execute_query_func, cache, cache_key, table_cache_keys):
+        if cache_key not in store:
+            store[cache_key] = execute_query_func()
+        return store[cache_key]
+    return get_result_or_execute_query
+
+
+@pytest.mark.django_db
+def test_cache_metrics_report(settings, capsys):
+    settings.CACHE_METRICS_SIZE_SAMPLE = 1
+    cache_metrics.reset()
+    keys = [get_table_cache_key("default", table)
+            for table in ("backend_shop", "backend_productinfo")]
+    query = cache_metrics.instrument(fake_cachalot({}))
+
+    assert query(lambda: ["offer"] * 100, None, "catalog", keys) == ["offer"] * 100   # промах
+    query(lambda: [], None, "catalog", keys)   # попадание
+    query(lambda: [], None, "catalog", keys)
+
+    token = cache_metrics.origin.set("task:backend.tasks.process_import_job")
+    cache_metrics.record_invalidation("backend_productinfo", db_alias="default")
+    cache_metrics.origin.reset(token)
+    cache_metrics.record_invalidation("backend_productinfo", db_alias="default")
+
+    report = cache_metrics.cache_report()
+    assert report["invalidations"] == [{
+        "table": "backend_productinfo", "total": 2,
+        "origins": {"task:backend.tasks.process_import_job": 1, "other": 1},
+    }]
+    family, = report["queries"]
+    assert family["family"] == "backend_productinfo+backend_shop"
+    assert (family["hits"], family["misses"], family["hit_rate"]) == (2, 1, 0.667)
+    assert family["avg_bytes"] > 0
+    assert report["tiers"]["l1_entries"] >= 0
+
+    # Эндпоинт — только для администраторов
+    client = APIClient()
+    assert client.get("/metrics/cache/").status_code in (401, 403)
+    admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pass")
+    client.force_authenticate(admin)
+    assert client.get("/metrics/cache/").json()["invalidations"][0]["total"] == 2
+
+    call_command("cache_report", "--reset")
+    out = capsys.readouterr().out
+    assert "backend_productinfo+backend_shop" in out and "task:backend.tasks.process_import_job" in out
+    assert cache_metrics.cache_report()["invalidations"] == []
+
+
+def test_cache_metrics_never_break_queries():
+    keys = [get_table_cache_key("default", "backend_shop")]
+    query = cache_metrics.instrument(fake_cachalot({}))
+    with patch.object(cache_metrics.counters, "count", side_effect=RuntimeError("metrics down")):
+        assert query(lambda: ["shop"], None, "shops", keys) == ["shop"]
+
+    # Источник сбросов — имя url, найденное Django для запроса
+    request = RequestFactory().get("/catalog/")
+    request.resolver_match = resolve("/catalog/")
+    middleware = CacheMetricsMiddleware(
+        lambda request: (middleware.process_view(request, None, (), {}), cache_metrics.origin.get())[1]
+    )
+    assert middleware(request) == "url:catalog"
+    assert cache_metrics.origin.get() == "other"
+
+
+def test_cache_metrics_skip_size_of_iterators(settings, caplog):
+    settings.CACHE_METRICS_SIZE_SAMPLE = 1
+    cache_metrics.reset()
+    keys = [get_table_cache_key("default", "backend_shop")]
+    query = cache_metrics.instrument(fake_cachalot({}))
+
+    # Результат-генератор (iterator() у QuerySet) не pickle-ится: размер не измеряется, лог не засоряется
+    rows = query(lambda: (row for row in ["shop"]), None, "shops", keys)
+    assert list(rows) == ["shop"]
+    assert not caplog.records
+    family, = cache_metrics.cache_report()["queries"]
+    assert (family["misses"], family["avg_bytes"]) == (1, None)
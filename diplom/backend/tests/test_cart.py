@@ -0,0 +1,68 @@
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+from backend.models import ProductInfo, Product, Category, Shop
+
+
+def create_offer(name):
+    category, _ = Category.objects.get_or_create(name="Phones")
+    shop, _ = Shop.objects.get_or_create(name="Tech Store")
+    product = Product.objects.create(name=name, category=category)
+    return ProductInfo.objects.create(product=product, name=name, price=500, quantity=10, shop=shop, price_rrc=600)
+
+
+@pytest.mark.django_db
+def test_cart_add_and_remove_do_not_write_session(auth_client):
+    client, _ = auth_client
+    phone = create_offer("Phone")
+
+    with CaptureQueriesContext(connection) as ctx:
+        client.post(reverse("cart"), {"product_info": phone.id, "quantity": 2}, format="json")
+        client.post(reverse("cart"), {"product_info": phone.id, "quantity": 1}, format="json")
+    assert not [q for q in ctx.captured_queries if "django_session" in q["sql"]]
+
+    response = client.get(reverse("cart"))
+    assert [(i["product_info"], i["quantity"]) for i in response.data["items"]] == [(phone.id, 3)]
+
+    assert client.delete(reverse("cart"), {"product_info": phone.id}, format="json").status_code == 200
+    assert client.get(reverse("cart")).data["items"] == []
+    assert client.delete(reverse("cart"), {"product_info": phone.id}, format="json").status_code == 404
+
+
+@pytest.mark.django_db
+def test_cart_rejects_non_numeric_values(auth_client):
+    client, _ = auth_client
+    phone = create_offer("Phone")
+
+    for data in ({"product_info": "abc"}, {"product_info": phone.id, "quantity": "two"}, {"product_info": [1]}):
+        response = client.post(reverse("cart"), data, format="json")
+        assert response.status_code == 400 and "detail" in response.data, data
+    assert client.delete(reverse("cart"), {"product_info": "abc"}, format="json").status_code == 400
+    assert client.get(reverse("cart")).data["items"] == []
+
+
+@pytest.mark.django_db
+def test_session_cart_is_merged_on_login():
+    phone = create_offer("Phone")
+    case = create_offer("Case")
+    user = User.objects.create_user(username="buyer", password="testpass", is_active=True)
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+    client.post(reverse("cart"), {"product_info": phone.id, "quantity": 1}, format="json")
+    client.force_authenticate(user=None)
+
+    # Корзина, оставшаяся в сессии (до входа или от старой версии), складывается с корзиной пользователя
+    session = client.session
+    session["cart"] = {str(phone.id): 2, str(case.id): 1}
+    session.save()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+    assert client.post(reverse("login"), {"username": "buyer", "password": "testpass"}, format="json").status_code == 200
+    client.force_authenticate(user=user)
+    items = client.get(reverse("cart")).data["items"]
+    assert sorted((i["product_info"], i["quantity"]) for i in items) == [(phone.id, 3), (case.id, 1)]
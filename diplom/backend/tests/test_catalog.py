@@ -1,7 +1,13 @@
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APIClient
-from backend.models import ProductInfo, Product,Category, Shop
+from django.http import QueryDict
+from backend.models import ProductInfo, Product,Category, Shop, Parameter, ProductParameter
+from backend.filters import filter_catalog
+from backend.catalog_cache import bump_catalog_version
+from backend.importer import ProductImporter
 
 
 @pytest.mark.django_db
@@ -15,3 +21,206 @@ def test_catalog_list():
     response = client.get(url)
     assert response.status_code == 200
     assert "items" in response.data
+
+
+def create_offers(count):
+    category = Category.objects.create(name="Electronics")
+    shop = Shop.objects.create(name="Tech Store")
+    for i in range(count):
+        product = Product.objects.create(name=f"Laptop {i}", category=category)
+        ProductInfo.objects.create(product=product, name=product.name, price=1000 + i, quantity=3, shop=shop, price_rrc=1200)
+
+
+@pytest.mark.django_db
+def test_catalog_pagination():
+    client = APIClient()
+    create_offers(5)
+
+    response = client.get(reverse("catalog"), {"page_size": 3})
+    assert len(response.data["items"]) == 3
+    assert response.data["items"][0]["category"] == "Electronics"
+
+    response = client.get(response.data["next"])
+    assert len(response.data["items"]) == 2
+    assert response.data["next"] is None
+
+
+@pytest.mark.django_db
+def test_catalog_query_count_does_not_depend_on_page_size():
+    client = APIClient()
+    create_offers(30)
+
+    with CaptureQueriesContext(connection) as small:
+        client.get(reverse("catalog"), {"page_size": 2})
+    with CaptureQueriesContext(connection) as large:
+        client.get(reverse("catalog"), {"page_size": 30})
+
+    assert len(small.captured_queries) == len(large.captured_queries) == 1
+
+
+@pytest.mark.django_db
+def test_catalog_filters_and_ordering():
+    client = APIClient()
+    create_offers(5)
+    phone_category = Category.objects.create(name="Phones")
+    other_shop = Shop.objects.create(name="Other Store")
+    phone = Product.objects.create(name="Phone", category=phone_category)
+    pi = ProductInfo.objects.create(product=phone, name="Phone", price=500, quantity=2, shop=other_shop, price_rrc=600)
+    color = Parameter.objects.create(name="Цвет")
+    ProductParameter.objects.create(product_info=pi, parameter=color, value="черный")
+
+    def ids(**params):
+        return [item["id"] for item in client.get(reverse("catalog"), params).data["items"]]
+
+    assert ids(category=phone_category.pk) == [pi.pk]
+    assert ids(shop=other_shop.pk) == [pi.pk]
+    assert ids(param="Цвет:черный") == [pi.pk]
+    assert ids(param="Цвет:белый") == []
+    assert len(ids(price_min=1001, price_max=1003)) == 3
+    assert ids(ordering="price")[0] == pi.pk
+    assert ids(ordering="-price")[-1] == pi.pk
+
+    assert client.get(reverse("catalog"), {"price_min": "abc"}).status_code == 400
+
+
+def query_plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return " ".join(row[-1] for row in cursor.fetchall())
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != "sqlite", reason="План запроса проверяем на SQLite")
+def test_catalog_filters_use_indexes():
+    Parameter.objects.create(name="Цвет")
+    base = ProductInfo.objects.all()
+
+    plan = query_plan(filter_catalog(base, QueryDict("")).order_by("price", "id"))
+    assert "pi_instock_price_idx" in plan
+
+    plan = query_plan(filter_catalog(base, QueryDict("shop=1&price_min=10&price_max=100")))
+    assert "pi_shop_price_idx" in plan
+
+    plan = query_plan(filter_catalog(base, QueryDict("param=Цвет:черный")))
+    assert "COVERING INDEX pp_param_value_idx" in plan
+
+
+@pytest.mark.django_db
+def test_catalog_facets():
+    client = APIClient()
+    shop = Shop.objects.create(name="Tech Store")
+    ProductImporter(shop).run([
+        {"name": f"Phone {i}", "category": "Phones", "price": 100 * (i + 1), "quantity": 1,
+         "parameters": {"Цвет": ("черный", "черный", "белый")[i % 3], "Память (Гб)": 64}}
+        for i in range(10)
+    ])
+
+    response = client.get(reverse("catalog_facets"), {"param": "Память (Гб):64"})
+    assert response.status_code == 200
+    assert response.data["total"] == 10
+    assert response.data["parameters"] == [
+        {"name": "Память (Гб)", "values": [{"value": "64", "count": 10}]},
+        {"name": "Цвет", "values": [{"value": "черный", "count": 7}, {"value": "белый", "count": 3}]},
+    ]
+    price = response.data["price"]
+    assert (price["min"], price["max"]) == (100, 1000)
+    assert [b["count"] for b in price["buckets"]] == [1, 1, 1, 1, 1, 1, 1, 1, 1, 1]
+
+    response = client.get(reverse("catalog_facets"), {"param": "Цвет:белый"})
+    assert response.data["total"] == 3
+
+
+@pytest.mark.django_db
+def test_catalog_facets_are_cached_until_import(django_capture_on_commit_callbacks):
+    client = APIClient()
+    shop = Shop.objects.create(name="Tech Store")
+    items = [{"id": 1, "name": "Phone", "category": "Phones", "price": 100, "quantity": 1,
+              "parameters": {"Цвет": "черный"}}]
+    ProductImporter(shop).run(items)
+    client.get(reverse("catalog_facets"))
+
+    with CaptureQueriesContext(connection) as ctx:
+        cached = client.get(reverse("catalog_facets")).data
+    assert len(ctx.captured_queries) == 0
+
+    # Версия каталога меняется после фиксации транзакции импорта
+    items[0]["parameters"]["Цвет"] = "белый"
+    with django_capture_on_commit_callbacks(execute=True):
+        ProductImporter(shop).run(items)
+    fresh = client.get(reverse("catalog_facets")).data
+    assert cached["parameters"][0]["values"][0]["value"] == "черный"
+    assert fresh["parameters"][0]["values"][0]["value"] == "белый"
+
+
+@pytest.mark.django_db
+def test_catalog_snapshot_etag():
+    client = APIClient()
+    create_offers(3)
+
+    first = client.get(reverse("catalog"))
+    etag = first["ETag"]
+    with CaptureQueriesContext(connection) as ctx:
+        second = client.get(reverse("catalog"))
+    assert len(ctx.captured_queries) == 0
+    assert second.data["items"] == first.data["items"]
+
+    response = client.get(reverse("catalog"), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+def test_catalog_snapshot_patches_stock(django_capture_on_commit_callbacks):
+    client = APIClient()
+    shop = Shop.objects.create(name="Tech Store")
+    items = [{"id": i, "name": f"Phone {i}", "category": "Phones", "price": 100 + i, "quantity": 5} for i in range(3)]
+    ProductImporter(shop).run(items)
+    etag = client.get(reverse("catalog"))["ETag"]
+
+    # Изменился только остаток: страница не пересобирается, остаток подставляется из кэша
+    items[0]["quantity"] = 2
+    with django_capture_on_commit_callbacks(execute=True):
+        ProductImporter(shop).run(items)
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(reverse("catalog"))
+    assert len(ctx.captured_queries) == 0
+    assert [item["quantity"] for item in response.data["items"]] == [2, 5, 5]
+    assert response["ETag"] != etag
+
+    # Товар закончился — версия каталога меняется, страница собирается заново
+    items[0]["quantity"] = 0
+    with django_capture_on_commit_callbacks(execute=True):
+        ProductImporter(shop).run(items)
+    response = client.get(reverse("catalog"))
+    assert [item["quantity"] for item in response.data["items"]] == [5, 5]
+
+
+@pytest.mark.django_db
+def test_catalog_stock_refreshed_after_direct_update(django_capture_on_commit_callbacks):
+    client = APIClient()
+    shop = Shop.objects.create(name="Tech Store")
+    items = [{"id": i, "name": f"Phone {i}", "category": "Phones", "price": 100 + i, "quantity": 5} for i in range(2)]
+    ProductImporter(shop).run(items)
+    client.get(reverse("catalog"))
+
+    # Остаток изменён мимо stock_changed (админка, ручное исправление) — после сброса
+    # версии каталога страница и остатки читаются из БД заново
+    ProductInfo.objects.filter(external_id=0).update(quantity=3)
+    with django_capture_on_commit_callbacks(execute=True):
+        bump_catalog_version()
+    response = client.get(reverse("catalog"))
+    assert [item["quantity"] for item in response.data["items"]] == [3, 5]
+
+
+def test_catalog_stock_changes_apply_in_any_order():
+    from backend.catalog_cache import _apply_stock, cached_catalog_page
+
+    def build():
+        return {"items": [{"id": 1, "quantity": 5}], "next": None, "previous": None}
+
+    cached_catalog_page("catalog:test:page", build, load_stock=lambda ids: {})
+    # Два заказа: 5 -> 4 -> 2; колбэки после фиксации пришли в обратном порядке
+    _apply_stock({1: (4, 2)})
+    _apply_stock({1: (5, 4)})
+    page, _ = cached_catalog_page("catalog:test:page", build, load_stock=lambda ids: {})
+    assert [item["quantity"] for item in page["items"]] == [2]
@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+import pytest
+from django.core.mail.backends.locmem import EmailBackend
+from django.utils import timezone
+
+from backend.emails import email_stats, queue_email, render_email, send_pending
+from backend.models import Category, Order, OrderItem, OutgoingEmail, Product, ProductInfo, Shop, User
+from backend.tasks import send_order_confirmation_email
+
+
+@pytest.mark.django_db
+def test_order_confirmation_email(django_capture_on_commit_callbacks, mailoutbox):
+    user = User.objects.create_user(username="buyer", email="buyer@mail.com", password="testpass")
+    shop = Shop.objects.create(name="Tech Store")
+    product = Product.objects.create(name="Phone", category=Category.objects.create(name="Phones"))
+    info = ProductInfo.objects.create(product=product, shop=shop, name="Phone", price=500, price_rrc=600, quantity=5)
+    order = Order.objects.create(user=user, status=Order.Status.NEW)
+    OrderItem.objects.create(order=order, product_info=info, quantity=2, price=500)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        send_order_confirmation_email(order.pk, user.email)
+
+    assert len(mailoutbox) == 1
+    message = mailoutbox[0]
+    assert message.subject == f"Заказ №{order.pk} создан"
+    assert "Phone (Tech Store): 2 × 500" in message.body
+    html, mimetype = message.alternatives[0]
+    assert mimetype == "text/html" and "<td>Phone</td>" in html
+    assert OutgoingEmail.objects.get().status == OutgoingEmail.Status.SENT
+
+
+@pytest.mark.django_db
+def test_send_pending_batches_and_retries(settings):
+    settings.EMAIL_BATCH_SIZE = 2
+    settings.EMAIL_MAX_ATTEMPTS = 2
+    queue_email("registration_confirmation", [f"user{i}@mail.com" for i in range(5)], {"link": "http://x/confirm"})
+
+    opened = []
+    real_open = EmailBackend.open
+
+    def fail_for(address):
+        real_send = EmailBackend.send_messages
+
+        def send_messages(self, messages):
+            if messages[0].to == [address]:
+                raise ConnectionError("550 mailbox unavailable")
+            return real_send(self, messages)
+        return send_messages
+
+    with patch.object(EmailBackend, "open", lambda self: opened.append(1) or real_open(self)), \
+            patch.object(EmailBackend, "send_messages", fail_for("user3@mail.com")):
+        result = send_pending()
+    # Соединение открывается один раз на пачку из двух писем
+    assert len(opened) == 3
+    assert (result["sent"], result["retried"], result["failed"]) == (4, 1, 0)
+
+    failed = OutgoingEmail.objects.get(to="user3@mail.com")
+    assert failed.status == OutgoingEmail.Status.PENDING and failed.attempts == 1
+    assert failed.next_attempt_at > timezone.now()
+
+    # Повтор откладывается; после EMAIL_MAX_ATTEMPTS попыток письмо помечается failed
+    OutgoingEmail.objects.filter(pk=failed.pk).update(next_attempt_at=timezone.now())
+    with patch.object(EmailBackend, "send_messages", fail_for("user3@mail.com")):
+        assert send_pending()["failed"] == 1
+    failed.refresh_from_db()
+    assert failed.status == OutgoingEmail.Status.FAILED and "550" in failed.error
+
+    stats = email_stats()
+    assert (stats["sent"], stats["failed"], stats["pending"]) == (4, 1, 0)
+
+
+def test_text_email_is_not_html_escaped():
+    subject, text, html = render_email("order_status", {
+        "order": {"pk": 7}, "status": "Доставлен <ок>",
+        "items": [{"name": 'Чехол "A&B"', "shop": "Shop & Co", "quantity": 1, "price": 10, "sum": 10}], "total": 10,
+    })
+    assert subject == "Заказ №7: Доставлен <ок>"
+    assert 'Чехол "A&B" (Shop & Co)' in text
+    assert "&amp;" in html
+
+    _, text, _ = render_email("registration_confirmation", {"link": "http://x/confirm?uid=MQ&token=abc-123"})
+    assert "http://x/confirm?uid=MQ&token=abc-123" in text
@@ -0,0 +1,123 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.feeds import fetch_feeds
+from backend.importer import ProductImporter
+from backend.models import ProductInfo, Shop
+
+FEED = """
+shop: Связной
+categories:
+  - id: 224
+    name: Смартфоны
+goods:
+  - id: 1
+    category: 224
+    name: Phone One
+    price: {price}
+    price_rrc: 120
+    quantity: 5
+    parameters:
+      Цвет: чёрный
+  - id: 2
+    category: 224
+    name: Phone Two
+    price: 200
+    price_rrc: 220
+    quantity: 3
+"""
+
+
+class FeedServer:
+    """Сервер прайс-листов: /etag.yaml поддерживает If-None-Match, /plain.yaml — без условных запросов."""
+
+    def __init__(self):
+        self.bodies = {}
+        self.hits = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.hits.append(self.path)
+                body = server.bodies.get(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.path.startswith("/etag") and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                if self.path.startswith("/etag"):
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def feed_server():
+    server = FeedServer()
+    yield server
+    server.close()
+
+
+@pytest.mark.django_db
+def test_fetch_feeds(feed_server):
+    feed_server.bodies["/etag.yaml"] = FEED.format(price=100).encode("utf-8")
+    feed_server.bodies["/plain.yaml"] = FEED.format(price=100).encode("utf-8")
+    with_etag = Shop.objects.create(name="A", url=feed_server.url + "/etag.yaml")
+    plain = Shop.objects.create(name="B", url=feed_server.url + "/plain.yaml")
+    broken = Shop.objects.create(name="C", url=feed_server.url + "/missing.yaml")
+
+    results = {r["shop"]: r for r in fetch_feeds()}
+    assert results[with_etag.pk]["status"] == "imported"
+    assert results[with_etag.pk]["stats"]["created"] == 2
+    assert results[plain.pk]["status"] == "imported"
+    assert results[broken.pk]["status"] == "failed"
+    assert ProductInfo.objects.filter(shop=with_etag).count() == 2
+
+    # Файлы не изменились: первый магазин получает 304, второй скачивает и сравнивает отпечаток
+    results = {r["shop"]: r["status"] for r in fetch_feeds()}
+    assert results == {with_etag.pk: "not_modified", plain.pk: "unchanged", broken.pk: "failed"}
+
+    feed_server.bodies["/etag.yaml"] = FEED.format(price=90).encode("utf-8")
+    results = {r["shop"]: r for r in fetch_feeds([with_etag.pk])}
+    assert results[with_etag.pk]["status"] == "imported"
+    assert results[with_etag.pk]["stats"]["updated"] == 1
+    assert ProductInfo.objects.get(shop=with_etag, external_id=1).price == 90
+    assert feed_server.hits.count("/etag.yaml") == 3
+
+
+@pytest.mark.django_db
+def test_failed_feed_import_is_rolled_back(feed_server, monkeypatch):
+    feed_server.bodies["/plain.yaml"] = FEED.format(price=100).encode("utf-8")
+    shop = Shop.objects.create(name="A", url=feed_server.url + "/plain.yaml")
+    run = ProductImporter.run
+
+    def run_then_fail(self, items):
+        run(self, items)
+        raise ValueError("обрыв файла")
+
+    monkeypatch.setattr(ProductImporter, "run", run_then_fail)
+    result, = fetch_feeds()
+    assert result["status"] == "failed"
+    assert not ProductInfo.objects.filter(shop=shop).exists()
+    shop.refresh_from_db()
+    assert shop.feed_hash == ""
@@ -0,0 +1,49 @@
+import io
+
+import pytest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from backend.models import Category, Product, ProductInfo, Shop
+
+
+def image_file(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), color).save(buffer, "PNG")
+    return SimpleUploadedFile("phone.png", buffer.getvalue(), content_type="image/png")
+
+
+@pytest.mark.django_db
+def test_image_variants():
+    info = ProductInfo.objects.create(
+        product=Product.objects.create(name="Phone", category=Category.objects.create(name="Phones")),
+        shop=Shop.objects.create(name="Tech Store"), name="Phone", price=100, price_rrc=120, quantity=1,
+        image=image_file("red"),
+    )
+    client = APIClient()
+
+    item = client.get(reverse("catalog")).data["items"][0]
+    url = item["images"]["webp"]["300"]
+    assert info.image_hash[:16] in url
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response["Content-Type"] == "image/webp"
+    assert "immutable" in response["Cache-Control"]
+    with Image.open(io.BytesIO(b"".join(response.streaming_content))) as image:
+        assert (image.format, image.size) == ("WEBP", (300, 225))
+    # Вариант сохранён рядом с оригиналом и при следующем запросе не пересоздаётся
+    name = f"{info.image.name.rsplit('.', 1)[0]}.{info.image_hash[:16]}.300.webp"
+    assert default_storage.exists(name)
+    assert client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code == 304
+
+    # Картинка сменилась — старый url перенаправляет на новую версию
+    info.image = image_file("blue")
+    info.save()
+    response = client.get(url)
+    assert response.status_code == 302 and info.image_hash[:16] in response["Location"]
+
+    assert client.get(url.replace("300.webp", "301.webp")).status_code == 404
@@ -0,0 +1,227 @@
+import json
+
+import pytest
+import yaml
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from backend.models import Profile, ProductInfo, ProductParameter
+
+
+@pytest.fixture
+def supplier_client(db):
+    client = APIClient()
+    user = User.objects.create_user(username="supplier", email="supplier@mail.com", password="testpass")
+    Profile.objects.create(user=user, is_supplier=True)
+    client.force_authenticate(user=user)
+    return client, user
+
+
+def make_price_list(price=1000, quantity=5, color="черный"):
+    data = {
+        "shop": {"name": "Tech Store"},
+        "products": [
+            {
+                "name": "Phone",
+                "category": "Phones",
+                "price": price,
+                "price_rrc": 1200,
+                "quantity": quantity,
+                "parameters": {"Цвет": color, "Память (Гб)": 128},
+            },
+            {"name": "Charger", "category": "Accessories", "price": 10, "price_rrc": 15, "quantity": 3},
+        ],
+    }
+    return SimpleUploadedFile("price.yaml", yaml.safe_dump(data, allow_unicode=True).encode("utf-8"))
+
+
+@pytest.mark.django_db
+def test_import_creates_products(supplier_client):
+    client, _ = supplier_client
+    url = reverse("product_import")
+
+    response = client.post(url, {"file": make_price_list()}, format="multipart")
+
+    assert response.status_code == 200
+    assert response.data["created"] == 2
+    assert ProductInfo.objects.count() == 2
+    assert ProductParameter.objects.get(parameter__name="Память (Гб)").value == "128"
+
+
+@pytest.mark.django_db
+def test_reimport_counts_updated_and_unchanged(supplier_client):
+    client, _ = supplier_client
+    url = reverse("product_import")
+    client.post(url, {"file": make_price_list()}, format="multipart")
+
+    response = client.post(url, {"file": make_price_list()}, format="multipart")
+    assert (response.data["created"], response.data["updated"], response.data["unchanged"]) == (0, 0, 2)
+
+    response = client.post(url, {"file": make_price_list(price=900, color="белый")}, format="multipart")
+    assert (response.data["created"], response.data["updated"], response.data["unchanged"]) == (0, 1, 1)
+
+    phone = ProductInfo.objects.get(product__name="Phone")
+    assert phone.price == 900
+    assert phone.parameters.get(parameter__name="Цвет").value == "белый"
+    assert ProductInfo.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_async_import_job(supplier_client):
+    client, _ = supplier_client
+
+    response = client.post(reverse("product_import"), {"file": make_price_list(), "async": "1"}, format="multipart")
+    assert response.status_code == 202
+
+    # В тестах Celery работает синхронно, поэтому задача уже выполнена
+    response = client.get(response.data["status_url"])
+    assert response.status_code == 200
+    assert response.data["job_status"] == "done"
+    assert response.data["rows_processed"] == 2
+    assert response.data["stats"]["created"] == 2
+    assert ProductInfo.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_import_supplier_format(supplier_client, django_assert_max_num_queries):
+    client, _ = supplier_client
+    url = reverse("product_import")
+    path = settings.BASE_DIR / "shop1.yaml"
+
+    response = client.post(url, {"file": SimpleUploadedFile("shop1.yaml", path.read_bytes())}, format="multipart")
+    assert response.status_code == 200
+    assert response.data["created"] == 14
+
+    pi = ProductInfo.objects.get(external_id=4216292)
+    assert pi.shop.name == "Связной"
+    assert pi.product.category.name == "Смартфоны"
+    assert pi.shop.categories.count() == 4
+
+    # Повторный импорт сопоставляет строки по external_id, без поиска категорий и товаров
+    with django_assert_max_num_queries(12):
+        response = client.post(url, {"file": SimpleUploadedFile("shop1.yaml", path.read_bytes())}, format="multipart")
+    assert response.data["unchanged"] == 14
+
+
+@pytest.mark.django_db
+def test_unchanged_reimport_writes_nothing(supplier_client):
+    client, _ = supplier_client
+    url = reverse("product_import")
+    client.post(url, {"file": make_price_list()}, format="multipart")
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.post(url, {"file": make_price_list()}, format="multipart")
+
+    assert response.data["unchanged"] == 2
+    writes = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith(("INSERT", "UPDATE"))]
+    assert writes == []
+
+    # Остаток изменился вне импорта (например, заказом) — строка снова записывается
+    ProductInfo.objects.filter(product__name="Phone").update(quantity=1)
+    response = client.post(url, {"file": make_price_list()}, format="multipart")
+    assert response.data["updated"] == 1
+    assert ProductInfo.objects.get(product__name="Phone").quantity == 5
+
+
+@pytest.mark.django_db
+def test_reimport_deactivates_missing(supplier_client):
+    client, _ = supplier_client
+    url = reverse("product_import")
+    client.post(url, {"file": make_price_list()}, format="multipart")
+
+    data = {"shop": {"name": "Tech Store"}, "products": [{"name": "Phone", "category": "Phones", "quantity": 5}]}
+    file = SimpleUploadedFile("price.json", json.dumps(data).encode("utf-8"))
+    response = client.post(url, {"file": file, "deactivate_missing": "1"}, format="multipart")
+
+    assert response.data["deactivated"] == 1
+    assert ProductInfo.objects.get(product__name="Charger").quantity == 0
+
+
+@pytest.mark.django_db
+def test_import_rows_with_ids_validated(supplier_client):
+    client, _ = supplier_client
+    url = reverse("product_import")
+
+    def post(products):
+        data = {"shop": {"name": "Tech Store"}, "products": products}
+        file = SimpleUploadedFile("price.json", json.dumps(data).encode("utf-8"))
+        return client.post(url, {"file": file}, format="multipart")
+
+    row = {"id": 1, "name": "A", "category": "Phones", "price": 10, "price_rrc": 12, "quantity": 1}
+    response = post([row, {**row, "name": "B"}, {**row, "id": 2, "quantity": 10 ** 20},
+                     {**row, "id": 3, "price": "nan"}, {**row, "id": 4, "quantity": "1e400"}])
+    assert response.status_code == 200
+    assert response.data["created"] == 1
+    assert [error["row"] for error in response.data["errors"]] == [2, 3, 4, 5]
+
+    # Тот же id с другим названием и категорией — предложение привязывается к другому товару
+    response = post([{**row, "name": "B", "category": "Tablets"}])
+    assert (response.data["updated"], response.data["unchanged"]) == (1, 0)
+    info = ProductInfo.objects.get(external_id=1)
+    assert (info.name, info.product.name, info.product.category.name) == ("B", "B", "Tablets")
+    assert ProductInfo.objects.count() == 1
+    assert post([{**row, "name": "B", "category": "Tablets"}]).data["unchanged"] == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("batch_size", [1, 500])
+def test_import_same_product_in_several_rows(batch_size):
+    from backend.importer import ProductImporter
+    from backend.models import Shop
+
+    shop = Shop.objects.create(name="Tech Store")
+    row = {"name": "Phone", "category": "Phones", "price": 10, "quantity": 1}
+    for _ in range(2):
+        # Разные id одного товара: действует первая строка, остальные — ошибки
+        stats = ProductImporter(shop, batch_size=batch_size).run(
+            [{**row, "id": 1}, {**row, "id": 2, "quantity": 5}, {**row, "quantity": 7}]
+        )
+        assert [error["row"] for error in stats["errors"]] == [2, 3]
+        info = ProductInfo.objects.get()
+        assert (info.external_id, info.quantity) == (1, 1)
+
+
+@pytest.mark.django_db
+def test_import_rejects_overlong_strings(supplier_client):
+    client, _ = supplier_client
+    row = {"name": "Phone", "category": "Phones", "price": 10, "quantity": 1}
+    products = [
+        row,
+        {**row, "name": "x" * 101},
+        {**row, "name": "Case", "category": "x" * 101},
+        {**row, "name": "Cable", "name_in_shop": "x" * 151},
+        {**row, "name": "Charger", "parameters": {"x" * 51: "1"}},
+        {**row, "name": "Stand", "parameters": {"Цвет": "x" * 101}},
+    ]
+    data = {"shop": {"name": "Tech Store"}, "products": products}
+    file = SimpleUploadedFile("price.json", json.dumps(data).encode("utf-8"))
+
+    response = client.post(reverse("product_import"), {"file": file}, format="multipart")
+
+    assert response.status_code == 200
+    assert response.data["created"] == 1
+    assert [error["row"] for error in response.data["errors"]] == [2, 3, 4, 5, 6]
+
+
+@pytest.mark.django_db
+def test_import_corrupt_excel_rejected(supplier_client):
+    import io
+    import zipfile
+
+    import openpyxl
+
+    client, _ = supplier_client
+    workbook = io.BytesIO()
+    openpyxl.Workbook().save(workbook)
+    not_a_workbook = io.BytesIO()
+    with zipfile.ZipFile(not_a_workbook, "w") as archive:
+        archive.writestr("readme.txt", "x")
+
+    for content in (workbook.getvalue()[:200], b"not a zip", not_a_workbook.getvalue()):
+        response = client.post(reverse("product_import"),
+                               {"file": SimpleUploadedFile("price.xlsx", content)}, format="multipart")
+        assert response.status_code == 400, response.data
@@ -0,0 +1,56 @@
+from unittest.mock import patch
+
+import pytest
+from rest_framework.test import APIClient
+
+from backend import metrics
+from backend.tasks import generate_thumbnails
+
+
+@pytest.mark.django_db
+def test_prometheus_metrics(settings):
+    metrics.counters.reset()
+    client = APIClient()
+    for _ in range(3):
+        assert client.get("/catalog/").status_code == 200
+    generate_thumbnails.delay([])
+
+    settings.METRICS_TOKEN = "secret"
+    scraper = {"HTTP_AUTHORIZATION": "Bearer secret"}
+    response = client.get("/metrics", **scraper)
+    assert response["Content-Type"] == metrics.CONTENT_TYPE
+    text = response.content.decode()
+    labels = 'view="catalog",method="GET"'
+    assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3' in text
+    assert f'http_request_duration_seconds_count{{{labels}}} 3' in text
+    assert f'http_requests_total{{view="catalog",method="GET",status="200"}} 3' in text
+    assert f'http_db_queries_count{{{labels}}} 3' in text
+    assert f'http_response_size_bytes_bucket{{{labels},le="+Inf"}} 3' in text
+    assert f'http_db_duration_seconds_total{{{labels}}}' in text
+    assert 'celery_task_duration_seconds_count{task="backend.tasks.generate_thumbnails",state="SUCCESS"} 1' in text
+
+    # Гистограмма накопительная: каждый следующий интервал не меньше предыдущего
+    buckets = [int(line.rsplit(" ", 1)[1]) for line in text.splitlines()
+               if line.startswith(f"http_request_duration_seconds_bucket{{{labels}")]
+    assert buckets == sorted(buckets) and len(buckets) == len(metrics.DURATION_BUCKETS) + 1
+
+    # Неизвестный метод попадает в общую метку
+    client.generic("BREW", "/catalog/")
+    assert 'view="catalog",method="other"' in client.get("/metrics", **scraper).content.decode()
+
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code == 403
+    settings.METRICS_TOKEN = ""
+    assert client.get("/metrics", HTTP_AUTHORIZATION="Bearer ").status_code == 403
+
+
+def test_metrics_flush_survives_cache_errors(settings):
+    counters = metrics.SharedCounters("metrics-test", "METRICS_CACHE", "METRICS_FLUSH_INTERVAL")
+    counters.reset()
+    counters.count_many([("a", 2), ("b", 1)])
+
+    with patch.object(counters, "_send", side_effect=ConnectionError("redis down")):
+        counters.flush()
+    # Счётчики не потеряны и уходят при следующем сбросе
+    counters.count("a")
+    assert counters.values() == {"a": 3, "b": 1}
@@ -1,9 +1,18 @@
+import threading
+import time
+
 import pytest
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APIClient
 from django.contrib.auth.models import User
 from django.conf import settings
-from backend.models import Contact, ProductInfo, Order, Product,Category, Shop
+from backend.models import Contact, ProductInfo, Order, OrderItem, Product,Category, Shop
+
+# Запросов к БД на оформление заказа (сессия, корзина, резерв, заказ и его части)
+ORDER_CREATE_MAX_QUERIES = 9
 
 
 @pytest.fixture
@@ -39,7 +48,178 @@ def test_create_order(auth_client):
     url = reverse("order_create")
     response = client.post(url, {"contact_id": contact.id}, format="json")
 
-    print(response.data)
-    assert response.status_code in (200, 201)
+    assert response.status_code in (200, 201), response.data
     assert "order_id" in response.data
-    assert Order.objects.filter(user=user).exists()
\ No newline at end of file
+    assert Order.objects.filter(user=user).exists()
+
+def create_offer(quantity, name="Phone"):
+    category, _ = Category.objects.get_or_create(name="Phones")
+    shop, _ = Shop.objects.get_or_create(name="Tech Store")
+    product = Product.objects.create(name=name, category=category)
+    return ProductInfo.objects.create(product=product, name=name, price=500, quantity=quantity, shop=shop, price_rrc=600)
+
+
+@pytest.mark.django_db
+def test_order_is_not_created_when_any_item_is_short(auth_client):
+    client, user = auth_client
+    phone = create_offer(5)
+    case = create_offer(1, name="Case")
+    contact = Contact.objects.create(user=user, type="address", value="Moscow")
+
+    response = client.post(reverse("order_create"), {"contact_id": contact.id, "items": [
+        {"product_info": phone.id, "quantity": 2},
+        {"product_info": case.id, "quantity": 3},
+    ]}, format="json")
+
+    assert response.status_code == 409
+    assert response.data["failed"] == [{"product_info": case.id, "requested": 3, "available": 1}]
+    assert not Order.objects.exists()
+    phone.refresh_from_db()
+    assert phone.quantity == 5
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_checkouts_do_not_oversell():
+    stock, buyers = 5, 20
+    phone = create_offer(stock)
+    clients = []
+    for i in range(buyers):
+        user = User.objects.create(username=f"buyer{i}")
+        contact = Contact.objects.create(user=user, type="address", value="Moscow")
+        client = APIClient()
+        client.force_authenticate(user=user)
+        clients.append((client, contact.id))
+
+    barrier = threading.Barrier(buyers)
+    results = []
+
+    def checkout(client, contact_id):
+        barrier.wait()
+        try:
+            while True:
+                try:
+                    response = client.post(reverse("order_create"), {
+                        "contact_id": contact_id, "items": [{"product_info": phone.id, "quantity": 1}],
+                    }, format="json")
+                except OperationalError:
+                    # SQLite в памяти не ждёт блокировку, а сразу сообщает "table is locked" — повторяем
+                    time.sleep(0.001)
+                    continue
+                results.append(response.status_code)
+                return
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=checkout, args=args) for args in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Продано ровно столько, сколько было на складе
+    phone.refresh_from_db()
+    assert phone.quantity == 0
+    assert Order.objects.count() == stock
+    assert OrderItem.objects.aggregate(total=Sum("quantity"))["total"] == stock
+    # Ответ мог потеряться из-за ошибки блокировки SQLite после фиксации — тогда повтор получает 409
+    assert set(results) <= {201, 409} and results.count(201) <= stock
+
+
+@pytest.mark.django_db
+def test_order_reserves_stock_with_one_update(auth_client, django_assert_max_num_queries):
+    # Отдельно от теста с потоками: их соединения с SQLite в памяти не закрываются и могут держать блокировку
+    client, user = auth_client
+    phone = create_offer(1)
+    contact = Contact.objects.create(user=user, type="address", value="Moscow")
+
+    # Резервирование — один условный UPDATE остатков на заказ, без чтения и сохранения по строкам
+    with django_assert_max_num_queries(ORDER_CREATE_MAX_QUERIES) as ctx:
+        response = client.post(reverse("order_create"), {
+            "contact_id": contact.id, "items": [{"product_info": phone.id, "quantity": 1}],
+        }, format="json")
+    assert response.status_code == 201
+    updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('UPDATE "backend_productinfo"')]
+    assert len(updates) == 1
+
+
+def fill_cart(client, offers):
+    session = client.session
+    session["cart"] = {str(pi.id): 1 for pi in offers}
+    session.save()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+
+@pytest.mark.django_db
+def test_cart_and_order_query_count_does_not_depend_on_cart_size(auth_client):
+    client, user = auth_client
+    contact = Contact.objects.create(user=user, type="address", value="Moscow")
+    offers = [create_offer(5, name=f"Phone {i}") for i in range(20)]
+
+    counts = []
+    for size in (2, 20):
+        fill_cart(client, offers[:size])
+        with CaptureQueriesContext(connection) as cart_ctx:
+            response = client.get(reverse("cart"))
+        assert len(response.data["items"]) == size
+
+        with CaptureQueriesContext(connection) as order_ctx:
+            response = client.post(reverse("order_create"), {"contact_id": contact.id}, format="json")
+        assert response.status_code == 201
+        counts.append((len(cart_ctx.captured_queries), len(order_ctx.captured_queries)))
+
+    assert counts[0] == counts[1]
+    assert OrderItem.objects.count() == 22
+
+
+@pytest.mark.django_db
+def test_orders_history(auth_client):
+    client, user = auth_client
+    contact = Contact.objects.create(user=user, type="address", value="Moscow")
+    phone = create_offer(100)
+    case = create_offer(100, name="Case")
+    for i in range(5):
+        order = Order.objects.create(user=user, contact=contact, status="new" if i % 2 else "delivered")
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_info=phone, quantity=1 + i, price=500),
+            OrderItem(order=order, product_info=case, quantity=2, price="10.50"),
+        ])
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(reverse("orders_list"), {"page_size": 2})
+    orders = response.data["diplom"]
+    assert [o["total"] for o in orders] == [2521.0, 2021.0]
+    assert orders[0]["items"][0]["shop"] == "Tech Store"
+    # Сессия/пользователь не считаются: заказы и позиции — два запроса на страницу
+    assert len([q for q in ctx.captured_queries if "backend_order" in q["sql"]]) == 2
+
+    response = client.get(response.data["next"])
+    assert len(response.data["diplom"]) == 2
+
+    response = client.get(reverse("orders_list"), {"status": "new"})
+    assert len(response.data["diplom"]) == 2
+    response = client.get(reverse("orders_list"), {"date_from": "2000-01-01", "date_to": "2000-12-31"})
+    assert response.data["diplom"] == []
+    assert client.get(reverse("orders_list"), {"status": "lost"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_order_create_is_idempotent(auth_client):
+    client, user = auth_client
+    phone = create_offer(5)
+    contact = Contact.objects.create(user=user, type="address", value="Moscow")
+    body = {"contact_id": contact.id, "items": [{"product_info": phone.id, "quantity": 2}]}
+
+    first = client.post(reverse("order_create"), body, format="json", HTTP_IDEMPOTENCY_KEY="order-1")
+    retry = client.post(reverse("order_create"), body, format="json", HTTP_IDEMPOTENCY_KEY="order-1")
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.data["order_id"] == first.data["order_id"]
+    assert retry["Idempotent-Replayed"] == "true"
+    assert Order.objects.count() == 1
+    phone.refresh_from_db()
+    assert phone.quantity == 3
+
+    # Тот же ключ с другим телом — ошибка клиента, новый ключ — новый заказ
+    body["items"][0]["quantity"] = 1
+    assert client.post(reverse("order_create"), body, format="json", HTTP_IDEMPOTENCY_KEY="order-1").status_code == 422
+    assert client.post(reverse("order_create"), body, format="json", HTTP_IDEMPOTENCY_KEY="order-2").status_code == 201
@@ -0,0 +1,105 @@
+import io
+import json
+
+import openpyxl
+import pytest
+import yaml
+
+from backend import price_lists
+from backend.price_lists import PriceList
+
+PRODUCTS = [
+    {"name": "Phone", "category": "Phones", "price": 1000, "quantity": 5, "parameters": {"Цвет": "черный"}},
+    {"name": "Charger", "category": "Accessories", "price": 10.5, "quantity": 3},
+]
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # Маленький буфер, чтобы значения обрывались на границе чтения
+    monkeypatch.setattr(price_lists, "CHUNK_SIZE", 7)
+
+
+def test_json_stream(small_chunks):
+    data = {"products": PRODUCTS, "shop": {"name": "Tech Store"}}
+    file = io.BytesIO(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    price_list = PriceList(file, "price.json")
+
+    # Магазин указан после товаров — всё равно определяется до импорта
+    assert price_list.shop_name == "Tech Store"
+    assert list(price_list) == PRODUCTS
+
+
+@pytest.mark.parametrize("name", ["price.json", "price.yaml"])
+def test_categories_after_goods(small_chunks, name):
+    data = {"shop": "Tech Store", "goods": [{"id": 1, "name": "Phone", "category": 224}],
+            "categories": [{"id": 224, "name": "Смартфоны"}]}
+    text = json.dumps(data) if name.endswith(".json") else yaml.safe_dump(data, sort_keys=False)
+
+    price_list = PriceList(io.BytesIO(text.encode("utf-8")), name)
+
+    assert price_list.categories == {"224": "Смартфоны"}
+    assert list(price_list) == data["goods"]
+
+
+def test_categories_after_goods_unseekable():
+    class Unseekable(io.BytesIO):
+        def seekable(self):
+            return False
+
+    text = json.dumps({"shop": "Tech Store", "goods": [{"id": 1}], "categories": [{"id": 224, "name": "Смартфоны"}]})
+    with pytest.raises(ValueError):
+        list(PriceList(Unseekable(text.encode("utf-8")), "price.json"))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 5, 7, 15, 64])
+def test_json_numbers_split_across_chunks(monkeypatch, chunk_size):
+    monkeypatch.setattr(price_lists, "CHUNK_SIZE", chunk_size)
+    text = '{"version": 10.25, "shop": "Tech", "goods": [{"price": 1e3, "quantity": 12, "price_rrc": -0.5E-2}]}'
+
+    price_list = PriceList(io.BytesIO(text.encode("utf-8")), "price.json")
+
+    assert price_list.header["version"] == 10.25
+    assert list(price_list) == [{"price": 1000.0, "quantity": 12, "price_rrc": -0.005}]
+
+
+def test_json_invalid():
+    with pytest.raises(ValueError):
+        list(PriceList(io.BytesIO(b'{"products": [{"name": "Phone"} {"name": "x"}]}'), "price.json"))
+
+
+def test_yaml_stream():
+    text = yaml.safe_dump({"shop": {"name": "Tech Store"}, "products": PRODUCTS}, allow_unicode=True)
+    price_list = PriceList(io.BytesIO(text.encode("utf-8")), "price.yaml")
+
+    assert price_list.shop_name == "Tech Store"
+    assert list(price_list) == PRODUCTS
+
+
+def test_yaml_multiple_documents():
+    text = yaml.safe_dump_all(
+        [{"shop": {"name": "Tech Store"}, "products": PRODUCTS[:1]}, {"products": PRODUCTS[1:]}],
+        allow_unicode=True,
+    )
+    price_list = PriceList(io.BytesIO(text.encode("utf-8")), "price.yml")
+
+    assert list(price_list) == PRODUCTS
+
+
+def test_excel_stream():
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["name", "category", "price", "quantity"])
+    ws.append(["Phone", "Phones", 1000, 5])
+    ws.append([None, None, None, None])
+    file = io.BytesIO()
+    wb.save(file)
+    file.seek(0)
+
+    price_list = PriceList(file, "price.xlsx")
+    items = list(price_list)
+
+    assert price_list.shop_name == "Unknown Shop"
+    assert len(items) == 1
+    assert items[0]["name"] == "Phone" and items[0]["price"] == 1000
@@ -0,0 +1,69 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from backend.importer import ProductImporter
+from backend.models import Shop
+
+
+def import_items(shop, name_in_shop="iPhone XR", quantity=5):
+    items = [
+        {"id": 1, "name": "Смартфон Apple iPhone XR", "name_in_shop": name_in_shop, "category": "Смартфоны",
+         "price": 60000, "quantity": quantity, "parameters": {"Цвет": "черный"}},
+        {"id": 2, "name": "Чехол для смартфона", "category": "Аксессуары", "price": 500, "quantity": 3,
+         "parameters": {"Цвет": "белый"}},
+        {"id": 3, "name": "Ноутбук Apple MacBook", "category": "Ноутбуки", "price": 90000, "quantity": 2},
+    ]
+    # Остальной ассортимент: для ранжирования искомые слова должны быть редкими
+    items += [
+        {"id": 10 + i, "name": f"Кабель USB {i}", "category": "Кабели", "price": 300, "quantity": 1}
+        for i in range(6)
+    ]
+    return ProductImporter(shop).run(items)
+
+
+def search_names(client, query):
+    response = client.get(reverse("catalog_search"), {"q": query})
+    assert response.status_code == 200
+    return [item["product"] for item in response.data["items"]]
+
+
+@pytest.mark.django_db
+def test_search_ranks_and_matches_prefixes():
+    client = APIClient()
+    import_items(Shop.objects.create(name="Tech Store"))
+
+    # Совпадение в названии выше совпадения только в параметрах/категории
+    assert search_names(client, "смартф") == ["Смартфон Apple iPhone XR", "Чехол для смартфона"]
+    assert search_names(client, "APPLE черн") == ["Смартфон Apple iPhone XR"]
+    assert search_names(client, "ноутбуки") == ["Ноутбук Apple MacBook"]
+    assert search_names(client, "планшет") == []
+
+    assert client.get(reverse("catalog_search"), {"q": "  "}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_search_index_follows_reimport():
+    client = APIClient()
+    shop = Shop.objects.create(name="Tech Store")
+    import_items(shop)
+
+    # Новое название у поставщика и обнуление остатка при повторном импорте сразу видны в поиске
+    import_items(shop, name_in_shop="Apple iPhone XR 128GB", quantity=0)
+    assert search_names(client, "128gb") == []
+
+    import_items(shop, name_in_shop="Apple iPhone XR 128GB", quantity=1)
+    assert search_names(client, "128gb") == ["Смартфон Apple iPhone XR"]
+    assert search_names(client, "чехол") == ["Чехол для смартфона"]
+
+
+@pytest.mark.django_db
+def test_search_pagination():
+    client = APIClient()
+    import_items(Shop.objects.create(name="Tech Store"))
+
+    response = client.get(reverse("catalog_search"), {"q": "apple", "page_size": 1})
+    assert len(response.data["items"]) == 1
+    response = client.get(response.data["next"])
+    assert len(response.data["items"]) == 1
+    assert response.data["next"] is None
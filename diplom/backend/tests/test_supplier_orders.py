@@ -0,0 +1,185 @@
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from backend.models import Category, Contact, Order, Product, ProductInfo, Profile, Shop, ShopOrder
+
+
+def create_offer(shop, name, quantity=10):
+    category, _ = Category.objects.get_or_create(name="Phones")
+    product = Product.objects.create(name=name, category=category)
+    return ProductInfo.objects.create(product=product, name=name, price=100, quantity=quantity, shop=shop, price_rrc=150)
+
+
+def place_order(client, user, lines):
+    contact = Contact.objects.create(user=user, type="address", value="Moscow")
+    items = [{"product_info": pi.id, "quantity": qty} for pi, qty in lines]
+    response = client.post(reverse("order_create"), {"contact_id": contact.id, "items": items}, format="json")
+    assert response.status_code == 201, response.data
+    return Order.objects.get(pk=response.data["order_id"])
+
+
+@pytest.fixture
+def setup(db, settings):
+    settings.SUPPLIER_FEED_LAG = 0
+    buyer = User.objects.create_user(username="buyer", password="testpass")
+    client = APIClient()
+    client.force_authenticate(user=buyer)
+
+    first, second = Shop.objects.create(name="First"), Shop.objects.create(name="Second")
+    supplier = User.objects.create_user(username="supplier", password="testpass")
+    Profile.objects.create(user=supplier, is_supplier=True).shops.add(first)
+    supplier_client = APIClient()
+    supplier_client.force_authenticate(user=supplier)
+    return client, buyer, supplier_client, first, second
+
+
+@pytest.mark.django_db
+def test_order_split_by_shop(setup):
+    client, buyer, _, first, second = setup
+    a, b, c = create_offer(first, "A"), create_offer(first, "B"), create_offer(second, "C")
+
+    order = place_order(client, buyer, [(a, 1), (b, 2), (c, 3)])
+
+    parts = {so.shop_id: so for so in order.shop_orders.all()}
+    assert set(parts) == {first.id, second.id}
+    assert sorted(i.product_info_id for i in parts[first.id].items.all()) == [a.id, b.id]
+    assert [i.product_info_id for i in parts[second.id].items.all()] == [c.id]
+
+
+@pytest.mark.django_db
+def test_supplier_feed_since(setup):
+    client, buyer, supplier_client, first, second = setup
+    a, c = create_offer(first, "A"), create_offer(second, "C")
+    url = reverse("supplier_orders")
+
+    first_order = place_order(client, buyer, [(a, 1), (c, 1)])
+    response = supplier_client.get(url)
+    assert response.status_code == 200
+    assert [o["order_id"] for o in response.data["orders"]] == [first_order.id]
+    assert response.data["orders"][0]["items"][0]["qty"] == 1
+    assert response.data["has_more"] is False
+    cursor = response.data["cursor"]
+
+    # Нового ничего нет — пустая страница, курсор тот же
+    response = supplier_client.get(url, {"since": cursor})
+    assert response.data["orders"] == []
+    assert response.data["cursor"] == cursor
+
+    # Новый заказ и изменение старого приходят при следующем опросе
+    second_order = place_order(client, buyer, [(a, 2)])
+    shop_order = ShopOrder.objects.get(order=first_order, shop=first)
+    shop_order.status = Order.Status.CONFIRMED
+    shop_order.save()
+
+    response = supplier_client.get(url, {"since": cursor, "page_size": 1})
+    assert [o["order_id"] for o in response.data["orders"]] == [second_order.id]
+    assert response.data["has_more"] is True
+    response = supplier_client.get(url, {"since": response.data["cursor"]})
+    assert [(o["order_id"], o["status"]) for o in response.data["orders"]] == [(first_order.id, "confirmed")]
+
+    assert supplier_client.get(url, {"since": "bad"}).status_code == 400
+    assert client.get(url).status_code == 403
+
+
+@pytest.mark.django_db
+def test_supplier_status_transitions(setup, django_capture_on_commit_callbacks, mailoutbox):
+    client, buyer, supplier_client, first, second = setup
+    buyer.email = "buyer@mail.com"
+    buyer.save()
+    a, c = create_offer(first, "A", quantity=10), create_offer(second, "C")
+    orders = [place_order(client, buyer, [(a, 2), (c, 1)]) for _ in range(3)]
+    parts = [order.shop_orders.get(shop=first).pk for order in orders]
+    foreign = orders[0].shop_orders.get(shop=second).pk
+    url = reverse("supplier_order_status")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = supplier_client.post(url, {"ids": parts + [foreign], "status": "confirmed"}, format="json")
+    assert response.status_code == 200
+    assert sorted(response.data["updated"]) == sorted(parts)
+    assert response.data["rejected"] == [{"id": foreign, "status": None}]
+    # Вторая часть заказа ещё новая — заказ покупателя остаётся новым
+    assert Order.objects.get(pk=orders[0].pk).status == "new"
+
+    # Из confirmed нельзя сразу в delivered
+    response = supplier_client.post(url, {"ids": parts[:1], "status": "delivered"}, format="json")
+    assert response.data["rejected"] == [{"id": parts[0], "status": "confirmed"}]
+
+    # Отмена возвращает товар на склад и меняет статус заказа, если отменены все его части
+    ShopOrder.objects.filter(pk=foreign).update(status="canceled")
+    mailoutbox.clear()
+    with django_capture_on_commit_callbacks(execute=True):
+        response = supplier_client.post(url, {"ids": parts[:2], "status": "canceled"}, format="json")
+    assert sorted(response.data["updated"]) == sorted(parts[:2])
+    a.refresh_from_db()
+    assert a.quantity == 10 - 2
+    assert Order.objects.get(pk=orders[0].pk).status == "canceled"
+    assert Order.objects.get(pk=orders[1].pk).status == "new"
+    assert [m.subject for m in mailoutbox] == [f"Заказ №{orders[0].pk}: Отменён"]
+
+    assert supplier_client.post(url, {"ids": parts, "status": "new"}, format="json").status_code == 400
+
+    # Часть в статусе вне PROGRESS (добавленном позже) не мешает пересчёту заказа
+    orders[2].shop_orders.filter(shop=second).update(status="legacy")
+    response = supplier_client.post(url, {"ids": parts[2:], "status": "shipped"}, format="json")
+    assert response.data["updated"] == parts[2:]
+    assert Order.objects.get(pk=orders[2].pk).status == "shipped"
+
+
+@pytest.mark.django_db
+def test_shop_order_migration_keeps_status(setup):
+    from datetime import timedelta
+    from importlib import import_module
+
+    from django.apps import apps
+    from django.utils import timezone
+
+    from backend.models import OrderItem
+
+    client, buyer, _, first, second = setup
+    order = place_order(client, buyer, [(create_offer(first, "A"), 1), (create_offer(second, "B"), 1)])
+    # Заказ, оформленный до разделения по магазинам
+    OrderItem.objects.filter(order=order).update(shop_order=None)
+    ShopOrder.objects.filter(order=order).delete()
+    dt = timezone.now() - timedelta(days=30)
+    Order.objects.filter(pk=order.pk).update(status=Order.Status.SHIPPED, dt=dt)
+
+    import_module("backend.migrations.0010_shoporder").split_existing_orders(apps, None)
+
+    parts = ShopOrder.objects.filter(order=order)
+    assert {(part.shop_id, part.status) for part in parts} == {(first.id, "shipped"), (second.id, "shipped")}
+    assert all(part.created_at == dt and part.updated_at == dt for part in parts)
+    assert not OrderItem.objects.filter(order=order, shop_order__isnull=True).exists()
+    assert all(item.shop_order.shop_id == item.product_info.shop_id for item in OrderItem.objects.filter(order=order))
+
+
+def test_shop_order_migration_promotes_draft_orders(setup, django_capture_on_commit_callbacks):
+    from importlib import import_module
+
+    from django.apps import apps
+
+    from backend.models import OrderItem
+
+    client, buyer, supplier_client, first, second = setup
+    offer = create_offer(first, "A")
+    order = place_order(client, buyer, [(offer, 2), (create_offer(second, "B"), 1)])
+    # До разделения заказы оформлялись в статусе draft
+    OrderItem.objects.filter(order=order).update(shop_order=None)
+    ShopOrder.objects.filter(order=order).delete()
+    Order.objects.filter(pk=order.pk).update(status=Order.Status.DRAFT)
+
+    import_module("backend.migrations.0010_shoporder").split_existing_orders(apps, None)
+
+    order.refresh_from_db()
+    assert order.status == Order.Status.NEW
+    assert set(ShopOrder.objects.filter(order=order).values_list('status', flat=True)) == {"new"}
+
+    # Такой заказ поставщик может отменить, и остаток вернётся
+    part = ShopOrder.objects.get(order=order, shop=first)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = supplier_client.post(reverse("supplier_order_status"), {"ids": [part.pk], "status": "canceled"},
+                                        format="json")
+    assert response.status_code == 200, response.data
+    offer.refresh_from_db()
+    assert offer.quantity == 10
@@ -0,0 +1,53 @@
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from backend.models import Category, Product, ProductInfo, Profile, Shop
+
+
+@pytest.mark.django_db
+def test_supplier_stock_update(django_capture_on_commit_callbacks):
+    category = Category.objects.create(name="Phones")
+    own, other = Shop.objects.create(name="Own"), Shop.objects.create(name="Other")
+    offers = []
+    for i, shop in enumerate([own, own, other]):
+        product = Product.objects.create(name=f"Phone {i}", category=category)
+        offers.append(ProductInfo.objects.create(product=product, shop=shop, name=f"Phone {i}", external_id=100 + i,
+                                                 price=100, price_rrc=150, quantity=5, import_hash="abc"))
+    first, second, foreign = offers
+
+    supplier = User.objects.create_user(username="supplier", password="testpass")
+    Profile.objects.create(user=supplier, is_supplier=True).shops.add(own)
+    client = APIClient()
+    client.force_authenticate(user=supplier)
+    url = reverse("supplier_stock")
+
+    items = [
+        {"external_id": 100, "price": 90.5, "quantity": 0},
+        {"id": second.id, "quantity": 12},
+        {"id": foreign.id, "quantity": 1},   # чужой магазин
+        {"external_id": 999, "price": 1},    # нет в прайс-листе
+    ]
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(url, {"items": items}, format="json")
+    assert response.status_code == 200, response.data
+    assert response.data["updated"] == 2
+    assert response.data["not_found"] == [{"id": foreign.id}, {"external_id": 999}]
+
+    first.refresh_from_db()
+    second.refresh_from_db()
+    foreign.refresh_from_db()
+    assert (first.price, first.quantity, first.import_hash) == (90.5, 0, "")
+    assert (second.price, second.quantity) == (100, 12)
+    assert foreign.quantity == 5
+
+    assert client.post(url, {"items": [{"id": first.id, "quantity": -1}]}, format="json").status_code == 400
+    assert client.post(url, {"items": [{"id": first.id}]}, format="json").status_code == 400
+    for price in ("nan", "inf", "-1e309", "1e309", "abc", -1, True):
+        response = client.post(url, {"items": [{"id": first.id, "price": price}]}, format="json")
+        assert response.status_code == 400 and "detail" in response.data, price
+    response = client.post(url, {"shop": "abc", "items": [{"id": first.id, "quantity": 1}]}, format="json")
+    assert response.status_code == 400
+    first.refresh_from_db()
+    assert first.price == 90.5
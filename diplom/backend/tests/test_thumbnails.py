@@ -0,0 +1,60 @@
+import io
+from unittest.mock import patch
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from easy_thumbnails.models import Thumbnail
+from PIL import Image
+
+from backend import tasks
+from backend.models import Category, Product, ProductInfo, Shop
+
+
+def image_file(color, name="phone.png"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), color).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+@pytest.mark.django_db
+def test_thumbnails_only_on_image_change(django_capture_on_commit_callbacks):
+    shop = Shop.objects.create(name="Tech Store")
+    category = Category.objects.create(name="Phones")
+    calls = []
+    real_delay = tasks.generate_thumbnails.delay
+
+    def delay(jobs):
+        calls.append(jobs)
+        return real_delay(jobs)
+
+    with patch.object(tasks.generate_thumbnails, "delay", delay):
+        # Пять предложений в одной транзакции — одна задача на пачку
+        with django_capture_on_commit_callbacks(execute=True):
+            infos = [
+                ProductInfo.objects.create(product=Product.objects.create(name=f"Phone {i}", category=category),
+                                           shop=shop, name=f"Phone {i}", price=100, price_rrc=120, quantity=1,
+                                           image=image_file("red"))
+                for i in range(5)
+            ]
+        assert len(calls) == 1 and len(calls[0]) == 5
+        assert Thumbnail.objects.count() == 5 * 4  # 4 алиаса THUMBNAIL_ALIASES на картинку
+
+        info = infos[0]
+        original = info.image.name
+        # Изменение остатка и загрузка того же содержимого новых миниатюр не требуют
+        with django_capture_on_commit_callbacks(execute=True):
+            info.quantity = 7
+            info.save()
+            info.image = image_file("red", name="same.png")
+            info.save()
+        assert len(calls) == 1
+        # Дубликат файла не сохраняется — остаётся прежний с готовыми миниатюрами
+        assert info.image.name == original
+
+        with django_capture_on_commit_callbacks(execute=True):
+            info.image = image_file("blue")
+            info.save()
+        assert calls[1] == [["product", info.pk, info.image_hash]]
+
+    # Картинка сменилась до выполнения задачи — устаревшая задача пропускается
+    assert tasks.generate_thumbnails([["product", info.pk, "stale"]]) == {"generated": 0, "skipped": 1}
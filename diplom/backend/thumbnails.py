@@ -0,0 +1,129 @@
+"""
+Генерация миниатюр (THUMBNAIL_ALIASES) для картинок товаров и аватаров.
+
+Миниатюры создаются, только когда меняется содержимое картинки: при сохранении
+загруженного файла считается sha256 (ProductInfo.image_hash, Profile.avatar_hash),
+и задача ставится, если отпечаток изменился. Сохранение без новой картинки
+(остатки, цена, профиль) задач не создаёт.
+
+Задачи одной транзакции собираются вместе и после фиксации уходят в Celery пачками
+по THUMBNAIL_BATCH_SIZE; пачки параллельно обрабатывают воркеры Celery.
+Повторная задача на ту же картинку с тем же отпечатком, пока первая не выполнена,
+отбрасывается (ключ в кэше).
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Источники миниатюр: вид -> (модель, поле картинки, поле отпечатка)
+SOURCES = {
+    "product": ("ProductInfo", "image", "image_hash"),
+    "avatar": ("Profile", "avatar", "avatar_hash"),
+}
+
+# Размер куска при подсчёте отпечатка файла
+CHUNK_SIZE = 64 * 1024
+
+# Задачи текущей транзакции (по потокам): (вид, pk) -> отпечаток
+_pending = threading.local()
+
+
+def content_hash(fieldfile):
+    """sha256 содержимого файла; позиция чтения возвращается в начало."""
+    digest = hashlib.sha256()
+    file = fieldfile.file
+    file.seek(0)
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def update_hash(instance, field, hash_field):
+    """
+    Вызывается перед сохранением (pre_save): пересчитывает отпечаток, если в поле загружен новый файл.
+    Возвращает True, если отпечаток изменился и нужны новые миниатюры.
+    """
+    fieldfile = getattr(instance, field)
+    old = getattr(instance, hash_field)
+    if not fieldfile:
+        new = ""
+    elif fieldfile._committed:
+        # Файл не менялся (или задан путём к уже сохранённому файлу) — отпечаток прежний
+        return False
+    else:
+        new = content_hash(fieldfile)
+        if new == old and instance.pk:
+            # Загружен тот же файл: оставляем сохранённый — для него миниатюры уже есть
+            current = type(instance).objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+            if current:
+                setattr(instance, field, current)
+                return False
+    setattr(instance, hash_field, new)
+    return bool(new) and new != old
+
+
+def queue_thumbnails(kind, pk, digest):
+    """Ставит генерацию миниатюр после фиксации транзакции; повторы внутри транзакции схлопываются."""
+    jobs = getattr(_pending, "jobs", None)
+    if jobs is None:
+        jobs = _pending.jobs = {}
+    jobs[(kind, pk)] = digest
+    # Колбэк регистрируется на каждую задачу: первый отправит все накопленные, остальные ничего не найдут.
+    # Задачи откатившейся транзакции уйдут со следующей — воркер отбросит их по отпечатку
+    transaction.on_commit(_flush)
+
+
+def _flush():
+    from .tasks import generate_thumbnails
+
+    jobs = getattr(_pending, "jobs", None)
+    _pending.jobs = {}
+    if not jobs:
+        return
+
+    fresh = [
+        [kind, pk, digest] for (kind, pk), digest in jobs.items()
+        if cache.add(_job_key(kind, pk, digest), 1, settings.THUMBNAIL_JOB_TIMEOUT)
+    ]
+    size = settings.THUMBNAIL_BATCH_SIZE
+    for start in range(0, len(fresh), size):
+        generate_thumbnails.delay(fresh[start:start + size])
+
+
+def _job_key(kind, pk, digest):
+    return f"thumbnails:job:{kind}:{pk}:{digest}"
+
+
+def generate_batch(jobs):
+    """
+    Создаёт миниатюры для пачки [(вид, pk, отпечаток)]: объекты каждого вида читаются одним запросом,
+    задачи, у которых картинка успела смениться (отпечаток другой), пропускаются.
+    Возвращает {"generated", "skipped"}.
+    """
+    from django.apps import apps
+    from easy_thumbnails.files import generate_all_aliases
+
+    result = {"generated": 0, "skipped": 0}
+    by_kind = {}
+    for kind, pk, digest in jobs:
+        by_kind.setdefault(kind, {})[pk] = digest
+
+    for kind, digests in by_kind.items():
+        model_name, field, hash_field = SOURCES[kind]
+        model = apps.get_model('backend', model_name)
+        objects = model.objects.only(field, hash_field).in_bulk(list(digests))
+        for pk, digest in digests.items():
+            obj = objects.get(pk)
+            try:
+                if obj is None or getattr(obj, hash_field) != digest or not getattr(obj, field):
+                    result["skipped"] += 1
+                    continue
+                generate_all_aliases(getattr(obj, field), include_global=True)
+                result["generated"] += 1
+            finally:
+                cache.delete(_job_key(kind, pk, digest))
+    return result
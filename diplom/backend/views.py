@@ -1,23 +1,51 @@
+import hmac
 import json
-import yaml
-import openpyxl
+import math
+from decimal import Decimal
 from rest_framework.parsers import MultiPartParser
-from .models import Shop, Category, Product, Parameter, ProductParameter
+from django.db import transaction
+from django.urls import reverse
+from .models import ImportJob
+from .importer import import_price_list
+from .price_lists import PARSE_ERRORS, PriceList, is_supported_file
 from .permissions import IsSupplier
 from django.contrib.auth import authenticate, login, logout, get_user_model
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes
-from backend.tasks import send_order_confirmation_email, send_registration_confirmation_email
+from backend.tasks import send_order_confirmation_email, send_registration_confirmation_email, process_import_job
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
-from .models import ProductInfo, Contact, Order, OrderItem
+from .models import ProductInfo, Contact, Order, OrderItem, ShopOrder
 from .serializers import RegisterSerializer, LoginSerializer, ProductInfoSerializer
+from .pagination import CatalogCursorPagination, OrdersCursorPagination, decode_feed_cursor, encode_feed_cursor
+from .filters import filter_catalog, filter_orders
+from django.db.models import DecimalField, F, Prefetch, Q, Sum
+from django.utils import timezone
+from datetime import timedelta
+from .facets import catalog_facets
+from .catalog_cache import catalog_cache_key, cached_catalog_page
+from .order_status import TRANSITIONS, change_status, sources
+from .stock import OutOfStock, reserve_stock, stock_shortages, update_offers
+from .cart import get_cart, get_cart_store, merge_session_cart
+from .idempotency import idempotent
+from . import search
+from rest_framework.utils.urls import replace_query_param
+from django.conf import settings
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotModified
+from django.shortcuts import get_object_or_404, redirect
+from django.views.decorators.http import require_GET
+from django.apps import apps
+from django.core.files.storage import default_storage
+from PIL import Image
+from .images import FORMATS as IMAGE_FORMATS, get_variant, image_version, variant_formats
+from .thumbnails import SOURCES as THUMBNAIL_SOURCES
+from .cache_metrics import cache_report
+from . import metrics as prometheus
 from django.contrib.auth.decorators import login_required
 
 # Получаем модель пользователя (стандартная или кастомная, если указана в settings)
@@ -41,8 +69,8 @@ class SimpleProductImportView(APIView):
         Основной метод импорта.
         1. Получаем файл из запроса
         2. Определяем его формат по расширению
-        3. Читаем данные и превращаем в python dict
-        4. Создаём или обновляем записи в БД
+        3. Если передан async=1 — создаём ImportJob и отдаём импорт в Celery
+        4. Иначе читаем файл потоково и создаём или обновляем записи в БД
         """
 
         # Пытаемся получить файл из запроса
@@ -51,143 +79,64 @@ class SimpleProductImportView(APIView):
             # Если файл не передан — возвращаем ошибку
             return Response({"error": "Файл не передан"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Приводим имя файла к нижнему регистру, чтобы проще было сравнивать расширение
-        name = file.name.lower()
-
-        # Определяем, как парсить файл по его расширению
-        if name.endswith(".yaml") or name.endswith(".yml"):
-            # YAML можно загрузить сразу через safe_load
-            data = yaml.safe_load(file.read())
-        elif name.endswith(".json"):
-            # JSON сначала читаем как текст, затем преобразуем через json.loads
-            data = json.loads(file.read().decode('utf-8'))
-        elif name.endswith(".xlsx"):
-            # Для Excel вызываем отдельный метод
-            data = self.parse_excel(file)
-        else:
+        # Формат определяем по расширению файла
+        if not is_supported_file(file.name):
             # Если расширение не поддерживается — сообщаем об ошибке
             return Response({"error": "Формат файла не поддерживается"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Определяем магазин, для которого выполняется импорт
-        # Если в файле указано название магазина — берём его
-        shop_name = data.get("shop", {}).get("name", "Unknown Shop")
-
-        # Ищем магазин по имени, если нет — создаём
-        shop, _ = Shop.objects.get_or_create(name=shop_name)
-
-        # Получаем список товаров из данных
-        products = data.get("products", [])
-
-        # Счётчики для ответа ("простая статистика")
-        created = 0
-        updated = 0
-
-        # Проходим по каждому товару из файла
-        for item in products:
-            # Название товара: если отсутствует, такой товар мы пропустим
-            product_name = item.get("name")
-            # Категория: если не указана, используем значение по умолчанию
-            category_name = item.get("category", "Без категории")
-
-            # Создаём или ищем категорию
-            category, _ = Category.objects.get_or_create(name=category_name)
-
-            # Создаём или ищем продукт (общую сущность, не привязанную к магазину)
-            product, _ = Product.objects.get_or_create(name=product_name, category=category)
-
-            # Создаём или ищем информацию о товаре в конкретном магазине (ProductInfo)
-            # defaults — значения, которые будут установлены только если эта запись создаётся впервые
-            pi, is_created = ProductInfo.objects.get_or_create(
-                product=product,
-                shop=shop,
-                defaults={
-                    "name": item.get("name_in_shop", product_name),
-                    "quantity": item.get("quantity", 0),
-                    "price": item.get("price", 0),
-                    "price_rrc": item.get("price_rrc", 0),
-                }
-            )
-
-            if is_created:
-                # Если запись создана впервые — увеличиваем счётчик созданных
-                created += 1
-            else:
-                # Если запись уже существовала — обновим её
-                pi.name = item.get("name_in_shop", pi.name)
-                pi.quantity = item.get("quantity", pi.quantity)
-                pi.price = item.get("price", pi.price)
-                pi.price_rrc = item.get("price_rrc", pi.price_rrc)
-                pi.save()
-                updated += 1
-
-            # Работа с параметрами товара
-            # format:
-            # parameters:
-            #   color: "red"
-            #   memory: "128GB"
-            params = item.get("parameters", {})
-
-            # Проходим по всем параметрам
-            for key, val in params.items():
-                # Создаём или находим параметр
-                param, _ = Parameter.objects.get_or_create(name=key)
-
-                # Создаём или находим значение параметра для конкретного товара
-                pp, pp_created = ProductParameter.objects.get_or_create(
-                    product_info=pi,
-                    parameter=param,
-                    defaults={"value": val}
-                )
-
-                # Если параметр уже существовал — обновляем его значение
-                if not pp_created:
-                    pp.value = val
-                    pp.save()
-
-        # Возвращаем простой ответ клиенту
-        return Response({
-            "created": created,
-            "updated": updated
-        }, status=status.HTTP_200_OK)
+        # deactivate_missing=1 — обнулить остаток у товаров магазина, которых нет в новом файле
+        deactivate_missing = _flag(request.data.get('deactivate_missing'))
+
+        # Большие файлы обрабатываем в фоне: сохраняем файл и ставим задачу в Celery
+        if _flag(request.data.get('async')):
+            job = ImportJob.objects.create(user=request.user, file=file, deactivate_missing=deactivate_missing)
+            process_import_job.delay(job.pk)
+            return Response({
+                "job_id": job.pk,
+                "status": job.status,
+                "status_url": reverse('import_job', args=[job.pk]),
+            }, status=status.HTTP_202_ACCEPTED)
+
+        # Файл читается потоково: товары попадают в импорт по мере разбора.
+        # Все строки пишем пачками в одной транзакции: файл импортируется целиком или не импортируется вовсе
+        try:
+            with transaction.atomic():
+                stats = import_price_list(PriceList(file, file.name), deactivate_missing=deactivate_missing)
+        except PARSE_ERRORS as exc:
+            return Response({"error": f"Некорректный файл: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
 
-    def parse_excel(self, file):
-        """
-        Метод для чтения Excel (.xlsx) файла.
-        """
+        # Возвращаем статистику клиенту: created/updated/unchanged и ошибки по строкам
+        return Response(stats, status=status.HTTP_200_OK)
 
-        # Открываем Excel-файл
-        wb = openpyxl.load_workbook(file)
-        ws = wb.active
-
-        # Получаем все строки в виде списка
-        rows = list(ws.values)
-
-        # Первая строка — заголовки колонок
-        headers = rows[0]
-        products = []
-
-        # Обрабатываем каждую строку после заголовков
-        for row in rows[1:]:
-            item = {}
-
-            # Превращаем строку Excel в словарь вида { "column_name": value }
-            for h, v in zip(headers, row):
-                if h:
-                    item[h] = v
-
-            # Приводим Excel-формат к ожидаемой структуре
-            products.append({
-                "name": item.get("name"),
-                "category": item.get("category"),
-                "name_in_shop": item.get("name_in_shop"),
-                "quantity": item.get("quantity"),
-                "price": item.get("price"),
-                "price_rrc": item.get("price_rrc"),
-                "parameters": {}  # параметры пока не обрабатываем глубоко
-            })
 
-        # Возвращаем структуру данных в том же виде, что YAML/JSON
-        return {"products": products}
+@method_decorator(csrf_exempt, name='dispatch')
+class ImportJobAPIView(APIView):
+    """
+    GET /import/jobs/<id>
+    Статус фонового импорта: сколько строк обработано, скорость и ошибки.
+    """
+    permission_classes = (IsSupplier,)
+
+    def get(self, request, pk):
+        try:
+            job = ImportJob.objects.get(pk=pk, user=request.user)
+        except ImportJob.DoesNotExist:
+            return Response({"status": "ok", "detail": "Задача импорта не найдена"}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            "status": "ok",
+            "job_id": job.pk,
+            "job_status": job.status,
+            "rows_processed": job.rows_processed,
+            "rows_per_second": job.rows_per_second,
+            "stats": job.stats,
+            "errors": job.errors,
+        })
+
+
+# Флаг из формы или query-параметра: "1", "true", "yes"
+def _flag(value):
+    return str(value or '').lower() in ('1', 'true', 'yes')
 
 
 # Вспомогательная функция для безопасного чтения данных из запроса (на случай, если JSON некорректный)
@@ -293,6 +242,8 @@ class LoginAPIView(APIView):
             return Response({"status": "ok", "detail": "Аккаунт не активирован"}, status=status.HTTP_403_FORBIDDEN)
 
         login(request, user)
+        # Корзина, собранная в сессии до входа, переезжает в корзину пользователя
+        merge_session_cart(request)
         return Response({"status": "ok"})
 
 
@@ -313,15 +264,105 @@ class LogoutAPIView(APIView):
 @method_decorator(csrf_exempt, name='dispatch')
 class CatalogAPIView(APIView):
     """
-    GET /catalog
-    Возвращает список доступных товаров (ProductInfo) с количеством > 0.
+    GET /catalog?cursor=...&page_size=...&ordering=price
+    Возвращает страницу доступных товаров (ProductInfo) с количеством > 0.
+    Фильтры: category, shop, price_min, price_max, in_stock, param=Название:значение (см. filter_catalog).
+    Ссылки на соседние страницы — в полях next/previous.
+    Страницы кэшируются; ответ содержит ETag, при совпадении If-None-Match возвращается 304.
     """
     permission_classes = (permissions.AllowAny,)
 
     def get(self, request):
-        products = ProductInfo.objects.filter(quantity__gt=0)
-        ser = ProductInfoSerializer(products, many=True)
-        return Response({"status": "ok", "items": ser.data})
+        params = request.query_params
+        # Страница собирается один раз на версию каталога, остатки подставляются из кэша (см. catalog_cache)
+        key = catalog_cache_key("page", params, extra=(
+            request.get_host(), params.get('cursor'), params.get('page_size'), params.get('ordering'),
+        ))
+        try:
+            page, etag = cached_catalog_page(key, lambda: self._build_page(request), _load_stock)
+        except ValueError as exc:
+            return Response({"status": "ok", "detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        etag = f'"{etag}"'
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        return Response({"status": "ok", **page}, headers={"ETag": etag})
+
+    def _build_page(self, request):
+        # Товар, магазин и категорию подтягиваем JOIN-ом: число запросов не зависит от размера страницы
+        products = ProductInfo.objects.select_related('product__category', 'shop')
+        products = filter_catalog(products, request.query_params)
+
+        paginator = CatalogCursorPagination()
+        page = paginator.paginate_queryset(products, request, view=self)
+        return {
+            "items": ProductInfoSerializer(page, many=True).data,
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+        }
+
+
+def _load_stock(ids):
+    return dict(ProductInfo.objects.filter(pk__in=ids).values_list('pk', 'quantity'))
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class CatalogFacetsAPIView(APIView):
+    """
+    GET /catalog/facets?category=...&param=Цвет:черный
+    Фасеты для панели фильтров: число предложений по значениям параметров и по интервалам цены.
+    Принимает те же фильтры, что и /catalog.
+    """
+    permission_classes = (permissions.AllowAny,)
+
+    def get(self, request):
+        try:
+            products = filter_catalog(ProductInfo.objects.all(), request.query_params)
+        except ValueError as exc:
+            return Response({"status": "ok", "detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"status": "ok", **catalog_facets(products, request.query_params)})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class CatalogSearchAPIView(APIView):
+    """
+    GET /catalog/search?q=смартфон&page_size=...&offset=...
+    Полнотекстовый поиск по названию товара, категории и значениям параметров.
+    Каждое слово ищется как префикс, результаты отсортированы по релевантности.
+    """
+    permission_classes = (permissions.AllowAny,)
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        if not search.query_words(query):
+            return Response({"status": "ok", "detail": "Пустой поисковый запрос"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page_size = min(int(request.query_params.get('page_size', settings.CATALOG_PAGE_SIZE)),
+                            settings.CATALOG_MAX_PAGE_SIZE)
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            return Response({"status": "ok", "detail": "Некорректный page_size или offset"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if page_size < 1 or offset < 0:
+            return Response({"status": "ok", "detail": "Некорректный page_size или offset"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Берём на одну запись больше, чтобы понять, есть ли следующая страница, без COUNT(*)
+        ids = search.search(query, limit=page_size + 1, offset=offset)
+        has_next = len(ids) > page_size
+        ids = ids[:page_size]
+
+        found = ProductInfo.objects.select_related('product__category', 'shop').in_bulk(ids)
+        ser = ProductInfoSerializer([found[pk] for pk in ids if pk in found], many=True)
+
+        next_link = None
+        if has_next:
+            next_link = replace_query_param(request.build_absolute_uri(), 'offset', offset + page_size)
+
+        return Response({"status": "ok", "items": ser.data, "next": next_link})
 
 
 # Корзина
@@ -329,7 +370,7 @@ class CatalogAPIView(APIView):
 class CartAPIView(APIView):
     """
     Работа с корзиной.
-    Корзина хранится в сессии (request.session).
+    Корзина хранится в хранилище корзин (Redis, см. backend/cart.py), а не в сессии.
     - GET: получить корзину
     - POST: добавить товар
     - DELETE: удалить товар
@@ -338,16 +379,12 @@ class CartAPIView(APIView):
 
     def get(self, request):
         # Получаем корзину или пустую, если её ещё нет
-        cart = request.session.get('cart', {})
+        cart = get_cart(request)
         items = []
 
-        # Собираем данные о товарах в корзине
-        for pid, qty in cart.items():
-            try:
-                pi = ProductInfo.objects.get(pk=int(pid))
-            except ProductInfo.DoesNotExist:
-                continue
-
+        # Все товары корзины — одним запросом вместе с товаром и магазином
+        lines = _load_lines(cart.items(), ProductInfo.objects.select_related('product', 'shop'))
+        for pi, qty in lines:
             items.append({
                 "product_info": pi.pk,
                 "product": str(pi.product),
@@ -361,14 +398,18 @@ class CartAPIView(APIView):
     def post(self, request):
         data = _json_from_request(request)
         pid = data.get('product_info')
-        qty = int(data.get('quantity', 1))
 
         if not pid:
             return Response({"status": "ok", "detail": "Нужно указать product_info"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            pid, qty = int(pid), int(data.get('quantity', 1))
+        except (TypeError, ValueError):
+            return Response({"status": "ok", "detail": "product_info и quantity должны быть целыми числами"},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-        cart = request.session.get('cart', {})
-        cart[str(pid)] = cart.get(str(pid), 0) + qty
-        request.session['cart'] = cart
+        # Одна команда HINCRBY — корзина целиком не читается и не перезаписывается
+        merge_session_cart(request)
+        get_cart_store().add(request.user.pk, {pid: qty})
 
         return Response({"status": "ok"})
 
@@ -376,15 +417,30 @@ class CartAPIView(APIView):
         data = _json_from_request(request)
         pid = data.get('product_info')
 
-        cart = request.session.get('cart', {})
-        if str(pid) in cart:
-            cart.pop(str(pid))
-            request.session['cart'] = cart
+        if pid:
+            try:
+                pid = int(pid)
+            except (TypeError, ValueError):
+                return Response({"status": "ok", "detail": "product_info должен быть целым числом"},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        merge_session_cart(request)
+        if pid and get_cart_store().remove(request.user.pk, pid):
             return Response({"status": "ok"})
 
         return Response({"status": "ok", "detail": "Товара нет в корзине"}, status=status.HTTP_404_NOT_FOUND)
 
 
+def _load_lines(lines, queryset=ProductInfo.objects):
+    """
+    Позиции корзины или заказа [(product_info_id, количество)] -> [(ProductInfo, количество)].
+    Все товары читаются одним запросом; несуществующие пропускаются.
+    """
+    lines = [(int(pid), int(qty)) for pid, qty in lines]
+    found = queryset.in_bulk([pid for pid, _ in lines])
+    return [(found[pid], qty) for pid, qty in lines if pid in found]
+
+
 # Контакты
 @method_decorator(csrf_exempt, name='dispatch')
 class ContactsAPIView(APIView):
@@ -447,35 +503,24 @@ class OrderCreateAPIView(APIView):
     Создание заказа:
     - Если в корзине есть товары — берем оттуда
     - Если корзина пуста — можно передать товары в теле запроса
+    Если какого-то товара не хватает, заказ не создаётся: 409 и список позиций в "failed".
     После оформления заказа корзина очищается.
+    С заголовком Idempotency-Key повтор запроса возвращает первый ответ, не создавая заказ заново.
     """
     permission_classes = (permissions.IsAuthenticated,)
 
+    @idempotent
     def post(self, request):
         data = _json_from_request(request)
 
         # Пытаемся взять товары из корзины (если пользователь добавлял ранее)
-        cart = request.session.get('cart', {})
-        items = []
-
-        for pid, qty in cart.items():
-            try:
-                pi = ProductInfo.objects.get(pk=int(pid))
-            except ProductInfo.DoesNotExist:
-                continue
-
-            items.append((pi, int(qty)))
+        cart = get_cart(request)
+        items = _load_lines(cart.items())
 
         # Если корзина пустая — можно передать товары вручную в теле запроса
         if not items:
             body_items = data.get('items', [])
-            for it in body_items:
-                try:
-                    pi = ProductInfo.objects.get(pk=int(it.get('product_info')))
-                except ProductInfo.DoesNotExist:
-                    continue
-
-                items.append((pi, int(it.get('quantity', 1))))
+            items = _load_lines((it.get('product_info'), it.get('quantity', 1)) for it in body_items)
 
         if not items:
             return Response({"status": "ok", "detail": "Нет товаров для заказа"}, status=status.HTTP_400_BAD_REQUEST)
@@ -490,19 +535,40 @@ class OrderCreateAPIView(APIView):
         except Contact.DoesNotExist:
             return Response({"status": "ok", "detail": "Контакт не найден"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Создаём заказ
-        order = Order.objects.create(user=request.user, contact=contact)
-
-        # Переносим товары из корзины в заказ
+        # Одинаковые позиции из тела запроса складываем
+        quantities = {}
+        prices = {}
+        shops = {}
         for pi, qty in items:
-            if pi.quantity >= qty:
-                OrderItem.objects.create(order=order, product_info=pi, quantity=qty, price=pi.price)
-                pi.quantity -= qty
-                pi.save()
+            if qty <= 0:
+                return Response({"status": "ok", "detail": "Количество должно быть больше нуля"},
+                                status=status.HTTP_400_BAD_REQUEST)
+            quantities[pi.pk] = quantities.get(pi.pk, 0) + qty
+            prices[pi.pk] = pi.price
+            shops[pi.pk] = pi.shop_id
+
+        # Заказ создаётся целиком или не создаётся вовсе: списание остатков — один условный UPDATE
+        try:
+            with transaction.atomic():
+                reserve_stock(quantities)
+                order = Order.objects.create(user=request.user, contact=contact, status=Order.Status.NEW)
+                # Заказ делится по магазинам: каждый поставщик получает свою часть (см. SupplierOrdersAPIView)
+                shop_orders = {shop_id: ShopOrder(order=order, shop_id=shop_id) for shop_id in set(shops.values())}
+                ShopOrder.objects.bulk_create(shop_orders.values())
+                OrderItem.objects.bulk_create([
+                    OrderItem(order=order, shop_order=shop_orders[shops[pid]], product_info_id=pid,
+                              quantity=qty, price=prices[pid])
+                    for pid, qty in quantities.items()
+                ])
+        except OutOfStock:
+            return Response({
+                "status": "ok",
+                "detail": "Недостаточно товара на складе",
+                "failed": stock_shortages(quantities),
+            }, status=status.HTTP_409_CONFLICT)
 
         # После оформления очищаем корзину
-        if 'cart' in request.session:
-            del request.session['cart']
+        get_cart_store().clear(request.user.pk)
 
         # Отправляем пользователю письмо с подтверждением (уходит в консоль в dev)
         send_order_confirmation_email.delay(order.pk, request.user.email)
@@ -513,19 +579,33 @@ class OrderCreateAPIView(APIView):
 @method_decorator(csrf_exempt, name='dispatch')
 class OrdersListAPIView(APIView):
     """
-    GET /diplom
-    Возвращает список заказов пользователя с товарами внутри.
+    GET /orders?status=new&date_from=2025-01-01&date_to=2025-12-31&cursor=...
+    Возвращает историю заказов пользователя (от новых к старым) с товарами внутри.
+    Сумма заказа считается в БД; ссылки на соседние страницы — в полях next/previous.
     """
     permission_classes = (permissions.IsAuthenticated,)
     throttle_classes = [AnonRateThrottle, UserRateThrottle]
 
     def get(self, request):
-        orders = Order.objects.filter(user=request.user).order_by('-pk')
+        # Позиции с товаром и магазином — одним дополнительным запросом на страницу
+        items = OrderItem.objects.select_related('product_info__product', 'product_info__shop')
+        orders = (
+            Order.objects.filter(user=request.user)
+            .annotate(total=Sum(F('items__quantity') * F('items__price'), output_field=DecimalField()))
+            .prefetch_related(Prefetch('items', queryset=items))
+        )
+        try:
+            orders = filter_orders(orders, request.query_params)
+        except ValueError as exc:
+            return Response({"status": "ok", "detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = OrdersCursorPagination()
+        page = paginator.paginate_queryset(orders, request, view=self)
         result = []
 
-        for order in orders:
+        for order in page:
             items = []
-            for item in order.orderitem_set.all():
+            for item in order.items.all():
                 items.append({
                     "product": str(item.product_info.product),
                     "shop": str(item.product_info.shop),
@@ -535,11 +615,256 @@ class OrdersListAPIView(APIView):
 
             result.append({
                 "id": order.pk,
-                "status": getattr(order, "status", "new"),  # Если статус есть — покажем, иначе 'new'
+                "status": order.status,
+                "dt": order.dt,
+                "total": float(order.total or 0),
                 "items": items
             })
 
-        return Response({"status": "ok", "diplom": result})
+        return Response({
+            "status": "ok",
+            "diplom": result,
+            "next": paginator.get_next_link(),
+            "previous": paginator.get_previous_link(),
+        })
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class SupplierOrdersAPIView(APIView):
+    """
+    GET /supplier/orders?since=<cursor>&page_size=...
+    Лента заказов магазинов поставщика: новые и изменённые части заказов (ShopOrder)
+    в порядке изменения. В ответе cursor — его нужно передать в since при следующем опросе,
+    чтобы получить только то, что изменилось после; has_more — есть ли ещё записи сразу.
+    """
+    permission_classes = (IsSupplier,)
+
+    def get(self, request):
+        try:
+            since = decode_feed_cursor(request.query_params.get('since'))
+            page_size = min(int(request.query_params.get('page_size', settings.SUPPLIER_FEED_PAGE_SIZE)),
+                            settings.SUPPLIER_FEED_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({"status": "ok", "detail": "Некорректный since или page_size"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        shop_ids = list(request.user.profile.shops.values_list('id', flat=True))
+        # Изменения последних секунд не отдаём: транзакция, начатая раньше, может зафиксироваться позже
+        # с более ранним updated_at и оказаться позади уже выданного курсора
+        horizon = timezone.now() - timedelta(seconds=settings.SUPPLIER_FEED_LAG)
+        feed = ShopOrder.objects.filter(shop_id__in=shop_ids, updated_at__lte=horizon)
+        if since:
+            updated_at, pk = since
+            feed = feed.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+
+        items = OrderItem.objects.select_related('product_info__product')
+        feed = (
+            feed.select_related('order__contact')
+            .prefetch_related(Prefetch('items', queryset=items))
+            .order_by('updated_at', 'id')
+        )
+        page = list(feed[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+
+        result = []
+        for shop_order in page:
+            contact = shop_order.order.contact
+            result.append({
+                "id": shop_order.pk,
+                "order_id": shop_order.order_id,
+                "shop": shop_order.shop_id,
+                "status": shop_order.status,
+                "created_at": shop_order.created_at,
+                "updated_at": shop_order.updated_at,
+                "contact": contact.value if contact else None,
+                "items": [{
+                    "product_info": item.product_info_id,
+                    "product": item.product_info.product.name,
+                    "qty": item.quantity,
+                    "price": float(item.price),
+                } for item in shop_order.items.all()],
+            })
+
+        return Response({
+            "status": "ok",
+            "orders": result,
+            # Пустая страница — курсор не двигается
+            "cursor": encode_feed_cursor(page[-1].updated_at, page[-1].pk) if page else request.query_params.get('since'),
+            "has_more": has_more,
+        })
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class SupplierOrderStatusAPIView(APIView):
+    """
+    POST /supplier/orders/status
+    {"ids": [id части заказа (ShopOrder), ...], "status": "confirmed" | "shipped" | "delivered" | "canceled"}
+    Переводит части заказов своих магазинов в новый статус одним запросом к БД.
+    Части, для которых переход недопустим (или чужие), возвращаются в rejected с текущим статусом.
+    При отмене товар возвращается на склад.
+    """
+    permission_classes = (IsSupplier,)
+
+    def post(self, request):
+        target = request.data.get('status')
+        ids = request.data.get('ids')
+        if target not in TRANSITIONS or not sources(target):
+            return Response({"status": "ok", "detail": "Недопустимый статус"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = [int(pk) for pk in ids]
+        except (TypeError, ValueError):
+            return Response({"status": "ok", "detail": "ids — список id частей заказов"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not ids or len(ids) > settings.ORDER_STATUS_MAX_ITEMS:
+            return Response({"status": "ok", "detail": f"От 1 до {settings.ORDER_STATUS_MAX_ITEMS} id за запрос"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        shop_ids = list(request.user.profile.shops.values_list('id', flat=True))
+        updated, rejected = change_status(ids, target, shop_ids)
+        return Response({"status": "ok", "updated": updated, "rejected": rejected})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class SupplierStockAPIView(APIView):
+    """
+    POST /supplier/stock
+    Быстрое обновление цен и остатков без загрузки прайс-листа:
+    {"shop": <id, если у поставщика несколько магазинов>,
+     "items": [{"external_id": 4216292, "price": 110000, "quantity": 14}, {"id": 15, "quantity": 0}, ...]}
+    Товар указывается id предложения или id из прайс-листа (external_id); price и quantity — необязательны.
+    Обновляются только предложения магазинов поставщика.
+    """
+    permission_classes = (IsSupplier,)
+
+    def post(self, request):
+        shop_ids = set(request.user.profile.shops.values_list('id', flat=True))
+        items = request.data.get('items')
+        if not isinstance(items, list) or not items:
+            return Response({"status": "ok", "detail": "Передайте непустой список items"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.SUPPLIER_STOCK_MAX_ITEMS:
+            return Response({"status": "ok", "detail": f"Не больше {settings.SUPPLIER_STOCK_MAX_ITEMS} позиций за запрос"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        shop = request.data.get('shop')
+        if shop is not None:
+            try:
+                shop = int(shop)
+            except (TypeError, ValueError):
+                return Response({"status": "ok", "detail": "shop — id магазина"},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if shop not in shop_ids:
+                return Response({"status": "ok", "detail": "Магазин не найден"}, status=status.HTTP_404_NOT_FOUND)
+            shop_ids = {shop}
+
+        try:
+            updates = [_offer_update(item) for item in items]
+        except (TypeError, ValueError, ArithmeticError):
+            return Response({"status": "ok", "detail": "Каждая позиция: id или external_id, "
+                                                       "конечная price >= 0 и/или целый quantity >= 0"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # external_id уникален только внутри магазина
+        if len(shop_ids) > 1 and any("external_id" in u for u in updates):
+            return Response({"status": "ok", "detail": "Для external_id укажите shop"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            updated, not_found = update_offers(shop_ids, updates)
+        return Response({"status": "ok", "updated": updated, "not_found": not_found})
+
+
+def _offer_update(item):
+    """Проверенная позиция запроса SupplierStockAPIView; ValueError/TypeError/ArithmeticError при ошибке."""
+    if not isinstance(item, dict):
+        raise ValueError(item)
+    if "id" in item:
+        update = {"id": int(item["id"])}
+    else:
+        update = {"external_id": int(item["external_id"])}
+    if item.get("price") is not None:
+        # Decimal, а не float(): float() принимает "nan", "inf" и "-1e309"
+        if isinstance(item["price"], bool):
+            raise ValueError(item)
+        price = Decimal(str(item["price"]))
+        if not price.is_finite() or price < 0 or not math.isfinite(float(price)):
+            raise ValueError(item)
+        update["price"] = float(price)
+    if item.get("quantity") is not None:
+        if isinstance(item["quantity"], float) and not item["quantity"].is_integer():
+            raise ValueError(item)
+        update["quantity"] = int(item["quantity"])
+        if update["quantity"] < 0:
+            raise ValueError(item)
+    if len(update) == 1:
+        raise ValueError(item)
+    return update
+
+
+class CacheMetricsAPIView(APIView):
+    """
+    GET /metrics/cache
+    Статистика кэша запросов (только для администраторов): сбросы по таблицам и их источники,
+    доля попаданий и средний размер результата по семействам запросов, счётчики L1/L2 процесса.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response(cache_report())
+
+
+@require_GET
+def metrics(request):
+    """
+    GET /metrics
+    Метрики в текстовом формате Prometheus: для администраторов и сборщика метрик
+    с заголовком "Authorization: Bearer <METRICS_TOKEN>".
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    scraper = bool(token) and hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode())
+    if not (scraper or request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(prometheus.render(), content_type=prometheus.CONTENT_TYPE)
+
+
+@require_GET
+def image_variant(request, kind, pk, version, width, fmt):
+    """
+    GET /images/<вид>/<pk>/<версия>/<ширина>.<формат>
+    Вариант картинки товара (вид product) или аватара (avatar) нужной ширины и формата.
+    Создаётся при первом запросе; ответ неизменяемый и кэшируется на IMAGE_VARIANT_MAX_AGE.
+    Устаревшая версия перенаправляется на текущую.
+    """
+    if kind not in THUMBNAIL_SOURCES or width not in settings.IMAGE_VARIANT_WIDTHS or fmt not in variant_formats():
+        raise Http404
+    model_name, field, hash_field = THUMBNAIL_SOURCES[kind]
+    obj = get_object_or_404(apps.get_model('backend', model_name).objects.only(field, hash_field), pk=pk)
+    fieldfile = getattr(obj, field)
+    if not fieldfile:
+        raise Http404
+
+    current = image_version(fieldfile, getattr(obj, hash_field))
+    if version != current:
+        return redirect("image_variant", kind, pk, current, width, fmt)
+
+    etag = f'"{version}-{width}-{fmt}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.IMAGE_VARIANT_MAX_AGE}, immutable",
+    }
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        try:
+            name = get_variant(fieldfile, version, width, fmt)
+        except (OSError, Image.DecompressionBombError):
+            # Файл оригинала отсутствует или это не картинка
+            raise Http404
+        response = FileResponse(default_storage.open(name), content_type=IMAGE_FORMATS[fmt][1])
+    for header, value in headers.items():
+        response[header] = value
+    return response
 
 
 @login_required
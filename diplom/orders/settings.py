@@ -38,6 +38,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,6 +47,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'social_django.middleware.SocialAuthExceptionMiddleware',
+    'backend.cache_metrics.CacheMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'orders.urls'
@@ -146,6 +148,66 @@ REST_FRAMEWORK = {
 }
 
 
+# Размер страницы каталога (keyset-пагинация) и максимум для ?page_size=
+CATALOG_PAGE_SIZE = 50
+CATALOG_MAX_PAGE_SIZE = 500
+
+# Размер страницы истории заказов и максимум для ?page_size=
+ORDERS_PAGE_SIZE = 20
+ORDERS_MAX_PAGE_SIZE = 100
+
+# Лента заказов поставщика: размер страницы, максимум и задержка (сек), после которой изменения попадают в ленту
+SUPPLIER_FEED_PAGE_SIZE = 100
+SUPPLIER_FEED_MAX_PAGE_SIZE = 500
+SUPPLIER_FEED_LAG = 5
+
+# Максимум позиций в одном запросе быстрого обновления цен и остатков (/supplier/stock/)
+SUPPLIER_STOCK_MAX_ITEMS = 5000
+
+# Смена статусов заказов: максимум частей заказов в одном запросе и сколько уведомлений отправлять одной задачей Celery
+ORDER_STATUS_MAX_ITEMS = 1000
+ORDER_STATUS_NOTIFY_BATCH = 100
+
+# Очередь писем (backend/emails.py): писем в пачке на одно соединение, задержка перед отправкой (сек) —
+# за неё успевают накопиться письма, число попыток, базовая задержка повтора (сек, удваивается с каждой попыткой)
+# и сколько держать блокировку отправки
+EMAIL_BATCH_SIZE = 200
+EMAIL_FLUSH_DELAY = 5
+EMAIL_MAX_ATTEMPTS = 5
+EMAIL_RETRY_DELAY = 60
+EMAIL_LOCK_TIMEOUT = 10 * 60
+
+# Загрузка прайс-листов по Shop.url (backend/feeds.py): интервал проверки (сек), число параллельных загрузок,
+# таймауты (подключение, чтение), максимальный размер файла и сколько держать в памяти до записи на диск.
+# SHOP_FEED_DEACTIVATE_MISSING — считать файл по url полным прайс-листом и снимать с продажи товары, которых в нём нет
+# (выключено: обрезанный при загрузке файл скрыл бы почти весь каталог магазина)
+SHOP_FEED_INTERVAL = 15 * 60
+SHOP_FEED_WORKERS = 8
+SHOP_FEED_TIMEOUT = (10, 60)
+SHOP_FEED_MAX_SIZE = 200 * 1024 * 1024
+SHOP_FEED_SPOOL_SIZE = 1024 * 1024
+SHOP_FEED_DEACTIVATE_MISSING = False
+SHOP_FEED_LOCK_TIMEOUT = 60 * 60
+
+# Корзины: hash в Redis на пользователя (см. backend/cart.py) и время жизни корзины с последнего изменения (сек).
+# Без CART_REDIS_URL корзины хранятся в кэше Django
+CART_REDIS_URL = 'redis://127.0.0.1:6379/2'
+CART_TTL = 30 * 24 * 60 * 60
+
+# Idempotency-Key: сколько хранить ответ для повторов (сек) и сколько держать блокировку выполняющегося запроса
+IDEMPOTENCY_TTL = 24 * 60 * 60
+IDEMPOTENCY_LOCK_TIMEOUT = 30
+
+# Фасеты каталога: число интервалов цены, сколько значений параметра показывать и время жизни кэша (сек).
+# Кэш сбрасывается при импорте, таймаут — страховка для прочих изменений (заказы меняют остатки)
+CATALOG_FACET_PRICE_BUCKETS = 10
+CATALOG_FACET_MAX_VALUES = 20
+CATALOG_FACETS_TIMEOUT = 15 * 60
+
+# Время жизни снимков страниц каталога и остатков в кэше (сек); сбрасываются сменой версии каталога
+CATALOG_SNAPSHOT_TIMEOUT = 60 * 60
+
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Online Shop API",
     "DESCRIPTION": "Документация к API интернет-магазина (заказы, пользователи, контакты и т.д.)",
@@ -160,6 +222,17 @@ CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+CELERY_BEAT_SCHEDULE = {
+    'fetch-shop-feeds': {
+        'task': 'backend.tasks.fetch_shop_feeds',
+        'schedule': SHOP_FEED_INTERVAL,
+    },
+    # Подбирает письма, отложенные после неудачной попытки
+    'send-pending-emails': {
+        'task': 'backend.tasks.send_pending_emails',
+        'schedule': 60,
+    },
+}
 
 AUTHENTICATION_BACKENDS = (
     'social_core.backends.google.GoogleOAuth2',
@@ -245,6 +318,18 @@ THUMBNAIL_ALIASES = {
 
 THUMBNAIL_DEFAULT_STORAGE = 'django.core.files.storage.FileSystemStorage'
 
+# Генерация миниатюр (backend/thumbnails.py): картинок в одной задаче Celery
+# и сколько помнить поставленную задачу, чтобы не ставить её повторно (сек)
+THUMBNAIL_BATCH_SIZE = 50
+THUMBNAIL_JOB_TIMEOUT = 60 * 60
+
+# Варианты картинок по запросу (backend/images.py): ширины, форматы (неподдерживаемые Pillow пропускаются),
+# качество сжатия по форматам и время кэширования ответа клиентом (сек)
+IMAGE_VARIANT_WIDTHS = (150, 300, 600, 1200)
+IMAGE_VARIANT_FORMATS = ("avif", "webp", "jpeg")
+IMAGE_VARIANT_QUALITY = {"avif": 50, "webp": 75, "jpeg": 80}
+IMAGE_VARIANT_MAX_AGE = 365 * 24 * 60 * 60
+
 
 sentry_sdk.init(
     dsn="https://5789954a5b6b4a3e151e99348a08231e@o4510387547275264.ingest.de.sentry.io/4510387552518224",
@@ -253,17 +338,43 @@ sentry_sdk.init(
     send_default_pii=True,
 )
 
+# default — двухуровневый кэш (backend/cache_backends.py): LRU в памяти процесса перед Redis.
+# Записи без явного таймаута живут сутки, чтобы память Redis не росла до вытеснения
 CACHES = {
     "default": {
+        "BACKEND": "backend.cache_backends.TwoTierCache",
+        "TIMEOUT": 24 * 60 * 60,
+        "OPTIONS": {
+            "L2": "redis",
+            "L1_MAX_ENTRIES": 5000,
+            "L1_MAX_BYTES": 32 * 1024 * 1024,
+            "L1_TIMEOUT": 30,
+        },
+    },
+    "redis": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
         "LOCATION": "redis://127.0.0.1:6379/1",
-        "TIMEOUT": None, 
-    }
+        "TIMEOUT": 24 * 60 * 60,
+    },
 }
 
 CACHALOT_ENABLED = True
 CACHALOT_CACHE = 'default'
-CACHALOT_TIMEOUT = None
-
-
-
+CACHALOT_TIMEOUT = 24 * 60 * 60
+
+# Статистика кэша запросов (backend/cache_metrics.py, /metrics/cache/, команда cache_report):
+# кэш для общих счётчиков (напрямую Redis, без L1), как часто процесс добавляет к ним свои (сек)
+# и размер какого по счёту промаха измерять (pickle результата недёшев)
+CACHE_METRICS_ENABLED = True
+CACHE_METRICS_CACHE = 'redis'
+CACHE_METRICS_FLUSH_INTERVAL = 10
+CACHE_METRICS_SIZE_SAMPLE = 20
+
+# Метрики в формате Prometheus (backend/metrics.py, GET /metrics): кэш для общих счётчиков,
+# как часто процесс добавляет к ним свои (сек) и токен сборщика метрик (заголовок
+# "Authorization: Bearer <токен>"); пустой токен — /metrics доступен только администраторам.
+# По адресу клиента доступ не проверяется: за обратным прокси все запросы приходят с 127.0.0.1
+METRICS_ENABLED = True
+METRICS_CACHE = 'redis'
+METRICS_FLUSH_INTERVAL = 10
+METRICS_TOKEN = ''
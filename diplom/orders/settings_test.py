@@ -15,6 +15,10 @@ DATABASES = {
 # -----------------------------
 CACHES = {
     'default': {
+        'BACKEND': 'backend.cache_backends.TwoTierCache',
+        'OPTIONS': {'L2': 'l2'},
+    },
+    'l2': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'testing-default',
     },
@@ -28,6 +32,11 @@ CACHES = {
 INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'cachalot']
 
 CACHALOT_ENABLED = False
+CACHE_METRICS_CACHE = 'l2'
+METRICS_CACHE = 'l2'
+
+# Корзины — в locmem-кэше вместо Redis
+CART_REDIS_URL = None
 
 # -----------------------------
 # CELERY в фейковом режиме
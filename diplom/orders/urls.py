@@ -6,12 +6,22 @@ from backend.views import (
     LoginAPIView,
     LogoutAPIView,
     CatalogAPIView,
+    CatalogSearchAPIView,
+    CatalogFacetsAPIView,
     CartAPIView,
     ContactsAPIView,
     ContactDetailAPIView,
     OrderCreateAPIView,
     OrdersListAPIView,
+    SimpleProductImportView,
+    ImportJobAPIView,
+    SupplierOrdersAPIView,
+    SupplierOrderStatusAPIView,
+    SupplierStockAPIView,
+    CacheMetricsAPIView,
     home,
+    image_variant,
+    metrics,
     TriggerErrorAPIView
 )
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
@@ -34,6 +44,10 @@ urlpatterns = [
     # Каталог товаров
     # GET — получить список товаров
     path('catalog/', CatalogAPIView.as_view(), name='catalog'),
+    # GET — фасеты для панели фильтров (те же фильтры, что и у каталога)
+    path('catalog/facets/', CatalogFacetsAPIView.as_view(), name='catalog_facets'),
+    # GET — полнотекстовый поиск по каталогу (?q=...)
+    path('catalog/search/', CatalogSearchAPIView.as_view(), name='catalog_search'),
 
     # Корзина
     # GET — получить корзину
@@ -54,6 +68,28 @@ urlpatterns = [
     # GET — список заказов пользователя
     path('orders/', OrdersListAPIView.as_view(), name='orders_list'),
 
+    # Импорт товаров поставщиком
+    # POST — загрузить прайс-лист (YAML, JSON или Excel)
+    path('import/', SimpleProductImportView.as_view(), name='product_import'),
+    # GET — статус фонового импорта (async=1)
+    path('import/jobs/<int:pk>/', ImportJobAPIView.as_view(), name='import_job'),
+
+    # Заказы поставщика
+    # GET — новые и изменённые заказы его магазинов (?since=<cursor>)
+    path('supplier/orders/', SupplierOrdersAPIView.as_view(), name='supplier_orders'),
+    # POST — перевести части заказов в новый статус (confirmed/shipped/delivered/canceled)
+    path('supplier/orders/status/', SupplierOrderStatusAPIView.as_view(), name='supplier_order_status'),
+    # POST — обновить цены и остатки своих предложений без загрузки прайс-листа
+    path('supplier/stock/', SupplierStockAPIView.as_view(), name='supplier_stock'),
+
+    # Варианты картинок: ширина и формат (avif/webp/jpeg), создаются при первом запросе
+    path('images/<str:kind>/<int:pk>/<str:version>/<int:width>.<str:fmt>', image_variant, name='image_variant'),
+
+    # GET — статистика кэша запросов: сбросы по таблицам, попадания по запросам (только администраторы)
+    path('metrics/cache/', CacheMetricsAPIView.as_view(), name='cache_metrics'),
+    # GET — метрики производительности для Prometheus: время ответов, запросы к БД, задачи Celery
+    path('metrics', metrics, name='metrics'),
+
     # Автоматическая генерация документации DRF-Spectacular
     path("schema/", SpectacularAPIView.as_view(), name="schema"),  
     path("docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),